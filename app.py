@@ -4,17 +4,68 @@ http://127.0.0.1:5000/apidocs/
 https://app.swaggerhub.com/apis/MUNTASIR_2/Modern_Bank_API/1.0.0
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+import base64
+import io
+import json
+import os
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta
 import secrets
+from contextlib import closing
 from functools import wraps
+from concurrent.futures import TimeoutError as FutureTimeout
 from flasgger import Swagger, swag_from  # Import Swagger and swag_from
+from db_pool import ConnectionPool
+from migrations import migrate, format_timestamp, create_table
+from token_cache import TokenCache
+from write_queue import WriteQueue, Abort
+from idempotency import IdempotencyStore
+from money import to_cents, from_cents, format_cents
+import customer_import
+import db_pragmas
+import idempotency
+import metrics
+import search_index
+import signed_tokens
+import sql_trace
+import storage
 
 app = Flask(__name__)
 DATABASE = 'bank.db'
-SECRET_KEY = 'your_secret_key_here'  # Replace with a strong, random key
+SECRET_KEY = os.environ.get('BANK_SECRET_KEY', 'your_secret_key_here')  # Replace with a strong, random key
 app.config['SECRET_KEY'] = SECRET_KEY
+# 'sqlite': bank.db, see init_db(). 'memory': storage.MemoryStorage, gone when the process exits.
+app.config['STORAGE'] = os.environ.get('BANK_STORAGE', 'sqlite')
+if app.config['STORAGE'] not in storage.ENGINES:
+    raise ValueError(f"Unknown BANK_STORAGE {app.config['STORAGE']!r}, expected one of {', '.join(storage.ENGINES)}")
+app.config['DB_POOL_SIZE'] = int(os.environ.get('BANK_DB_POOL_SIZE', 5))
+app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('BANK_DB_POOL_TIMEOUT', 30.0))
+app.config['DB_PROFILE'] = os.environ.get('BANK_DB_PROFILE', db_pragmas.DEFAULT_PROFILE)  # See db_pragmas.PROFILES
+db_pragmas.get_profile(app.config['DB_PROFILE'])  # Fail fast on an unknown profile name
+app.config['AUTH_CACHE_SIZE'] = int(os.environ.get('BANK_AUTH_CACHE_SIZE', 10000))
+app.config['AUTH_CACHE_TTL'] = float(os.environ.get('BANK_AUTH_CACHE_TTL', 60.0))
+# 'opaque': random tokens stored on the user row, one session per user.
+# 'signed': HMAC-signed tokens checked without the database, see signed_tokens.py.
+app.config['AUTH_TOKENS'] = os.environ.get('BANK_AUTH_TOKENS', 'opaque')
+app.config['SIGNED_TOKEN_TTL'] = int(os.environ.get('BANK_SIGNED_TOKEN_TTL', 3600))
+app.config['REVOCATION_REFRESH'] = float(os.environ.get('BANK_REVOCATION_REFRESH', 5.0))
+if app.config['AUTH_TOKENS'] not in ('opaque', 'signed'):
+    raise ValueError(f"Unknown BANK_AUTH_TOKENS {app.config['AUTH_TOKENS']!r}, expected opaque or signed")
+if app.config['AUTH_TOKENS'] == 'signed' and not os.environ.get('BANK_SECRET_KEY'):
+    # Anyone who knows the placeholder key above could sign their own tokens
+    raise ValueError("BANK_AUTH_TOKENS=signed needs BANK_SECRET_KEY set to a strong, random key")
+app.config['WRITE_QUEUE'] = os.environ.get('BANK_WRITE_QUEUE', '0').lower() in ('1', 'true', 'yes')
+app.config['WRITE_BATCH_SIZE'] = int(os.environ.get('BANK_WRITE_BATCH_SIZE', 64))
+app.config['WRITE_QUEUE_TIMEOUT'] = float(os.environ.get('BANK_WRITE_QUEUE_TIMEOUT', 30.0))
+app.config['IDEMPOTENCY_TTL'] = float(os.environ.get('BANK_IDEMPOTENCY_TTL', 86400.0))
+app.config['IDEMPOTENCY_CACHE_SIZE'] = int(os.environ.get('BANK_IDEMPOTENCY_CACHE_SIZE', 10000))
+app.config['METRICS'] = os.environ.get('BANK_METRICS', '1').lower() in ('1', 'true', 'yes')  # /managers/metrics/
+app.config['SQL_TRACE'] = os.environ.get('BANK_SQL_TRACE', '0').lower() in ('1', 'true', 'yes')  # See sql_trace
+app.config['SQL_SLOW_MS'] = float(os.environ.get('BANK_SQL_SLOW_MS', 100.0))  # Logged with their query plan
 
 # --- Swagger Configuration ---
 # Basic Swagger UI setup
@@ -49,12 +100,14 @@ swagger_config['securityDefinitions'] = {
 swagger = Swagger(app, config=swagger_config)  # Initialize Flasgger
 
 first_request = True
+_init_lock = threading.Lock()
 
 
 # --- Database Initialization ---
 
 def init_db():
-    with sqlite3.connect(DATABASE) as conn:
+    with closing(sqlite3.connect(DATABASE)) as conn:  # Closed, not just committed, so nothing holds the file open
+        apply_db_profile(conn)  # Switches the file to WAL before any table is created
         cursor = conn.cursor()
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS managers (
@@ -64,53 +117,484 @@ def init_db():
                 auth_token TEXT UNIQUE
             )
         ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS customers (
-                account_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                balance REAL NOT NULL DEFAULT 0.0,
-                auth_token TEXT UNIQUE
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                account_id INTEGER NOT NULL,
-                transaction_type TEXT NOT NULL,
-                amount REAL NOT NULL,
-                timestamp DATETIME NOT NULL,
-                description TEXT,
-                FOREIGN KEY (account_id) REFERENCES customers (account_id)
-            )
-        ''')
+        create_table(conn, 'customers')
+        create_table(conn, 'transactions')
         conn.commit()
+        migrate(conn)
+        app.config['TRANSACTION_FTS'] = search_index.has_table(conn, 'transactions_fts')
+        app.config['CUSTOMER_FTS'] = search_index.has_table(conn, 'customers_fts')
+
+
+def apply_db_profile(conn):
+    db_pragmas.apply(conn, app.config['DB_PROFILE'])
+
+
+def log_db_profile():
+    # At INFO, for the entry points (app.run() below, asgi.py) that set the app's logger to show it
+    if app.config['STORAGE'] == 'sqlite':
+        app.logger.info("Database profile '%s': %s", app.config['DB_PROFILE'],
+                        db_pragmas.get_profile(app.config['DB_PROFILE']))
+
+
+def now_timestamp():
+    return format_timestamp(datetime.now())
+
+
+# --- Money Helpers ---
+
+def parse_amount(value):
+    # Positive amount in whole cents, or None if the value is not one
+    try:
+        cents = to_cents(value)
+    except ValueError:
+        return None
+    return cents if cents > 0 else None
+
+
+def debit_failure(store, account_id, not_found_message):
+    # Only reached on the failure path: tell a missing account from a short balance
+    if store.balance(account_id) is not None:
+        return {'error': 'Insufficient funds'}, 400
+    return {'error': not_found_message}, 404
+
+
+def transaction_json(row):
+    transaction = dict(row)
+    transaction['amount'] = from_cents(transaction['amount'])
+    return transaction
 
 
 @app.before_request
 def before_request_func():  # Renamed to avoid conflict with flask.before_request
     global first_request
     if first_request:
-        init_db()
-        first_request = False
+        # Concurrent first requests wait for one init_db(); the migrations must not run twice at once
+        with _init_lock:
+            if first_request:
+                if app.config['STORAGE'] == 'sqlite':
+                    init_db()
+                first_request = False  # Only once it succeeded, so a failed init is retried
+
+
+# --- Request Metrics ---
+
+request_metrics = metrics.Metrics()
+
+
+@app.before_request
+def start_request_timer():
+    if app.config['METRICS']:
+        g.request_started = time.perf_counter()
+        g.phase_times = {}
+
+
+def add_phase_time(phase, seconds):
+    # phase: 'auth', 'db' or 'serialize'; a no-op outside a timed request
+    phase_times = g.get('phase_times')
+    if phase_times is not None:
+        phase_times[phase] = phase_times.get(phase, 0.0) + seconds
+
+
+def add_db_time(seconds):
+    add_phase_time('db', seconds)
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_metrics.record(endpoint, request.method, response.status_code,
+                               time.perf_counter() - started, g.pop('phase_times'))
+    return response
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    # jsonify() goes through response(); its time is the serialize phase
+    def response(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().response(*args, **kwargs)
+        finally:
+            add_phase_time('serialize', time.perf_counter() - started)
+
+
+app.json = TimedJSONProvider(app)
+
+
+# --- SQL Tracing ---
+
+sql_tracer = sql_trace.SQLTracer()
+
+
+@app.before_request
+def start_sql_trace():
+    if app.config['SQL_TRACE']:
+        sql_tracer.begin()
+
+
+@app.after_request
+def finish_sql_trace(response):
+    trace = sql_tracer.end()
+    if trace is None:
+        return response
+    conn = g.get('db')
+    for statement in trace.statements:
+        if statement.seconds * 1000 < app.config['SQL_SLOW_MS']:
+            continue
+        try:
+            plan = sql_tracer.explain(conn, statement) if conn is not None else []
+        except sqlite3.Error as e:
+            plan = [f'(no plan: {e})']
+        app.logger.warning("Slow SQL on %s %s: %.1f ms: %s %r\n  plan: %s",
+                           request.method, request.path, statement.seconds * 1000, statement.sql,
+                           statement.parameters, '; '.join(plan) or '-')
+    if app.debug:
+        response.headers.add('Server-Timing', 'sql;dur=%.3f;desc="%d statements"'
+                             % (trace.seconds * 1000, len(trace.statements)))
+    return response
 
 
 # --- Database Helper Functions ---
 
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DATABASE, size=app.config['DB_POOL_SIZE'],
+                                       timeout=app.config['DB_POOL_TIMEOUT'], on_connect=apply_db_profile,
+                                       factory=sql_tracer.factory if app.config['SQL_TRACE'] else sqlite3.Connection)
+    return _pool
+
+
 def get_db():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row  # Access columns by name
-    return conn
+    # One pooled connection per app context, shared by token_required and the view
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+
+@app.teardown_appcontext
+def release_db(exc):
+    g.pop('storage', None)
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool().release(conn)
+
+
+memory_storage = storage.MemoryStorage() if app.config['STORAGE'] == 'memory' else None
+
+
+def sqlite_storage(conn):
+    return storage.SQLiteStorage(conn, transaction_fts=app.config.get('TRANSACTION_FTS', False),
+                                 customer_fts=app.config.get('CUSTOMER_FTS', False))
+
+
+def get_storage():
+    # The configured engine; for SQLite, bound to this app context's pooled connection.
+    # With metrics on, calls into it are timed as the request's db phase.
+    if 'storage' not in g:
+        engine = memory_storage if memory_storage is not None else sqlite_storage(get_db())
+        g.storage = metrics.TimedProxy(engine, add_db_time) if app.config['METRICS'] else engine
+    return g.storage
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()  # Not _pool_lock: get_pool() may take that one
+
+
+def get_write_queue():
+    # None unless WRITE_QUEUE is enabled; writes then run on the request's own connection.
+    # Only SQLite has a write lock worth queueing for.
+    global _write_queue
+    if not app.config['WRITE_QUEUE'] or app.config['STORAGE'] != 'sqlite':
+        return None
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = WriteQueue(get_pool().connect, max_batch=app.config['WRITE_BATCH_SIZE'])
+    return _write_queue
+
+
+# --- Write Operations ---
+# Each operation gets the storage engine, runs inside a transaction it does not
+# own (the request's, or one savepoint of a write queue batch) and returns a
+# (body, status) pair. Raising Abort undoes the operation's own writes.
+
+def on_connection(operation):
+    # The write queue hands operations a bare connection
+    return lambda conn, *args: operation(sqlite_storage(conn), *args)
+
+
+def run_write(operation, *args):
+    queue = get_write_queue()
+    if queue is not None:
+        started = time.perf_counter()
+        try:
+            return queue.submit(on_connection(operation), *args).result(timeout=app.config['WRITE_QUEUE_TIMEOUT'])
+        finally:
+            add_db_time(time.perf_counter() - started)
+    return get_storage().write(operation, *args)
+
+
+def write_response(operation, *args):
+    try:
+        body, *rest = run_write(operation, *args)  # (body, status) or (body, status, headers)
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error: {e}'}), 500
+    except FutureTimeout:
+        # The write is still queued and may yet be applied
+        return jsonify({'error': 'Timed out waiting for the database writer'}), 503
+    return jsonify(body), *rest
+
+
+idempotency_store = IdempotencyStore(ttl=app.config['IDEMPOTENCY_TTL'],
+                                     cache_size=app.config['IDEMPOTENCY_CACHE_SIZE'])
+
+
+def idempotent_write_response(account_id, operation, *args):
+    # write_response(operation, account_id, *args), honouring an Idempotency-Key header
+    key = request.headers.get('Idempotency-Key')
+    if key is None:
+        return write_response(operation, account_id, *args)
+    if not key or len(key) > idempotency.MAX_KEY_LENGTH:
+        return jsonify({'error': f'Idempotency-Key must be 1 to {idempotency.MAX_KEY_LENGTH} characters'}), 400
+    request_fingerprint = idempotency.fingerprint(request.path, request.get_json())
+    replay = idempotency_store.cached(account_id, key, request_fingerprint)
+    if replay is not None:
+        body, *rest = replay
+        return jsonify(body), *rest
+    response = write_response(idempotency_store.wrap(operation, account_id, key, request_fingerprint),
+                              account_id, *args)
+    if response[1] < 500:
+        idempotency_store.confirm(account_id, key)
+    return response
+
+
+def record_transaction(store, account_id, transaction_type, amount, description, timestamp=None):
+    store.add_transactions([(account_id, transaction_type, amount, timestamp or now_timestamp(), description)])
+
+
+def apply_registration(store, name, email, password, initial_deposit):
+    account_id = store.add_customer(name, email, password, initial_deposit)
+    if account_id is None:
+        return {'error': 'Email already registered'}, 400
+    if initial_deposit > 0:  # Only record initial deposit if it's greater than 0
+        record_transaction(store, account_id, 'deposit', initial_deposit, 'Initial deposit')
+    return {'message': 'Customer registered successfully', 'account_id': account_id}, 201
+
+
+def apply_deposit(store, account_id, amount):
+    new_balance = store.credit(account_id, amount)
+    if new_balance is None:
+        return {'error': 'Customer not found'}, 404
+    record_transaction(store, account_id, 'deposit', amount, 'Deposit')
+    return {'message': 'Deposit successful', 'new_balance': from_cents(new_balance)}, 200
+
+
+def apply_withdrawal(store, account_id, amount):
+    new_balance = store.debit(account_id, amount)
+    if new_balance is None:
+        return debit_failure(store, account_id, 'Customer not found')
+    record_transaction(store, account_id, 'withdrawal', amount, 'Withdrawal')
+    return {'message': 'Withdrawal successful', 'new_balance': from_cents(new_balance)}, 200
+
+
+def apply_transfer(store, sender_id, recipient_id, amount):
+    new_balance = store.debit(sender_id, amount)
+    if new_balance is None:
+        return debit_failure(store, sender_id, 'Sender account not found')
+    if store.credit(recipient_id, amount) is None:
+        raise Abort(({'error': 'Recipient account not found'}, 404))  # Undo the debit
+    timestamp = now_timestamp()
+    store.add_transactions(
+        [(sender_id, 'transfer_out', amount, timestamp, f'Transfer to account {recipient_id}'),
+         (recipient_id, 'transfer_in', amount, timestamp, f'Transfer from account {sender_id}')])
+    return {'message': f'Transfer of {format_cents(amount)} successful to account {recipient_id}',
+            'new_balance': from_cents(new_balance)}, 200
+
+
+MAX_BATCH_TRANSFERS = 1000
+
+
+def batch_results(items, errors, applied):
+    # One entry per requested (recipient_id, amount as sent) pair, in request order; errors: {index: message}
+    results = []
+    for index, (recipient_id, amount) in enumerate(items):
+        result = {'index': index, 'recipient_account_id': recipient_id, 'amount': amount}
+        if index in errors:
+            result.update(status='rejected', error=errors[index])
+        else:
+            result['status'] = 'completed' if applied else 'not_applied'
+        results.append(result)
+    return results
+
+
+def as_sent(transfers):
+    return [(recipient_id, from_cents(amount)) for recipient_id, amount in transfers]
+
+
+def apply_batch_transfer(store, sender_id, transfers):
+    # transfers: validated (recipient_id, amount) pairs; all of them are applied or none
+    existing = store.existing_accounts(recipient_id for recipient_id, _ in transfers)
+    errors = {index: 'Recipient account not found'
+              for index, (recipient_id, _) in enumerate(transfers) if recipient_id not in existing}
+    if errors:
+        return {'error': 'Batch rejected, no transfers were applied',
+                'results': batch_results(as_sent(transfers), errors, applied=False)}, 404
+
+    total = sum(amount for _, amount in transfers)
+    new_balance = store.debit(sender_id, total)
+    if new_balance is None:
+        return debit_failure(store, sender_id, 'Sender account not found')
+    credits = {}
+    for recipient_id, amount in transfers:
+        credits[recipient_id] = credits.get(recipient_id, 0) + amount
+    # One balance update per distinct recipient; the recipients were checked above
+    store.credit_many(credits)
+    timestamp = now_timestamp()
+    ledger = []
+    for recipient_id, amount in transfers:
+        ledger.append((sender_id, 'transfer_out', amount, timestamp, f'Transfer to account {recipient_id}'))
+        ledger.append((recipient_id, 'transfer_in', amount, timestamp, f'Transfer from account {sender_id}'))
+    store.add_transactions(ledger)
+    return {'message': f'Batch of {len(transfers)} transfers totalling {format_cents(total)} successful',
+            'new_balance': from_cents(new_balance),
+            'results': batch_results(as_sent(transfers), {}, applied=True)}, 200
+
+
+# --- Pagination Helpers ---
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(*values):
+    # Opaque to clients: base64 of the keyset position of the last row returned
+    raw = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, *types):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(types) or \
+            not all(isinstance(value, kind) for value, kind in zip(values, types)):
+        raise ValueError('Invalid cursor')
+    if not all(_bindable(value) for value in values):
+        raise ValueError('Invalid cursor')
+    return tuple(values)
+
+
+def _bindable(value):
+    # What SQLite can bind: a signed 64-bit integer, or a string that encodes as UTF-8 (no lone surrogates)
+    if isinstance(value, int):
+        return -2 ** 63 <= value < 2 ** 63
+    if isinstance(value, str):
+        try:
+            value.encode('utf-8')
+        except UnicodeEncodeError:
+            return False
+    return True
+
+
+def parse_page_args(*cursor_types):
+    limit_str = request.args.get('limit')
+    try:
+        limit = int(limit_str) if limit_str else DEFAULT_PAGE_SIZE
+    except ValueError:
+        raise ValueError('Invalid limit. Must be an integer.')
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'Invalid limit. Must be between 1 and {MAX_PAGE_SIZE}.')
+    cursor = request.args.get('cursor')
+    return limit, decode_cursor(cursor, *cursor_types) if cursor else None
+
+
+def transaction_page(**filters):
+    # Newest first, keyed on (timestamp, transaction_id); filters: see storage.Storage.transactions
+    try:
+        limit, after = parse_page_args(str, int)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # One extra row tells us whether there is a next page
+    rows = get_storage().transactions(after=after, limit=limit + 1, **filters)
+    next_cursor = encode_cursor(rows[limit - 1]['timestamp'], rows[limit - 1]['transaction_id']) \
+        if len(rows) > limit else None
+    return jsonify({'transactions': [transaction_json(row) for row in rows[:limit]], 'next_cursor': next_cursor}), 200
+
+
+# --- Streaming Helpers ---
+
+STREAM_BATCH_SIZE = 500
+
+
+def wants_stream():
+    if request.args.get('stream') == '1':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
 
 
-def close_db(conn):
-    if conn:
-        conn.close()
+def stream_rows(rows, serialize=dict):
+    # One JSON document per line, sent STREAM_BATCH_SIZE rows at a time; rows is an
+    # iterator from the storage engine, so memory stays flat
+    def generate():
+        batch = []
+        for row in rows:
+            batch.append(json.dumps(serialize(row)) + '\n')
+            if len(batch) >= STREAM_BATCH_SIZE:
+                yield ''.join(batch)
+                batch = []
+        if batch:
+            yield ''.join(batch)
+
+    # stream_with_context keeps the app context, and so the pooled connection, alive until the last row
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 
 # --- Authentication Decorators ---
 
+token_cache = TokenCache(maxsize=app.config['AUTH_CACHE_SIZE'], ttl=app.config['AUTH_CACHE_TTL'])
+
+
+revocations = signed_tokens.RevocationList(refresh_interval=app.config['REVOCATION_REFRESH'])
+
+
+def issue_signed_token(role, principal_id):
+    token = signed_tokens.issue(app.config['SECRET_KEY'], role, principal_id, app.config['SIGNED_TOKEN_TTL'])
+    return {'access_token': token, 'expires_in': app.config['SIGNED_TOKEN_TTL']}
+
+
+def verify_signed_token(token, role):
+    # Principal id for a valid, unrevoked session of this role; no database access
+    # except the periodic poll for sessions revoked by other workers
+    claims = signed_tokens.verify(app.config['SECRET_KEY'], token)
+    if claims is None or claims.get('role') != role or not isinstance(claims.get('sub'), int):
+        return None
+    if revocations.due():
+        revocations.refresh(get_storage())
+    if revocations.is_revoked(claims.get('sid')):
+        return None
+    return claims['sub']
+
+
+def is_signed_token(token):
+    # Signed tokens are only honoured when enabled; otherwise they are looked up like any opaque token
+    return app.config['AUTH_TOKENS'] == 'signed' and signed_tokens.is_signed(token)
+
+
+def revoke_signed_token(token):
+    claims = signed_tokens.verify(app.config['SECRET_KEY'], token)
+    if claims is not None:
+        revocations.revoke(get_storage(), claims['sid'], claims['exp'])
+
+
 def token_required(role):
     def decorator(f):
         @wraps(f)
@@ -119,23 +603,20 @@ def token_required(role):
             if not auth_header or not auth_header.startswith('Bearer '):
                 return jsonify({'error': 'Token is missing'}), 401
             token = auth_header.split(' ')[1]
-            conn = get_db()
-            cursor = conn.cursor()
-            user = None
-            if role == 'manager':
-                cursor.execute("SELECT * FROM managers WHERE auth_token = ?", (token,))
-                manager = cursor.fetchone()
-                if manager:
-                    user = dict(manager)
-            elif role == 'customer':
-                cursor.execute("SELECT * FROM customers WHERE auth_token = ?", (token,))
-                customer = cursor.fetchone()
-                if customer:
-                    user = dict(customer)
-                    kwargs['current_customer_id'] = user['account_id']
-            close_db(conn)
-            if not user:
+            started = time.perf_counter()
+            if is_signed_token(token):
+                principal_id = verify_signed_token(token, role)
+            else:
+                principal_id = token_cache.get(token, role)
+                if principal_id is None:
+                    principal_id = get_storage().session_principal(token, role)
+                    if principal_id is not None:
+                        token_cache.put(token, role, principal_id)
+            add_phase_time('auth', time.perf_counter() - started)
+            if principal_id is None:
                 return jsonify({'error': 'Invalid or expired token'}), 401
+            if role == 'customer':
+                kwargs['current_customer_id'] = principal_id
             return f(*args, **kwargs)
 
         return decorated_function
@@ -191,15 +672,8 @@ def register_manager():
     password = data.get('password')
     if not username or not password:
         return jsonify({'error': 'Username and password are required'}), 400
-    conn = get_db()
-    cursor = conn.cursor()
-    if cursor.execute("SELECT * FROM managers WHERE username = ?", (username,)).fetchone():
-        close_db(conn)
+    if not get_storage().add_manager(username, password):
         return jsonify({'error': 'Username already exists'}), 400
-    cursor.execute("INSERT INTO managers (username, password) VALUES (?, ?)",
-                   (username, password))  # In real app, hash password
-    conn.commit()
-    close_db(conn)
     return jsonify({'message': 'Manager registered successfully'}), 201
 
 
@@ -228,7 +702,9 @@ def register_manager():
             'schema': {
                 'type': 'object',
                 'properties': {
-                    'access_token': {'type': 'string'}
+                    'access_token': {'type': 'string'},
+                    'expires_in': {'type': 'integer',
+                                   'description': 'Token lifetime in seconds (signed tokens only).'}
                 }
             }
         },
@@ -242,17 +718,15 @@ def login_manager():
     password = data.get('password')
     if not username or not password:
         return jsonify({'error': 'Username and password are required'}), 400
-    conn = get_db()
-    cursor = conn.cursor()
-    manager = cursor.execute("SELECT * FROM managers WHERE username = ? AND password = ?",
-                             (username, password)).fetchone()  # In real app, compare hashed password
-    if manager:
+    store = get_storage()
+    manager_id = store.check_manager(username, password)
+    if manager_id is not None and app.config['AUTH_TOKENS'] == 'signed':
+        return jsonify(issue_signed_token('manager', manager_id)), 200  # Earlier sessions stay valid
+    if manager_id is not None:
         auth_token = secrets.token_hex(32)
-        cursor.execute("UPDATE managers SET auth_token = ? WHERE id = ?", (auth_token, manager['id']))
-        conn.commit()
-        close_db(conn)
+        store.start_session('manager', manager_id, auth_token)
+        token_cache.invalidate_principal('manager', manager_id)  # The previous token is no longer valid
         return jsonify({'access_token': auth_token}), 200
-    close_db(conn)
     return jsonify({'error': 'Invalid credentials'}), 401
 
 
@@ -270,7 +744,26 @@ def login_manager():
                 'properties': {
                     'total_customers': {'type': 'integer'},
                     'total_transactions': {'type': 'integer'},
-                    'total_balance': {'type': 'number', 'format': 'float'}
+                    'total_balance': {'type': 'number', 'format': 'float'},
+                    'auth_token_cache': {
+                        'type': 'object',
+                        'description': 'Size and hit/miss/eviction counters of this worker\'s token cache.',
+                        'properties': {
+                            'size': {'type': 'integer'},
+                            'hits': {'type': 'integer'},
+                            'misses': {'type': 'integer'},
+                            'evictions': {'type': 'integer'}
+                        }
+                    },
+                    'idempotency_cache': {
+                        'type': 'object',
+                        'description': 'Size and hit/replay counters of this worker\'s idempotency response cache.',
+                        'properties': {
+                            'size': {'type': 'integer'},
+                            'hits': {'type': 'integer'},
+                            'replays': {'type': 'integer'}
+                        }
+                    }
                 }
             }
         },
@@ -278,20 +771,32 @@ def login_manager():
     }
 })
 def view_system_statistics():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM customers")
-    total_customers = cursor.fetchone()[0]
-    cursor.execute("SELECT COUNT(*) FROM transactions")
-    total_transactions = cursor.fetchone()[0]
-    cursor.execute("SELECT SUM(balance) FROM customers")
-    total_balance = cursor.fetchone()[0] or 0.0
-    close_db(conn)
-    return jsonify({
-        'total_customers': total_customers,
-        'total_transactions': total_transactions,
-        'total_balance': total_balance
-    }), 200
+    stats = get_storage().stats()
+    stats['total_balance'] = from_cents(stats['total_balance'])
+    stats['auth_token_cache'] = token_cache.stats()
+    stats['idempotency_cache'] = idempotency_store.stats()
+    return jsonify(stats), 200
+
+
+@app.route('/managers/metrics/', methods=['GET'])
+@token_required('manager')
+@swag_from({
+    'tags': ['Manager Operations'],
+    'summary': 'Per-route request metrics in Prometheus text format.',
+    'description': 'Request counts by route, method and status, plus latency histograms for whole requests '
+                   'and for their auth, db and serialize phases. Counters are per worker process.',
+    'security': [{"BearerAuth": []}],
+    'produces': ['text/plain'],
+    'responses': {
+        200: {'description': 'Prometheus text exposition format (version 0.0.4).'},
+        401: {'description': 'Token is missing or invalid.'},
+        404: {'description': 'Metrics are disabled (BANK_METRICS=0).'}
+    }
+})
+def view_metrics():
+    if not app.config['METRICS']:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(request_metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 
 @app.route('/managers/customers/', methods=['GET'])
@@ -300,6 +805,17 @@ def view_system_statistics():
     'tags': ['Manager Operations'],
     'summary': 'List all customers.',
     'security': [{"BearerAuth": []}],
+    'produces': ['application/json', 'application/x-ndjson'],
+    'parameters': [
+        {
+            'name': 'stream',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['1'],
+            'required': False,
+            'description': 'Set to 1 (or send Accept: application/x-ndjson) to stream every row as NDJSON.'
+        }
+    ],
     'responses': {
         200: {
             'description': 'A list of customers.',
@@ -319,12 +835,10 @@ def view_system_statistics():
     }
 })
 def list_customers():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT account_id, name, email FROM customers")
-    customers = [dict(row) for row in cursor.fetchall()]
-    close_db(conn)
-    return jsonify(customers), 200
+    customers = get_storage().customers()
+    if wants_stream():
+        return stream_rows(customers)
+    return jsonify(list(customers)), 200
 
 
 @app.route('/managers/customers/search/', methods=['GET'])
@@ -339,15 +853,14 @@ def list_customers():
             'in': 'query',
             'type': 'string',
             'required': False,
-            'description': 'Part of customer name to search for.'
+            'description': 'Part of customer name to search for (case-insensitive).'
         },
         {
             'name': 'email',
             'in': 'query',
             'type': 'string',
-            'format': 'email',
             'required': False,
-            'description': 'Exact customer email to search for.'
+            'description': 'Part of customer email to search for (case-insensitive).'
         },
         {
             'name': 'account_id',
@@ -355,23 +868,55 @@ def list_customers():
             'type': 'integer',
             'required': False,
             'description': 'Exact customer account ID to search for.'
+        },
+        {
+            'name': 'match',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['contains', 'prefix'],
+            'default': 'contains',
+            'required': False,
+            'description': 'Whether name and email match anywhere in the value or only at its start.'
+        },
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'default': 100,
+            'description': 'Maximum number of customers to return (1-1000).'
+        },
+        {
+            'name': 'cursor',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'The next_cursor value from the previous page.'
         }
     ],
     'responses': {
         200: {
-            'description': 'A list of matching customers.',
+            'description': 'A page of matching customers, ordered by account ID.',
             'schema': {
-                'type': 'array',
-                'items': {
-                    'type': 'object',
-                    'properties': {
-                        'account_id': {'type': 'integer'},
-                        'name': {'type': 'string'},
-                        'email': {'type': 'string', 'format': 'email'}
-                    }
+                'type': 'object',
+                'properties': {
+                    'customers': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'account_id': {'type': 'integer'},
+                                'name': {'type': 'string'},
+                                'email': {'type': 'string', 'format': 'email'}
+                            }
+                        }
+                    },
+                    'next_cursor': {'type': 'string', 'x-nullable': True,
+                                    'description': 'Cursor for the next page, null on the last page.'}
                 }
             }
         },
+        400: {'description': 'Invalid account_id, match, limit or cursor.'},
         401: {'description': 'Token is missing or invalid.'}
     }
 })
@@ -379,24 +924,81 @@ def search_customers():
     name = request.args.get('name')
     email = request.args.get('email')
     account_id_str = request.args.get('account_id')
-    account_id = int(account_id_str) if account_id_str else None
-    conn = get_db()
-    cursor = conn.cursor()
-    query = "SELECT account_id, name, email FROM customers WHERE 1=1"
-    params = []
-    if name:
-        query += " AND name LIKE ?"
-        params.append(f"%{name}%")
-    if email:
-        query += " AND email = ?"
-        params.append(email)
-    if account_id:
-        query += " AND account_id = ?"
-        params.append(account_id)
-    cursor.execute(query, params)
-    customers = [dict(row) for row in cursor.fetchall()]
-    close_db(conn)
-    return jsonify(customers), 200
+    try:
+        account_id = int(account_id_str) if account_id_str else None
+    except ValueError:
+        return jsonify({'error': 'Invalid account_id. Must be an integer.'}), 400
+    match_mode = request.args.get('match', 'contains')
+    if match_mode not in ('contains', 'prefix'):
+        return jsonify({'error': "Invalid match. Must be 'contains' or 'prefix'."}), 400
+    try:
+        limit, after = parse_page_args(int)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    rows = get_storage().search_customers(name, email, account_id, prefix=match_mode == 'prefix',
+                                          after=after[0] if after else None, limit=limit + 1)
+    next_cursor = encode_cursor(rows[limit - 1]['account_id']) if len(rows) > limit else None
+    return jsonify({'customers': rows[:limit], 'next_cursor': next_cursor}), 200
+
+
+@app.route('/managers/customers/import/', methods=['POST'])
+@token_required('manager')
+@swag_from({
+    'tags': ['Manager Operations'],
+    'summary': 'Bulk import customers from CSV or NDJSON.',
+    'description': 'The request body is streamed and inserted in chunks. Rows with missing fields, invalid initial '
+                   'deposits or emails that are duplicated or already registered are skipped and reported by line '
+                   'number; all other rows are imported. CSV needs a header row with name, email, password and '
+                   'optionally initial_deposit; NDJSON needs one object with the same keys per line.',
+    'security': [{"BearerAuth": []}],
+    'consumes': ['text/csv', 'application/x-ndjson'],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {'type': 'string', 'example': 'name,email,password,initial_deposit\n'
+                                                    'Jane Doe,jane@example.com,secret,100.00'}
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Import finished; failed rows are listed in errors.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'imported': {'type': 'integer'},
+                    'failed': {'type': 'integer'},
+                    'errors': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'line': {'type': 'integer'},
+                                'error': {'type': 'string'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        400: {'description': 'Request body could not be decoded.'},
+        401: {'description': 'Token is missing or invalid.'},
+        415: {'description': 'Content-Type is not text/csv or application/x-ndjson.'}
+    }
+})
+def import_customers():
+    formats = {'text/csv': 'csv', 'application/x-ndjson': 'ndjson', 'application/jsonl': 'ndjson'}
+    file_format = formats.get(request.mimetype)
+    if file_format is None:
+        return jsonify({'error': 'Content-Type must be text/csv or application/x-ndjson'}), 415
+    lines = io.TextIOWrapper(request.stream, encoding=request.mimetype_params.get('charset', 'utf-8'), newline='')
+    try:
+        report = get_storage().import_customers(customer_import.read_rows(lines, file_format))
+    except UnicodeDecodeError as e:
+        # Chunks before the undecodable part have already been committed
+        return jsonify({'error': f'Request body is not valid text: {e}'}), 400
+    return jsonify(report), 200
 
 
 @app.route('/managers/customers/<int:customer_id>/transactions/', methods=['GET'])
@@ -412,37 +1014,55 @@ def search_customers():
             'type': 'integer',
             'required': True,
             'description': "The ID of the customer whose transactions to view."
+        },
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'default': 100,
+            'description': 'Maximum number of transactions to return (1-1000).'
+        },
+        {
+            'name': 'cursor',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'The next_cursor value from the previous page.'
         }
     ],
     'responses': {
         200: {
-            'description': "A list of the customer's transactions.",
+            'description': "A page of the customer's transactions, most recent first.",
             'schema': {
-                'type': 'array',
-                'items': {
-                    'type': 'object',
-                    'properties': {
-                        'transaction_id': {'type': 'integer'},
-                        'account_id': {'type': 'integer'},
-                        'transaction_type': {'type': 'string',
-                                             'enum': ['deposit', 'withdrawal', 'transfer_in', 'transfer_out']},
-                        'amount': {'type': 'number', 'format': 'float'},
-                        'timestamp': {'type': 'string', 'format': 'date-time'},
-                        'description': {'type': 'string'}
-                    }
+                'type': 'object',
+                'properties': {
+                    'transactions': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'transaction_id': {'type': 'integer'},
+                                'account_id': {'type': 'integer'},
+                                'transaction_type': {'type': 'string',
+                                                     'enum': ['deposit', 'withdrawal', 'transfer_in', 'transfer_out']},
+                                'amount': {'type': 'number', 'format': 'float'},
+                                'timestamp': {'type': 'string', 'format': 'date-time'},
+                                'description': {'type': 'string'}
+                            }
+                        }
+                    },
+                    'next_cursor': {'type': 'string', 'x-nullable': True,
+                                    'description': 'Cursor for the next page, null on the last page.'}
                 }
             }
         },
+        400: {'description': 'Invalid limit or cursor.'},
         401: {'description': 'Token is missing or invalid.'}
     }
 })
 def view_customer_transactions(customer_id):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM transactions WHERE account_id = ?", (customer_id,))
-    transactions = [dict(row) for row in cursor.fetchall()]
-    close_db(conn)
-    return jsonify(transactions), 200
+    return transaction_page(account_id=customer_id)
 
 
 @app.route('/managers/transactions/', methods=['GET'])
@@ -451,36 +1071,68 @@ def view_customer_transactions(customer_id):
     'tags': ['Manager Operations'],
     'summary': 'View all transactions in the system.',
     'security': [{"BearerAuth": []}],
+    'produces': ['application/json', 'application/x-ndjson'],
+    'parameters': [
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'default': 100,
+            'description': 'Maximum number of transactions to return (1-1000).'
+        },
+        {
+            'name': 'cursor',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'The next_cursor value from the previous page.'
+        },
+        {
+            'name': 'stream',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['1'],
+            'required': False,
+            'description': 'Set to 1 (or send Accept: application/x-ndjson) to stream every row as NDJSON.'
+        }
+    ],
     'responses': {
         200: {
-            'description': 'A list of all transactions.',
+            'description': 'A page of all transactions, most recent first.',
             'schema': {
-                'type': 'array',
-                'items': {
-                    'type': 'object',
-                    'properties': {
-                        'transaction_id': {'type': 'integer'},
-                        'account_id': {'type': 'integer'},
-                        'transaction_type': {'type': 'string',
-                                             'enum': ['deposit', 'withdrawal', 'transfer_in', 'transfer_out',
-                                                      'Initial deposit']},
-                        'amount': {'type': 'number', 'format': 'float'},
-                        'timestamp': {'type': 'string', 'format': 'date-time'},
-                        'description': {'type': 'string'}
-                    }
+                'type': 'object',
+                'properties': {
+                    'transactions': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'transaction_id': {'type': 'integer'},
+                                'account_id': {'type': 'integer'},
+                                'transaction_type': {'type': 'string',
+                                                     'enum': ['deposit', 'withdrawal', 'transfer_in', 'transfer_out',
+                                                              'Initial deposit']},
+                                'amount': {'type': 'number', 'format': 'float'},
+                                'timestamp': {'type': 'string', 'format': 'date-time'},
+                                'description': {'type': 'string'}
+                            }
+                        }
+                    },
+                    'next_cursor': {'type': 'string', 'x-nullable': True,
+                                    'description': 'Cursor for the next page, null on the last page.'}
                 }
             }
         },
+        400: {'description': 'Invalid limit or cursor.'},
         401: {'description': 'Token is missing or invalid.'}
     }
 })
 def view_all_transactions():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM transactions")
-    transactions = [dict(row) for row in cursor.fetchall()]
-    close_db(conn)
-    return jsonify(transactions), 200
+    if wants_stream():
+        # Full export in ledger order, for reconciliation jobs
+        return stream_rows(get_storage().all_transactions(), transaction_json)
+    return transaction_page()
 
 
 @app.route('/managers/logout/', methods=['POST'])
@@ -496,11 +1148,11 @@ def view_all_transactions():
 })
 def manager_logout():
     auth_token = request.headers.get('Authorization').split(' ')[1]
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE managers SET auth_token = NULL WHERE auth_token = ?", (auth_token,))
-    conn.commit()
-    close_db(conn)
+    if is_signed_token(auth_token):
+        revoke_signed_token(auth_token)  # Ends this session only
+        return jsonify({'message': 'Manager logged out'}), 200
+    get_storage().end_session('manager', auth_token)
+    token_cache.invalidate(auth_token)
     return jsonify({'message': 'Manager logged out'}), 200
 
 
@@ -538,7 +1190,7 @@ def manager_logout():
                 }
             }
         },
-        400: {'description': 'Required fields missing or email already registered.'}
+        400: {'description': 'Required fields missing, invalid initial deposit or email already registered.'}
     }
 })
 def register_customer():
@@ -549,21 +1201,13 @@ def register_customer():
     initial_deposit = data.get('initial_deposit', 0.0)
     if not name or not email or not password:
         return jsonify({'error': 'Name, email, and password are required'}), 400
-    conn = get_db()
-    cursor = conn.cursor()
-    if cursor.execute("SELECT * FROM customers WHERE email = ?", (email,)).fetchone():
-        close_db(conn)
-        return jsonify({'error': 'Email already registered'}), 400
-    cursor.execute("INSERT INTO customers (name, email, password, balance) VALUES (?, ?, ?, ?)",
-                   (name, email, password, initial_deposit))  # In real app, hash password
-    account_id = cursor.lastrowid
-    if initial_deposit > 0:  # Only record initial deposit if it's greater than 0
-        cursor.execute(
-            "INSERT INTO transactions (account_id, transaction_type, amount, timestamp, description) VALUES (?, ?, ?, ?, ?)",
-            (account_id, 'deposit', initial_deposit, datetime.now(), 'Initial deposit'))
-    conn.commit()
-    close_db(conn)
-    return jsonify({'message': 'Customer registered successfully', 'account_id': account_id}), 201
+    try:
+        initial_deposit_cents = to_cents(initial_deposit)
+    except ValueError:
+        initial_deposit_cents = -1
+    if initial_deposit_cents < 0:
+        return jsonify({'error': 'Invalid initial deposit amount'}), 400
+    return write_response(apply_registration, name, email, password, initial_deposit_cents)
 
 
 @app.route('/customers/login/', methods=['POST'])
@@ -592,6 +1236,8 @@ def register_customer():
                 'type': 'object',
                 'properties': {
                     'access_token': {'type': 'string'},
+                    'expires_in': {'type': 'integer',
+                                   'description': 'Token lifetime in seconds (signed tokens only).'},
                     'account_id': {'type': 'integer'}
                 }
             }
@@ -606,17 +1252,17 @@ def login_customer():
     password = data.get('password')
     if not email or not password:
         return jsonify({'error': 'Email and password are required'}), 400
-    conn = get_db()
-    cursor = conn.cursor()
-    customer = cursor.execute("SELECT * FROM customers WHERE email = ? AND password = ?",
-                              (email, password)).fetchone()  # In real app, compare hashed password
-    if customer:
+    store = get_storage()
+    account_id = store.check_customer(email, password)
+    if account_id is not None and app.config['AUTH_TOKENS'] == 'signed':
+        body = issue_signed_token('customer', account_id)  # Earlier sessions stay valid
+        body['account_id'] = account_id
+        return jsonify(body), 200
+    if account_id is not None:
         auth_token = secrets.token_hex(32)
-        cursor.execute("UPDATE customers SET auth_token = ? WHERE account_id = ?", (auth_token, customer['account_id']))
-        conn.commit()
-        close_db(conn)
-        return jsonify({'access_token': auth_token, 'account_id': customer['account_id']}), 200
-    close_db(conn)
+        store.start_session('customer', account_id, auth_token)
+        token_cache.invalidate_principal('customer', account_id)  # The previous token is no longer valid
+        return jsonify({'access_token': auth_token, 'account_id': account_id}), 200
     return jsonify({'error': 'Invalid credentials'}), 401
 
 
@@ -641,12 +1287,9 @@ def login_customer():
     }
 })
 def view_balance(current_customer_id):
-    conn = get_db()
-    cursor = conn.cursor()
-    customer = cursor.execute("SELECT balance FROM customers WHERE account_id = ?", (current_customer_id,)).fetchone()
-    close_db(conn)
-    if customer:
-        return jsonify({'balance': customer['balance']}), 200
+    balance = get_storage().balance(current_customer_id)
+    if balance is not None:
+        return jsonify({'balance': from_cents(balance)}), 200
     return jsonify({'error': 'Customer not found'}), 404
 
 
@@ -657,6 +1300,14 @@ def view_balance(current_customer_id):
     'summary': 'Deposit funds into account.',
     'security': [{"BearerAuth": []}],
     'parameters': [
+        {
+            'name': 'Idempotency-Key',
+            'in': 'header',
+            'type': 'string',
+            'required': False,
+            'description': 'Client-chosen key (max 255 characters). Retrying with the same key and body returns the '
+                           'stored response instead of repeating the operation.'
+        },
         {
             'name': 'body',
             'in': 'body',
@@ -665,7 +1316,7 @@ def view_balance(current_customer_id):
                 'type': 'object',
                 'properties': {
                     'amount': {'type': 'number', 'format': 'float', 'example': 50.25,
-                               'description': 'Amount to deposit, must be positive.'}
+                               'description': 'Amount to deposit, must be positive with at most two decimal places.'}
                 },
                 'required': ['amount']
             }
@@ -680,34 +1331,25 @@ def view_balance(current_customer_id):
                     'message': {'type': 'string'},
                     'new_balance': {'type': 'number', 'format': 'float'}
                 }
+            },
+            'headers': {
+                'Idempotent-Replayed': {'type': 'string',
+                                        'description': 'Set to true when the response was replayed for a retry.'}
             }
         },
         400: {'description': 'Invalid deposit amount.'},
         401: {'description': 'Token is missing or invalid.'},
-        500: {'description': 'Database error.'}
+        422: {'description': 'Idempotency-Key was already used with a different request.'},
+        500: {'description': 'Database error.'},
+        503: {'description': 'Timed out waiting for the database writer (write queue enabled).'}
     }
 })
 def deposit(current_customer_id):
     data = request.get_json()
-    amount = data.get('amount')
-    if amount is None or not isinstance(amount, (int, float)) or amount <= 0:  # Added type check
+    amount = parse_amount(data.get('amount'))
+    if amount is None:
         return jsonify({'error': 'Invalid deposit amount'}), 400
-    conn = get_db()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("UPDATE customers SET balance = balance + ? WHERE account_id = ?", (amount, current_customer_id))
-        cursor.execute("INSERT INTO transactions (account_id, transaction_type, amount, timestamp, description) "
-                       "VALUES (?, ?, ?, ?, ?)",
-                       (current_customer_id, 'deposit', amount, datetime.now(), 'Deposit'))
-        conn.commit()
-        cursor.execute("SELECT balance FROM customers WHERE account_id = ?", (current_customer_id,))
-        new_balance = cursor.fetchone()[0]
-        return jsonify({'message': 'Deposit successful', 'new_balance': new_balance}), 200
-    except sqlite3.Error as e:
-        conn.rollback()
-        return jsonify({'error': f'Database error: {e}'}), 500
-    finally:
-        close_db(conn)
+    return idempotent_write_response(current_customer_id, apply_deposit, amount)
 
 
 @app.route('/customers/me/withdraw/', methods=['POST'])
@@ -717,6 +1359,14 @@ def deposit(current_customer_id):
     'summary': 'Withdraw funds from account.',
     'security': [{"BearerAuth": []}],
     'parameters': [
+        {
+            'name': 'Idempotency-Key',
+            'in': 'header',
+            'type': 'string',
+            'required': False,
+            'description': 'Client-chosen key (max 255 characters). Retrying with the same key and body returns the '
+                           'stored response instead of repeating the operation.'
+        },
         {
             'name': 'body',
             'in': 'body',
@@ -725,7 +1375,7 @@ def deposit(current_customer_id):
                 'type': 'object',
                 'properties': {
                     'amount': {'type': 'number', 'format': 'float', 'example': 20.00,
-                               'description': 'Amount to withdraw, must be positive.'}
+                               'description': 'Amount to withdraw, must be positive with at most two decimal places.'}
                 },
                 'required': ['amount']
             }
@@ -740,42 +1390,25 @@ def deposit(current_customer_id):
                     'message': {'type': 'string'},
                     'new_balance': {'type': 'number', 'format': 'float'}
                 }
+            },
+            'headers': {
+                'Idempotent-Replayed': {'type': 'string',
+                                        'description': 'Set to true when the response was replayed for a retry.'}
             }
         },
         400: {'description': 'Invalid withdrawal amount or insufficient funds.'},
         401: {'description': 'Token is missing or invalid.'},
-        500: {'description': 'Database error.'}
+        422: {'description': 'Idempotency-Key was already used with a different request.'},
+        500: {'description': 'Database error.'},
+        503: {'description': 'Timed out waiting for the database writer (write queue enabled).'}
     }
 })
 def withdraw(current_customer_id):
     data = request.get_json()
-    amount = data.get('amount')
-    if amount is None or not isinstance(amount, (int, float)) or amount <= 0:  # Added type check
+    amount = parse_amount(data.get('amount'))
+    if amount is None:
         return jsonify({'error': 'Invalid withdrawal amount'}), 400
-    conn = get_db()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT balance FROM customers WHERE account_id = ?", (current_customer_id,))
-        current_balance_row = cursor.fetchone()
-        if not current_balance_row:  # Should not happen due to token_required, but good practice
-            return jsonify({'error': 'Customer not found'}), 404
-        current_balance = current_balance_row[0]
-
-        if current_balance < amount:
-            return jsonify({'error': 'Insufficient funds'}), 400
-        cursor.execute("UPDATE customers SET balance = balance - ? WHERE account_id = ?", (amount, current_customer_id))
-        cursor.execute(
-            "INSERT INTO transactions (account_id, transaction_type, amount, timestamp, description) VALUES (?, ?, ?, ?, ?)",
-            (current_customer_id, 'withdrawal', amount, datetime.now(), 'Withdrawal'))
-        conn.commit()
-        cursor.execute("SELECT balance FROM customers WHERE account_id = ?", (current_customer_id,))
-        new_balance = cursor.fetchone()[0]
-        return jsonify({'message': 'Withdrawal successful', 'new_balance': new_balance}), 200
-    except sqlite3.Error as e:
-        conn.rollback()
-        return jsonify({'error': f'Database error: {e}'}), 500
-    finally:
-        close_db(conn)
+    return idempotent_write_response(current_customer_id, apply_withdrawal, amount)
 
 
 @app.route('/customers/me/transfer/', methods=['POST'])
@@ -785,6 +1418,14 @@ def withdraw(current_customer_id):
     'summary': 'Transfer funds to another customer account.',
     'security': [{"BearerAuth": []}],
     'parameters': [
+        {
+            'name': 'Idempotency-Key',
+            'in': 'header',
+            'type': 'string',
+            'required': False,
+            'description': 'Client-chosen key (max 255 characters). Retrying with the same key and body returns the '
+                           'stored response instead of repeating the operation.'
+        },
         {
             'name': 'body',
             'in': 'body',
@@ -795,7 +1436,7 @@ def withdraw(current_customer_id):
                     'recipient_account_id': {'type': 'integer', 'example': 2,
                                              'description': 'Account ID of the recipient.'},
                     'amount': {'type': 'number', 'format': 'float', 'example': 25.75,
-                               'description': 'Amount to transfer, must be positive.'}
+                               'description': 'Amount to transfer, must be positive with at most two decimal places.'}
                 },
                 'required': ['recipient_account_id', 'amount']
             }
@@ -810,65 +1451,129 @@ def withdraw(current_customer_id):
                     'message': {'type': 'string'},
                     'new_balance': {'type': 'number', 'format': 'float'}
                 }
+            },
+            'headers': {
+                'Idempotent-Replayed': {'type': 'string',
+                                        'description': 'Set to true when the response was replayed for a retry.'}
             }
         },
         400: {
             'description': 'Invalid request (missing fields, invalid amount, transfer to own account, insufficient funds).'},
         401: {'description': 'Token is missing or invalid.'},
         404: {'description': 'Recipient account not found.'},
-        500: {'description': 'Database error.'}
+        422: {'description': 'Idempotency-Key was already used with a different request.'},
+        500: {'description': 'Database error.'},
+        503: {'description': 'Timed out waiting for the database writer (write queue enabled).'}
     }
 })
 def transfer(current_customer_id):
     data = request.get_json()
     recipient_account_id = data.get('recipient_account_id')
-    amount = data.get('amount')
-    if recipient_account_id is None or amount is None or not isinstance(amount, (
-    int, float)) or amount <= 0:  # Added type check
+    amount = parse_amount(data.get('amount'))
+    if not isinstance(recipient_account_id, int) or isinstance(recipient_account_id, bool) or amount is None:
         return jsonify({'error': 'Recipient account ID and a valid amount are required'}), 400
     if recipient_account_id == current_customer_id:
         return jsonify({'error': 'Cannot transfer to your own account'}), 400
+    return idempotent_write_response(current_customer_id, apply_transfer, recipient_account_id, amount)
 
-    conn = get_db()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT balance FROM customers WHERE account_id = ?", (current_customer_id,))
-        sender_balance_row = cursor.fetchone()
-        if not sender_balance_row:  # Should not happen
-            return jsonify({'error': 'Sender account not found'}), 404  # Should be caught by token_required
-        sender_balance = sender_balance_row[0]
-
-        if sender_balance < amount:
-            return jsonify({'error': 'Insufficient funds'}), 400
-
-        cursor.execute("SELECT account_id FROM customers WHERE account_id = ?",
-                       (recipient_account_id,))  # Check only for existence
-        recipient = cursor.fetchone()
-        if not recipient:
-            return jsonify({'error': 'Recipient account not found'}), 404
-
-        # Perform transactions
-        cursor.execute("UPDATE customers SET balance = balance - ? WHERE account_id = ?", (amount, current_customer_id))
-        cursor.execute("UPDATE customers SET balance = balance + ? WHERE account_id = ?",
-                       (amount, recipient_account_id))
-        timestamp = datetime.now()
-        cursor.execute(
-            "INSERT INTO transactions (account_id, transaction_type, amount, timestamp, description) VALUES (?, ?, ?, ?, ?)",
-            (current_customer_id, 'transfer_out', amount, timestamp, f'Transfer to account {recipient_account_id}'))
-        cursor.execute(
-            "INSERT INTO transactions (account_id, transaction_type, amount, timestamp, description) VALUES (?, ?, ?, ?, ?)",
-            (recipient_account_id, 'transfer_in', amount, timestamp, f'Transfer from account {current_customer_id}'))
-        conn.commit()
 
-        cursor.execute("SELECT balance FROM customers WHERE account_id = ?", (current_customer_id,))
-        new_balance = cursor.fetchone()[0]
-        return jsonify({'message': f'Transfer of {amount} successful to account {recipient_account_id}',
-                        'new_balance': new_balance}), 200
-    except sqlite3.Error as e:
-        conn.rollback()
-        return jsonify({'error': f'Database error: {e}'}), 500
-    finally:
-        close_db(conn)
+@app.route('/customers/me/transfers/batch/', methods=['POST'])
+@token_required('customer')
+@swag_from({
+    'tags': ['Customer Account'],
+    'summary': 'Transfer funds to many customer accounts in one atomic batch.',
+    'description': 'Either every transfer in the batch is applied or none is. The response lists the outcome of '
+                   'each transfer in request order.',
+    'security': [{"BearerAuth": []}],
+    'parameters': [
+        {
+            'name': 'Idempotency-Key',
+            'in': 'header',
+            'type': 'string',
+            'required': False,
+            'description': 'Client-chosen key (max 255 characters). Retrying with the same key and body returns the '
+                           'stored response instead of repeating the operation.'
+        },
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'transfers': {
+                        'type': 'array',
+                        'maxItems': MAX_BATCH_TRANSFERS,
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'recipient_account_id': {'type': 'integer', 'example': 2},
+                                'amount': {'type': 'number', 'format': 'float', 'example': 1250.00}
+                            },
+                            'required': ['recipient_account_id', 'amount']
+                        }
+                    }
+                },
+                'required': ['transfers']
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Every transfer was applied.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'message': {'type': 'string'},
+                    'new_balance': {'type': 'number', 'format': 'float'},
+                    'results': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'index': {'type': 'integer'},
+                                'recipient_account_id': {'type': 'integer'},
+                                'amount': {'type': 'number', 'format': 'float'},
+                                'status': {'type': 'string', 'enum': ['completed', 'rejected', 'not_applied']},
+                                'error': {'type': 'string'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        400: {'description': 'Malformed batch or insufficient funds; rejected items are listed in results.'},
+        401: {'description': 'Token is missing or invalid.'},
+        404: {'description': 'One or more recipient accounts not found; they are listed in results.'},
+        422: {'description': 'Idempotency-Key was already used with a different request.'},
+        500: {'description': 'Database error.'},
+        503: {'description': 'Timed out waiting for the database writer (write queue enabled).'}
+    }
+})
+def batch_transfer(current_customer_id):
+    data = request.get_json()
+    items = data.get('transfers') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'transfers must be a non-empty list'}), 400
+    if len(items) > MAX_BATCH_TRANSFERS:
+        return jsonify({'error': f'At most {MAX_BATCH_TRANSFERS} transfers per batch'}), 400
+
+    # Validate every item before touching the database, so one response lists every problem
+    transfers, sent, errors = [], [], {}
+    for index, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        recipient_id = item.get('recipient_account_id')
+        amount = parse_amount(item.get('amount'))
+        if not isinstance(recipient_id, int) or isinstance(recipient_id, bool) or amount is None:
+            errors[index] = 'Recipient account ID and a valid amount are required'
+        elif recipient_id == current_customer_id:
+            errors[index] = 'Cannot transfer to your own account'
+        transfers.append((recipient_id, amount))
+        sent.append((recipient_id, item.get('amount')))
+    if errors:
+        return jsonify({'error': 'Batch rejected, no transfers were applied',
+                        'results': batch_results(sent, errors, applied=False)}), 400
+    return idempotent_write_response(current_customer_id, apply_batch_transfer, transfers)
 
 
 @app.route('/customers/me/transactions/', methods=['GET'])
@@ -877,34 +1582,54 @@ def transfer(current_customer_id):
     'tags': ['Customer Transactions'],
     'summary': 'View own transaction history.',
     'security': [{"BearerAuth": []}],
+    'parameters': [
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'default': 100,
+            'description': 'Maximum number of transactions to return (1-1000).'
+        },
+        {
+            'name': 'cursor',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'The next_cursor value from the previous page.'
+        }
+    ],
     'responses': {
         200: {
-            'description': 'A list of own transactions, ordered by most recent first.',
+            'description': 'A page of own transactions, ordered by most recent first.',
             'schema': {
-                'type': 'array',
-                'items': {
-                    'type': 'object',
-                    'properties': {
-                        'transaction_id': {'type': 'integer'},
-                        'account_id': {'type': 'integer'},
-                        'transaction_type': {'type': 'string'},
-                        'amount': {'type': 'number', 'format': 'float'},
-                        'timestamp': {'type': 'string', 'format': 'date-time'},
-                        'description': {'type': 'string'}
-                    }
+                'type': 'object',
+                'properties': {
+                    'transactions': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'transaction_id': {'type': 'integer'},
+                                'account_id': {'type': 'integer'},
+                                'transaction_type': {'type': 'string'},
+                                'amount': {'type': 'number', 'format': 'float'},
+                                'timestamp': {'type': 'string', 'format': 'date-time'},
+                                'description': {'type': 'string'}
+                            }
+                        }
+                    },
+                    'next_cursor': {'type': 'string', 'x-nullable': True,
+                                    'description': 'Cursor for the next page, null on the last page.'}
                 }
             }
         },
+        400: {'description': 'Invalid limit or cursor.'},
         401: {'description': 'Token is missing or invalid.'}
     }
 })
 def view_transaction_history(current_customer_id):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM transactions WHERE account_id = ? ORDER BY timestamp DESC", (current_customer_id,))
-    transactions = [dict(row) for row in cursor.fetchall()]
-    close_db(conn)
-    return jsonify(transactions), 200
+    return transaction_page(account_id=current_customer_id)
 
 
 @app.route('/customers/me/transactions/filter/', methods=['GET'])
@@ -928,7 +1653,7 @@ def view_transaction_history(current_customer_id):
             'type': 'string',
             'format': 'date',  # YYYY-MM-DD
             'required': False,
-            'description': 'End date for filtering (YYYY-MM-DD). Add T23:59:59 for full day.'
+            'description': 'End date for filtering (YYYY-MM-DD), inclusive of the whole day.'
         },
         {
             'name': 'transaction_type',
@@ -937,10 +1662,26 @@ def view_transaction_history(current_customer_id):
             'enum': ['deposit', 'withdrawal', 'transfer_in', 'transfer_out', 'Initial deposit'],
             'required': False,
             'description': 'Type of transaction to filter by.'
+        },
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'default': 100,
+            'description': 'Maximum number of transactions to return (1-1000).'
+        },
+        {
+            'name': 'cursor',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'The next_cursor value from the previous page.'
         }
     ],
     'responses': {
-        200: {'description': 'A list of filtered transactions.'},  # Schema same as /me/transactions/
+        200: {'description': 'A page of filtered transactions.'},  # Schema same as /me/transactions/
+        400: {'description': 'Invalid date, transaction type, limit or cursor.'},
         401: {'description': 'Token is missing or invalid.'}
     }
 })
@@ -949,24 +1690,19 @@ def filter_transactions(current_customer_id):
     end_date_str = request.args.get('end_date')
     transaction_type = request.args.get('transaction_type')
 
-    conn = get_db()
-    cursor = conn.cursor()
-    query = "SELECT * FROM transactions WHERE account_id = ?"
-    params = [current_customer_id]
+    filters = {'account_id': current_customer_id}
 
     if start_date_str:
         try:
-            datetime.strptime(start_date_str, '%Y-%m-%d')  # Validate date format
-            query += " AND DATE(timestamp) >= DATE(?)"  # Compare dates
-            params.append(start_date_str)
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d')  # Validate date format
+            filters['since'] = format_timestamp(start_date)
         except ValueError:
             return jsonify({'error': 'Invalid start_date format. Use YYYY-MM-DD.'}), 400
 
     if end_date_str:
         try:
-            datetime.strptime(end_date_str, '%Y-%m-%d')  # Validate date format
-            query += " AND DATE(timestamp) <= DATE(?)"  # Compare dates
-            params.append(end_date_str)
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d')  # Validate date format
+            filters['until'] = format_timestamp(end_date + timedelta(days=1))  # Inclusive of the whole end day
         except ValueError:
             return jsonify({'error': 'Invalid end_date format. Use YYYY-MM-DD.'}), 400
 
@@ -974,14 +1710,9 @@ def filter_transactions(current_customer_id):
         valid_types = ['deposit', 'withdrawal', 'transfer_in', 'transfer_out', 'Initial deposit']
         if transaction_type not in valid_types:
             return jsonify({'error': f'Invalid transaction_type. Must be one of {valid_types}'}), 400
-        query += " AND transaction_type = ?"
-        params.append(transaction_type)
+        filters['transaction_type'] = transaction_type
 
-    query += " ORDER BY timestamp DESC"
-    cursor.execute(query, params)
-    transactions = [dict(row) for row in cursor.fetchall()]
-    close_db(conn)
-    return jsonify(transactions), 200
+    return transaction_page(**filters)
 
 
 @app.route('/customers/me/transactions/search/', methods=['GET'])
@@ -996,27 +1727,58 @@ def filter_transactions(current_customer_id):
             'in': 'query',
             'type': 'string',
             'required': True,
-            'description': 'Text to search for in transaction descriptions (case-insensitive).'
+            'description': 'Words to search for in transaction descriptions (case-insensitive). '
+                           'Every word must match the start of a word in the description.'
+        },
+        {
+            'name': 'order',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['recent', 'relevance'],
+            'default': 'recent',
+            'required': False,
+            'description': 'recent pages through matches newest first; relevance returns the best-ranked '
+                           'matches as a single page.'
+        },
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'default': 100,
+            'description': 'Maximum number of transactions to return (1-1000).'
+        },
+        {
+            'name': 'cursor',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'The next_cursor value from the previous page.'
         }
     ],
     'responses': {
-        200: {'description': 'A list of matching transactions.'},  # Schema same as /me/transactions/
+        200: {'description': 'A page of matching transactions.'},  # Schema same as /me/transactions/
+        400: {'description': 'Description missing, or invalid order, limit or cursor.'},
         401: {'description': 'Token is missing or invalid.'}
     }
 })
 def search_transactions(current_customer_id):
     description = request.args.get('description')
-    if not description:  # Ensure description is provided
+    if not description or not description.strip():  # Ensure description is provided
         return jsonify({'error': 'Description query parameter is required'}), 400
-    description = description.lower()
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT * FROM transactions WHERE account_id = ? AND LOWER(description) LIKE ? ORDER BY timestamp DESC",
-        (current_customer_id, f"%{description}%"))
-    transactions = [dict(row) for row in cursor.fetchall()]
-    close_db(conn)
-    return jsonify(transactions), 200
+    order = request.args.get('order', 'recent')
+    if order not in ('recent', 'relevance'):
+        return jsonify({'error': "Invalid order. Must be 'recent' or 'relevance'."}), 400
+    if order == 'relevance':
+        try:
+            limit, _ = parse_page_args(str, int)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        rows = get_storage().rank_transactions(current_customer_id, description, limit)
+        if rows is not None:
+            return jsonify({'transactions': [transaction_json(row) for row in rows], 'next_cursor': None}), 200
+        # The engine cannot rank (no FTS5 in this SQLite build, or in-memory): newest first
+    return transaction_page(account_id=current_customer_id, matching=description)
 
 
 @app.route('/customers/logout/', methods=['POST'])
@@ -1033,11 +1795,11 @@ def search_transactions(current_customer_id):
 def customer_logout(
         current_customer_id):  # current_customer_id is injected by token_required but not directly used here
     auth_token = request.headers.get('Authorization').split(' ')[1]
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE customers SET auth_token = NULL WHERE auth_token = ?", (auth_token,))
-    conn.commit()
-    close_db(conn)
+    if is_signed_token(auth_token):
+        revoke_signed_token(auth_token)  # Ends this session only
+        return jsonify({'message': 'Customer logged out'}), 200
+    get_storage().end_session('customer', auth_token)
+    token_cache.invalidate(auth_token)
     return jsonify({'message': 'Customer logged out'}), 200
 
 
@@ -1045,4 +1807,6 @@ def customer_logout(
 
 if __name__ == '__main__':
     # init_db() # Initialize DB when script runs directly, or rely on before_request
+    app.logger.setLevel('INFO')
+    log_db_profile()
     app.run(debug=True)
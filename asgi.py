@@ -0,0 +1,260 @@
+"""
+ASGI serving mode for the same Flask routes.
+
+An asyncio server (uvicorn, hypercorn, ...) owns the sockets, so an idle
+keep-alive client costs a coroutine rather than a thread. Each request's
+WSGI call is handed to a bounded executor: reads (GET, HEAD) to the reader pool
+(sized to the database connection pool), everything else to the writer
+pool (one thread by default, as SQLite admits one writer at a time).
+
+When an executor already has ASGI_MAX_PENDING requests still uploading,
+queued or running, new ones get 503 with Retry-After straight away instead
+of piling up. A request that has not produced its response headers within
+ASGI_REQUEST_TIMEOUT gets 504. If it had not started yet it is dropped;
+one already running finishes in the background, so a write may still be
+applied. Streamed responses are sent chunk by chunk as the executor
+produces them. Request bodies are not: each is read into memory before the
+view runs, so a large /managers/customers/import/ upload costs its full size
+in memory here, unlike under a WSGI server where the import reads it as a
+stream.
+
+Usage: uvicorn asgi:application  (or: python asgi.py [host] [port], needs uvicorn)
+"""
+
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import app as bank
+
+app = bank.app
+app.config['ASGI_WRITE_WORKERS'] = int(os.environ.get('BANK_ASGI_WRITE_WORKERS', 1))
+# Every request holds a pooled connection while it runs, so more readers would only queue in the pool
+app.config['ASGI_READ_WORKERS'] = int(os.environ.get(
+    'BANK_ASGI_READ_WORKERS', max(1, app.config['DB_POOL_SIZE'] - app.config['ASGI_WRITE_WORKERS'])))
+app.config['ASGI_MAX_PENDING'] = int(os.environ.get('BANK_ASGI_MAX_PENDING', 1024))  # Per executor
+app.config['ASGI_REQUEST_TIMEOUT'] = float(os.environ.get('BANK_ASGI_REQUEST_TIMEOUT', 30.0))
+app.logger.setLevel('INFO')  # This module is an entry point, like app.run(): report the startup settings
+bank.log_db_profile()
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class BoundedExecutor:
+    # A thread pool that refuses work past max_pending (queued plus running) instead of
+    # queueing without limit. pending is only touched on the event loop thread.
+    def __init__(self, workers, max_pending, name):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+
+    def reserve(self):
+        # Takes a slot for a request as soon as it arrives, so requests still uploading their
+        # bodies count too; False (and counted as rejected) when none is left
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return False
+        self.pending += 1
+        return True
+
+    def submit(self, function, *args):
+        # Runs function in the slot taken by reserve(), which is released when it finishes
+        loop = asyncio.get_running_loop()
+        future = self.pool.submit(function, *args)
+        future.add_done_callback(lambda _: loop.is_closed() or loop.call_soon_threadsafe(self.release))
+        return future
+
+    def release(self):
+        self.pending -= 1
+
+    def stats(self):
+        return {'pending': self.pending, 'rejected': self.rejected}
+
+
+readers = BoundedExecutor(app.config['ASGI_READ_WORKERS'], app.config['ASGI_MAX_PENDING'], 'bank-read')
+writers = BoundedExecutor(app.config['ASGI_WRITE_WORKERS'], app.config['ASGI_MAX_PENDING'], 'bank-write')
+
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),  # PEP 3333 "bytes as latin-1"
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            key = 'HTTP_' + name
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    # The body is already complete, however it arrived; without this Werkzeug reads
+    # a chunked (no Content-Length) request body as empty
+    environ['CONTENT_LENGTH'] = str(len(body))
+    environ['wsgi.input_terminated'] = True
+    return environ
+
+
+class Exchange:
+    # Hands one response from its worker thread to the event loop as ('start', status,
+    # headers), ('body', chunk)..., then ('end',) or ('error', exception). The worker runs the
+    # view and iterates the body itself, so a streamed response holds one thread and one
+    # pooled connection, never a connection without a thread. At most STREAM_WINDOW
+    # messages are in flight, so a slow client slows its own worker down.
+    STREAM_WINDOW = 8
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.messages = asyncio.Queue()
+        self.window = threading.Semaphore(self.STREAM_WINDOW)
+        self.abandoned = False  # Set by the loop on timeout or disconnect
+
+    def put(self, message):
+        # Worker side: False once nobody is listening any more
+        self.window.acquire()
+        if self.abandoned:
+            return False
+        self.loop.call_soon_threadsafe(self.messages.put_nowait, message)
+        return True
+
+    async def get(self):
+        message = await self.messages.get()
+        self.window.release()
+        return message
+
+    def abandon(self):
+        self.abandoned = True
+        self.window.release()  # Wakes a worker blocked in put()
+
+
+def run_wsgi(environ, exchange):
+    # Runs on an executor thread: the view, then its whole body
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        return lambda data: None  # The legacy write() callable; Flask never uses it
+
+    body = ()
+    try:
+        body = app.wsgi_app(environ, start_response)
+        if not exchange.put(('start', started['status'], started['headers'])):
+            return
+        for chunk in body:
+            if chunk and not exchange.put(('body', chunk)):
+                return
+        exchange.put(('end',))
+    except Exception as e:
+        exchange.put(('error', e))  # Re-raised on the event loop, where the server logs it
+    finally:
+        if hasattr(body, 'close'):
+            body.close()  # Ends stream_with_context, which releases the pooled connection
+
+
+async def read_body(receive):
+    # The whole request body, in memory: uploads such as the streaming customer import are
+    # buffered here before the view starts reading them
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def send_error(send, status, message, headers=()):
+    body = json.dumps({'error': message}).encode()
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'),
+                            (b'content-length', str(len(body)).encode())] + list(headers)})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def handle_http(scope, receive, send):
+    executor = readers if scope['method'] in READ_METHODS else writers
+    if not executor.reserve():
+        await send_error(send, 503, 'Server busy, retry shortly', [(b'retry-after', b'1')])
+        return
+    try:
+        body = await read_body(receive)
+        if body is None:
+            executor.release()
+            return  # Client went away before sending the whole request
+        exchange = Exchange(asyncio.get_running_loop())
+        future = executor.submit(run_wsgi, wsgi_environ(scope, body), exchange)
+    except BaseException:
+        executor.release()  # Cancelled while the body was arriving, or the pool is shut down
+        raise
+    try:
+        try:
+            message = await asyncio.wait_for(exchange.get(), app.config['ASGI_REQUEST_TIMEOUT'])
+        except asyncio.TimeoutError:
+            future.cancel()  # Dropped if it has not started; otherwise it stops at its first put()
+            await send_error(send, 504, 'Request timed out')
+            return
+        while message[0] != 'end':
+            if message[0] == 'error':
+                raise message[1]
+            if message[0] == 'start':
+                await send({'type': 'http.response.start', 'status': message[1], 'headers': message[2]})
+            else:
+                await send({'type': 'http.response.body', 'body': message[1], 'more_body': True})
+            message = await exchange.get()
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        exchange.abandon()
+
+
+async def handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if bank._write_queue is not None:
+                bank._write_queue.stop()
+            for executor in (readers, writers):
+                executor.pool.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http':
+        await handle_http(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
+    else:
+        raise ValueError(f"Unsupported ASGI scope type {scope['type']!r}")
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit('python asgi.py needs uvicorn (pip install uvicorn), or run application with any ASGI server')
+    uvicorn.run(application, host=sys.argv[1] if len(sys.argv) > 1 else '127.0.0.1',
+                port=int(sys.argv[2]) if len(sys.argv) > 2 else 8000)
@@ -0,0 +1,361 @@
+"""
+Reproducible benchmark of every API endpoint.
+
+Seeds a dataset through the API itself (a manager, --customers customers
+imported in bulk, then --history deposits, withdrawals and transfers per
+customer), so it works the same against either storage engine. Then it runs
+each scenario --requests times from --concurrency threads and prints
+throughput and p50/p95/p99 latency per scenario as JSON. Scenarios that
+replace sessions (logins) run last, so they do not invalidate the tokens
+the others use; logouts end sessions of principals created for them. Requests and their arguments are derived from --seed.
+
+By default requests go through the Flask test client against a fresh
+database in a temporary directory; the app is configured from the usual
+BANK_* environment variables, and --storage overrides BANK_STORAGE. With
+--url they go over HTTP to a running server instead, seeding its database.
+
+--compare adds each scenario's change against an earlier result file, in
+percent (positive is slower).
+
+Usage: python benchmark.py [--customers N] [--history N] [--requests N] [--concurrency N] [--seed N]
+                           [--storage sqlite|memory] [--url http://host:port] [--scenario NAME]...
+                           [--output FILE] [--compare FILE]
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from urllib.parse import urlencode, urlsplit
+
+FIRST_NAMES = ('Alice', 'Bob', 'Carol', 'David', 'Erin', 'Frank', 'Grace', 'Heidi', 'Ivan', 'Judy')
+LAST_NAMES = ('Smith', 'Jones', 'Taylor', 'Brown', 'Wilson', 'Evans', 'Thomas', 'Roberts')
+PASSWORD = 'benchmark-password'
+MANAGER = 'benchmark-manager'
+INITIAL_DEPOSIT = 100000  # Enough that no seeded or benchmarked withdrawal runs short
+
+
+# --- Transports ---
+
+class ClientTransport:
+    # The Flask test client, one per thread
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, token=None, json_body=None, data=None, content_type=None):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = client.open(path, method=method, headers=headers, json=json_body, data=data,
+                               content_type=content_type)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HTTPTransport:
+    # One keep-alive connection per thread
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.local = threading.local()
+
+    def request(self, method, path, token=None, json_body=None, data=None, content_type=None):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        if json_body is not None:
+            data, content_type = json.dumps(json_body).encode(), 'application/json'
+        if content_type:
+            headers['Content-Type'] = content_type
+        try:
+            conn.request(method, self.prefix + path, body=data, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self.local.conn = None
+            raise
+        try:
+            body = json.loads(payload) if payload else None
+        except ValueError:
+            body = None  # NDJSON exports, Prometheus text
+        return response.status, body
+
+
+# --- Seeding ---
+
+class Dataset:
+    def __init__(self):
+        self.manager_token = None
+        self.customers = []  # [(account_id, email, token)]
+        self._run = f'{os.getpid()}-{time.time_ns()}'  # Keeps names unique across runs against one server
+        self._names = itertools.count()
+
+    def unique_name(self):
+        # For principals created while benchmarking (registrations, logouts)
+        return f'bench-{self._run}-{next(self._names)}'
+
+
+def customer_email(seed, index):
+    return f'bench{seed}-{index}@example.com'
+
+
+def expect(result, *statuses):
+    status, body = result
+    if status not in statuses:
+        raise RuntimeError(f'Seeding failed with HTTP {status}: {body}')
+    return body
+
+
+def seed_dataset(transport, customers, history, seed):
+    rng = random.Random(seed)
+    dataset = Dataset()
+    # 400 when the manager exists already, as on a second run against the same server
+    expect(transport.request('POST', '/managers/register/',
+                             json_body={'username': MANAGER, 'password': PASSWORD}), 201, 400)
+    dataset.manager_token = expect(transport.request('POST', '/managers/login/', json_body={
+        'username': MANAGER, 'password': PASSWORD}), 200)['access_token']
+    rows = [json.dumps({'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                        'email': customer_email(seed, index), 'password': PASSWORD,
+                        'initial_deposit': INITIAL_DEPOSIT}) for index in range(customers)]
+    # Rows already imported by an earlier run fail as duplicates; their logins still work
+    expect(transport.request('POST', '/managers/customers/import/', token=dataset.manager_token,
+                             data='\n'.join(rows).encode(), content_type='application/x-ndjson'), 200)
+    for index in range(customers):
+        email = customer_email(seed, index)
+        body = expect(transport.request('POST', '/customers/login/',
+                                        json_body={'email': email, 'password': PASSWORD}), 200)
+        dataset.customers.append((body['account_id'], email, body['access_token']))
+    for _ in range(history):
+        for account_id, _, token in dataset.customers:
+            kind = rng.choice(('deposit', 'withdraw', 'transfer'))
+            body = {'amount': rng.randint(1, 500)}
+            if kind == 'transfer':
+                body['recipient_account_id'] = rng.choice(dataset.customers)[0]
+                if body['recipient_account_id'] == account_id:
+                    kind = 'deposit'
+            expect(transport.request('POST', f'/customers/me/{kind}/', token=token, json_body=body), 200)
+    return dataset
+
+
+# --- Scenarios ---
+# Each builds one request as (method, path, token, json_body) from its own Random; building is not timed
+
+def other_customer(rng, dataset, account_id):
+    while True:
+        recipient = rng.choice(dataset.customers)[0]
+        if recipient != account_id or len(dataset.customers) == 1:
+            return recipient
+
+
+def customer_request(method, path, body=None):
+    # path: a string or path(rng, dataset); body: body(rng, dataset, account_id)
+    def build(rng, dataset, transport, seed):
+        account_id, _, token = rng.choice(dataset.customers)
+        return (method, path(rng, dataset) if callable(path) else path, token,
+                body(rng, dataset, account_id) if body else None)
+    return build
+
+
+def manager_request(path):
+    def build(rng, dataset, transport, seed):
+        return 'GET', path(rng, dataset) if callable(path) else path, dataset.manager_token, None
+    return build
+
+
+def transfer_body(rng, dataset, account_id):
+    return {'recipient_account_id': other_customer(rng, dataset, account_id), 'amount': rng.randint(1, 50)}
+
+
+def batch_transfer_body(rng, dataset, account_id):
+    return {'transfers': [transfer_body(rng, dataset, account_id) for _ in range(5)]}
+
+
+def filter_path(rng, dataset):
+    start = date.today() - timedelta(days=1)
+    return '/customers/me/transactions/filter/?' + urlencode({
+        'start_date': start.isoformat(), 'transaction_type': rng.choice(('deposit', 'withdrawal', 'transfer_in'))})
+
+
+def register_customer(rng, dataset, transport, seed):
+    return 'POST', '/customers/register/', None, {
+        'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', 'email': dataset.unique_name() + '@example.com',
+        'password': PASSWORD, 'initial_deposit': 10}
+
+
+def customer_login(rng, dataset, transport, seed):
+    _, email, _ = rng.choice(dataset.customers)
+    return 'POST', '/customers/login/', None, {'email': email, 'password': PASSWORD}
+
+
+def customer_logout(rng, dataset, transport, seed):
+    # A fresh customer each time: a concurrent login of the same one would replace the session
+    _, _, _, body = register_customer(rng, dataset, transport, seed)
+    expect(transport.request('POST', '/customers/register/', json_body=body), 201)
+    token = expect(transport.request('POST', '/customers/login/', json_body={
+        'email': body['email'], 'password': PASSWORD}), 200)['access_token']
+    return 'POST', '/customers/logout/', token, None
+
+
+def manager_login(rng, dataset, transport, seed):
+    return 'POST', '/managers/login/', None, {'username': MANAGER, 'password': PASSWORD}
+
+
+def manager_logout(rng, dataset, transport, seed):
+    username = dataset.unique_name()
+    expect(transport.request('POST', '/managers/register/',
+                             json_body={'username': username, 'password': PASSWORD}), 201)
+    token = expect(transport.request('POST', '/managers/login/', json_body={
+        'username': username, 'password': PASSWORD}), 200)['access_token']
+    return 'POST', '/managers/logout/', token, None
+
+
+SCENARIOS = [
+    ('customer_balance', customer_request('GET', '/customers/me/balance/')),
+    ('customer_deposit', customer_request('POST', '/customers/me/deposit/',
+                                          lambda rng, dataset, account_id: {'amount': rng.randint(1, 500)})),
+    ('customer_withdraw', customer_request('POST', '/customers/me/withdraw/',
+                                           lambda rng, dataset, account_id: {'amount': rng.randint(1, 50)})),
+    ('customer_transfer', customer_request('POST', '/customers/me/transfer/', transfer_body)),
+    ('customer_batch_transfer', customer_request('POST', '/customers/me/transfers/batch/', batch_transfer_body)),
+    ('customer_history', customer_request('GET', '/customers/me/transactions/')),
+    ('customer_filter', customer_request('GET', filter_path)),
+    ('customer_search', customer_request('GET', '/customers/me/transactions/search/?description=Transfer')),
+    ('customer_search_relevance', customer_request(
+        'GET', '/customers/me/transactions/search/?description=Transfer&order=relevance')),
+    ('manager_stats', manager_request('/managers/stats/')),
+    ('manager_customers', manager_request('/managers/customers/')),
+    ('manager_search', manager_request(lambda rng, dataset: '/managers/customers/search/?' + urlencode(
+        {'name': rng.choice(LAST_NAMES)}))),
+    ('manager_customer_history', manager_request(lambda rng, dataset: '/managers/customers/%d/transactions/' % (
+        rng.choice(dataset.customers)[0]))),
+    ('manager_transactions', manager_request('/managers/transactions/')),
+    ('manager_metrics', manager_request('/managers/metrics/')),
+    # These replace sessions, so they run after everything that uses the seeded tokens
+    ('customer_register', register_customer),
+    ('customer_login', customer_login),
+    ('customer_logout', customer_logout),
+    ('manager_login', manager_login),
+    ('manager_logout', manager_logout),
+]
+
+
+# --- Running ---
+
+def percentile(sorted_values, fraction):
+    # Nearest rank
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))]
+
+
+def run_scenario(transport, dataset, name, build, requests, concurrency, seed):
+    def one(index):
+        method, path, token, body = build(random.Random(f'{seed}:{name}:{index}'), dataset, transport, seed)
+        started = time.perf_counter()
+        try:
+            status, _ = transport.request(method, path, token=token, json_body=body)
+        except (http.client.HTTPException, OSError):
+            status = None
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(seconds * 1000 for seconds, _ in results)
+    return {
+        'requests': requests,
+        'errors': sum(1 for _, status in results if status is None or status >= 400),
+        'throughput_rps': round(requests / elapsed, 1),
+        'latency_ms': {'mean': round(sum(latencies) / len(latencies), 3),
+                       'p50': round(percentile(latencies, 0.50), 3),
+                       'p95': round(percentile(latencies, 0.95), 3),
+                       'p99': round(percentile(latencies, 0.99), 3),
+                       'max': round(latencies[-1], 3)},
+    }
+
+
+def compare(result, baseline):
+    # Percent change per scenario and statistic; positive is slower
+    changes = {}
+    for name, stats in result['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        change = {key: round((stats['latency_ms'][key] / before['latency_ms'][key] - 1) * 100, 1)
+                  for key in ('p50', 'p95', 'p99') if before['latency_ms'].get(key)}
+        if before.get('throughput_rps'):
+            change['throughput_rps'] = round((before['throughput_rps'] / stats['throughput_rps'] - 1) * 100, 1)
+        changes[name] = change
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every API endpoint.')
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--history', type=int, default=20, help='Seeded transactions per customer')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--storage', choices=('sqlite', 'memory'), help='BANK_STORAGE for the test client')
+    parser.add_argument('--url', help='Benchmark a running server instead of the test client')
+    parser.add_argument('--scenario', action='append', help='Only run these scenarios (repeatable)')
+    parser.add_argument('--output', help='Also write the result to this file')
+    parser.add_argument('--compare', help='An earlier result file to compare against')
+    args = parser.parse_args(argv)
+    if args.customers < 2 or args.requests < 1 or args.concurrency < 1:
+        parser.error('--customers must be at least 2, --requests and --concurrency at least 1')
+    scenarios = [(name, build) for name, build in SCENARIOS if not args.scenario or name in args.scenario]
+    if not scenarios:
+        parser.error(f"No such scenario; choose from {', '.join(name for name, _ in SCENARIOS)}")
+
+    if args.url:
+        transport = HTTPTransport(args.url)
+    else:
+        if args.storage:
+            os.environ['BANK_STORAGE'] = args.storage
+        import app as bank  # Reads its BANK_* configuration on import
+        bank.DATABASE = os.path.join(tempfile.mkdtemp(prefix='bank-benchmark-'), 'bank.db')
+        transport = ClientTransport(bank.app)
+
+    started = time.perf_counter()
+    dataset = seed_dataset(transport, args.customers, args.history, args.seed)
+    result = {
+        'config': {
+            'target': args.url or 'test_client', 'customers': args.customers, 'history': args.history,
+            'requests': args.requests, 'concurrency': args.concurrency, 'seed': args.seed,
+            'environment': {key: value for key, value in sorted(os.environ.items())
+                            if key.startswith('BANK_') and key != 'BANK_SECRET_KEY'},
+            'seed_seconds': round(time.perf_counter() - started, 2),
+        },
+        'scenarios': {},
+    }
+    for name, build in scenarios:
+        result['scenarios'][name] = run_scenario(transport, dataset, name, build, args.requests,
+                                                 args.concurrency, args.seed)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline:
+            result['change_percent'] = compare(result, json.load(baseline))
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as destination:
+            destination.write(output + '\n')
+    print(output)
+    return 1 if any(stats['errors'] for stats in result['scenarios'].values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Deterministic synthetic customers and ledger rows for load testing.
+
+Creates the app's schema (init_db() and its migrations) if the database is
+new, then adds --customers customers and --transactions ledger rows, one
+'Initial deposit' per customer included. Activity per account follows a
+Pareto distribution (--skew; lower means a heavier tail), so a few accounts
+have long histories and most have short ones. Each event is a deposit,
+withdrawal or transfer, drawn from --mix, and a --hot-share of transfers go
+to one of --hot-accounts recipients. Rows are spread over the --days before
+--end in timestamp order. A withdrawal or transfer the balance cannot cover
+becomes a deposit, so balances never go negative and always match the
+ledger. The same arguments and --seed give the same rows.
+
+The whole load is a single transaction in rollback-journal mode with
+synchronous=OFF, so an interrupted run leaves the database as it was. The
+triggers and secondary indexes on customers and transactions are dropped
+for the load and recreated at the end, when the search indexes and
+system_stats are brought up to date in bulk. Nothing else may use the
+database while it runs.
+
+Usage: python datagen.py [bank.db] [--customers N] [--transactions N] [--skew A] [--mix deposit=W,withdrawal=W,transfer=W]
+                         [--days N] [--end YYYY-MM-DD] [--hot-accounts N] [--hot-share F] [--seed N]
+"""
+
+import argparse
+import itertools
+import math
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+import db_pragmas
+import search_index
+import system_stats
+
+FIRST_NAMES = ('Alice', 'Bob', 'Carol', 'David', 'Erin', 'Frank', 'Grace', 'Heidi', 'Ivan', 'Judy', 'Karim', 'Lena',
+               'Mallory', 'Nadia', 'Oscar', 'Priya', 'Quentin', 'Rosa', 'Sven', 'Tomoko', 'Uma', 'Victor', 'Wen', 'Yusuf')
+LAST_NAMES = ('Smith', 'Jones', 'Taylor', 'Brown', 'Wilson', 'Evans', 'Thomas', 'Roberts', 'Garcia', 'Nguyen', 'Kim',
+              'Patel', 'Muller', 'Rossi', 'Silva', 'Kowalski', 'Haddad', 'Okafor', 'Larsen', 'Tanaka')
+PASSWORD = 'password'  # Every generated customer's; emails are customer<account_id>@example.com
+KINDS = ('deposit', 'withdrawal', 'transfer')
+# Amounts in cents are log-normal: median $50, with a long tail of large ones
+AMOUNT_MU = math.log(5000)
+AMOUNT_SIGMA = 1.2
+CHUNK_SIZE = 50000  # Rows per executemany
+
+INSERT_CUSTOMER = "INSERT INTO customers (account_id, name, email, password, balance) VALUES (?, ?, ?, ?, 0)"
+INSERT_TRANSACTION = ("INSERT INTO transactions (account_id, transaction_type, amount, timestamp, description) "
+                      "VALUES (?, ?, ?, ?, ?)")
+
+
+def parse_mix(text):
+    # 'deposit=0.4,withdrawal=0.3,transfer=0.3' -> cumulative weights in KINDS order
+    weights = dict.fromkeys(KINDS, 0.0)
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        if kind.strip() not in weights:
+            raise ValueError(f'unknown transaction kind {kind.strip()!r}')
+        weights[kind.strip()] = float(weight)
+    if any(weight < 0 for weight in weights.values()) or not sum(weights.values()):
+        raise ValueError('weights must be non-negative and not all zero')
+    return list(itertools.accumulate(weights[kind] for kind in KINDS))
+
+
+def create_schema(path):
+    import app as bank  # init_db() owns the base schema; imported here since importing configures the whole app
+    bank.DATABASE = path
+    bank.init_db()
+
+
+def drop_derived(conn):
+    # Triggers and secondary indexes on the bulk-loaded tables; returns their SQL to recreate them
+    rows = conn.execute("SELECT type, name, sql FROM sqlite_master WHERE type IN ('index', 'trigger') "
+                        "AND tbl_name IN ('customers', 'transactions') AND sql IS NOT NULL").fetchall()
+    for kind, name, _ in rows:
+        conn.execute(f'DROP {kind.upper()} "{name}"')
+    return [sql for _, _, sql in rows]
+
+
+def amount_cents(rng):
+    return int(rng.lognormvariate(AMOUNT_MU, AMOUNT_SIGMA)) + 1
+
+
+def generate(conn, customers, transactions, skew, mix, days, end, hot_accounts, hot_share, seed, progress=None):
+    # conn: inside a transaction, without triggers on customers/transactions. Returns (first account, last ledger id)
+    rng = random.Random(seed)
+    first_account = conn.execute("SELECT COALESCE(MAX(account_id), 0) FROM customers").fetchone()[0] + 1
+    last_transaction = conn.execute("SELECT COALESCE(MAX(transaction_id), 0) FROM transactions").fetchone()[0]
+    total = max(transactions, customers)
+    start = end - timedelta(days=days)
+    slot = days * 86400e6 / total  # Microseconds per ledger row
+
+    def timestamp(position):
+        # Evenly spread with jitter, so row order is timestamp order; same text as format_timestamp(), but faster
+        return (start + timedelta(microseconds=int((position + rng.random()) * slot))).isoformat(' ', 'microseconds')
+
+    for low in range(0, customers, CHUNK_SIZE):
+        conn.executemany(INSERT_CUSTOMER, [
+            (account_id, f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+             f'customer{account_id}@example.com', PASSWORD)
+            for account_id in range(first_account + low, first_account + min(low + CHUNK_SIZE, customers))])
+
+    balances = [0] * customers
+    ledger = []
+    for index in range(customers):
+        balances[index] = amount_cents(rng)
+        ledger.append((first_account + index, 'deposit', balances[index], timestamp(index), 'Initial deposit'))
+        if len(ledger) >= CHUNK_SIZE:
+            conn.executemany(INSERT_TRANSACTION, ledger)
+            ledger.clear()
+
+    activity = list(itertools.accumulate(rng.paretovariate(skew) for _ in range(customers)))
+    hot = rng.sample(range(customers), min(hot_accounts, customers))
+    written = customers
+    while written < total:
+        events = min(CHUNK_SIZE, total - written)
+        for index, kind in zip(rng.choices(range(customers), cum_weights=activity, k=events),
+                               rng.choices(KINDS, cum_weights=mix, k=events)):
+            if written >= total:
+                break
+            account_id = first_account + index
+            amount = amount_cents(rng)
+            when = timestamp(written)
+            if kind == 'transfer' and (customers == 1 or written + 2 > total):
+                kind = 'deposit'  # Nobody to send to, or no room for both rows
+            if kind != 'deposit' and balances[index] < amount:
+                kind = 'deposit'
+            if kind == 'deposit':
+                balances[index] += amount
+                ledger.append((account_id, 'deposit', amount, when, 'Deposit'))
+                written += 1
+            elif kind == 'withdrawal':
+                balances[index] -= amount
+                ledger.append((account_id, 'withdrawal', amount, when, 'Withdrawal'))
+                written += 1
+            else:
+                recipient = rng.choice(hot) if hot and rng.random() < hot_share else rng.randrange(customers)
+                if recipient == index:
+                    recipient = (index + 1) % customers
+                balances[index] -= amount
+                balances[recipient] += amount
+                recipient_id = first_account + recipient
+                ledger.append((account_id, 'transfer_out', amount, when, f'Transfer to account {recipient_id}'))
+                ledger.append((recipient_id, 'transfer_in', amount, when, f'Transfer from account {account_id}'))
+                written += 2
+        conn.executemany(INSERT_TRANSACTION, ledger)
+        ledger.clear()
+        if progress:
+            progress(written, total)
+    conn.executemany(INSERT_TRANSACTION, ledger)
+    conn.executemany("UPDATE customers SET balance = ? WHERE account_id = ?",
+                     ((balance, first_account + index) for index, balance in enumerate(balances)))
+    return first_account, last_transaction
+
+
+def refresh_derived(conn, first_account, last_transaction):
+    # What the dropped triggers would have done, for the new rows only, in bulk
+    if search_index.has_table(conn, 'transactions_fts'):
+        conn.execute("INSERT INTO transactions_fts (rowid, account_key, description) "
+                     "SELECT transaction_id, 'acct' || account_id, COALESCE(description, '') FROM transactions "
+                     "WHERE transaction_id > ?", (last_transaction,))
+    if search_index.has_table(conn, 'customers_fts'):
+        conn.execute("INSERT INTO customers_fts (rowid, name, email) "
+                     "SELECT account_id, name, email FROM customers WHERE account_id >= ?", (first_account,))
+    if search_index.has_table(conn, 'system_stats'):
+        system_stats.rebuild(conn)
+
+
+def load(path, progress=None, **options):
+    create_schema(path)
+    conn = sqlite3.connect(path, isolation_level=None)  # Explicit BEGIN, so the DROPs are part of the transaction
+    try:
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        db_pragmas.apply(conn, 'benchmark')
+        # New pages need no rollback journal, unlike WAL which would hold a second copy of the whole load
+        conn.execute("PRAGMA journal_mode = DELETE").fetchall()
+        try:
+            conn.execute("BEGIN EXCLUSIVE")
+            derived = drop_derived(conn)
+            first_account, last_transaction = generate(conn, progress=progress, **options)
+            for sql in derived:
+                conn.execute(sql)
+            refresh_derived(conn, first_account, last_transaction)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.execute(f"PRAGMA journal_mode = {journal_mode}").fetchall()
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic customers and transactions.')
+    parser.add_argument('database', nargs='?', default='bank.db')
+    parser.add_argument('--customers', type=int, default=10000)
+    parser.add_argument('--transactions', type=int, default=1000000, help='Ledger rows, initial deposits included')
+    parser.add_argument('--skew', type=float, default=1.2, help='Pareto shape of per-account activity')
+    parser.add_argument('--mix', type=parse_mix, default='deposit=0.4,withdrawal=0.3,transfer=0.3')
+    parser.add_argument('--days', type=float, default=365.0)
+    parser.add_argument('--end', type=datetime.fromisoformat, default='2025-01-01')
+    parser.add_argument('--hot-accounts', type=int, default=10)
+    parser.add_argument('--hot-share', type=float, default=0.2, help='Fraction of transfers to a hot account')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+    if args.customers < 1 or args.transactions < 0 or args.skew <= 0 or args.days <= 0 \
+            or args.hot_accounts < 0 or not 0 <= args.hot_share <= 1:
+        parser.error('--customers must be positive, --skew and --days above zero and --hot-share within 0..1')
+
+    started = time.perf_counter()
+
+    def progress(written, total):
+        rate = written / (time.perf_counter() - started)
+        print(f'{written:,} / {total:,} ledger rows ({rate:,.0f} rows/s)', file=sys.stderr)
+
+    load(args.database, progress=progress, customers=args.customers, transactions=args.transactions,
+         skew=args.skew, mix=args.mix, days=args.days, end=args.end, hot_accounts=args.hot_accounts,
+         hot_share=args.hot_share, seed=args.seed)
+    print(f'Added {args.customers:,} customers and {max(args.transactions, args.customers):,} ledger rows '
+          f'to {args.database} in {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Bounded SQLite connection pool used by app.py.
+
+Connections are opened lazily, handed back to the thread that used them last
+when possible, and pinged before reuse once they have been idle for a while.
+"""
+
+import sqlite3
+import threading
+import time
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection became free within the timeout."""
+
+
+class ConnectionPool:
+    def __init__(self, database, size=5, timeout=30.0, ping_interval=30.0, on_connect=None,
+                 factory=sqlite3.Connection):
+        if size < 1:
+            raise ValueError('Pool size must be at least 1')
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.on_connect = on_connect  # Called with every new connection, e.g. to set pragmas
+        self.factory = factory  # Connection class, see sqlite3.connect()
+        self._idle = []  # (conn, last_used) pairs, most recently released last
+        self._opened = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._closed = False
+
+    def connect(self):
+        # A new connection with the pool's settings, also used for dedicated (unpooled) connections
+        # check_same_thread=False: a connection may be reused by another worker
+        # thread once it is back in the pool; the pool guarantees exclusivity.
+        conn = sqlite3.connect(self.database, timeout=self.timeout, check_same_thread=False, factory=self.factory)
+        conn.row_factory = sqlite3.Row  # Access columns by name
+        if self.on_connect is not None:
+            try:
+                self.on_connect(conn)
+            except Exception:
+                conn.close()
+                raise
+        return conn
+
+    def _take_idle(self):
+        # Prefer the connection this thread released last (warm page cache,
+        # prepared statement cache), otherwise the most recently used one.
+        preferred = getattr(self._local, 'conn', None)
+        if preferred is not None:
+            for index, (conn, last_used) in enumerate(self._idle):
+                if conn is preferred:
+                    del self._idle[index]
+                    return conn, last_used
+        return self._idle.pop()
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError('Connection pool is closed')
+                if self._idle:
+                    conn, last_used = self._take_idle()
+                    break
+                if self._opened < self.size:
+                    self._opened += 1
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f'No database connection available after {self.timeout}s')
+                self._cond.wait(remaining)
+
+        if conn is not None and time.monotonic() - last_used > self.ping_interval:
+            if not self._is_healthy(conn):
+                self._discard(conn)
+                conn = None
+        if conn is None:
+            try:
+                conn = self.connect()
+            except sqlite3.Error:
+                with self._cond:
+                    self._opened -= 1
+                    self._cond.notify()
+                raise
+        self._local.conn = conn
+        return conn
+
+    def release(self, conn, broken=False):
+        if conn.in_transaction:
+            try:
+                conn.rollback()  # Never hand out a connection mid-transaction
+            except sqlite3.Error:
+                broken = True
+        if broken or self._closed:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._opened -= 1
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            conn.close()
+
+    def stats(self):
+        with self._cond:
+            return {'size': self.size, 'open': self._opened, 'idle': len(self._idle)}
@@ -0,0 +1,54 @@
+"""
+Named SQLite tuning profiles applied to every connection the app opens.
+
+All profiles use WAL, so readers keep going while a writer commits. They
+differ in how much durability they trade for speed:
+
+- durable: synchronous=FULL, every commit is fsynced before it returns.
+- throughput: synchronous=NORMAL, a power loss may drop the last commits
+  but never corrupts the database; bigger cache and memory-mapped reads.
+- benchmark: synchronous=OFF, for throwaway databases only.
+"""
+
+PROFILES = {
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -16000,  # Negative = KiB, so ~16 MB
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000,  # Milliseconds
+    },
+    'throughput': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    'benchmark': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -262144,
+        'mmap_size': 1024 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 30000,
+    },
+}
+
+DEFAULT_PROFILE = 'durable'
+
+
+def get_profile(name):
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f'Unknown database profile {name!r}, expected one of {", ".join(PROFILES)}') from None
+
+
+def apply(conn, name):
+    # journal_mode is stored in the database file; the others are per connection.
+    # Must run outside a transaction, since journal_mode cannot change inside one.
+    for pragma, value in get_profile(name).items():
+        conn.execute(f'PRAGMA {pragma} = {value}').fetchall()
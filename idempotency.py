@@ -0,0 +1,128 @@
+"""
+Idempotency-Key support for the money-moving endpoints.
+
+The first request with a given (account, key) pair runs normally and its
+response is stored (in idempotency_keys, for the SQLite engine) in the same
+transaction as the mutation itself, so a key is recorded if and only if its write committed.
+Retries with the same key get the stored response back without touching the
+ledger. Keys expire after a TTL; expired rows are swept in passing by the
+writes that record new keys.
+
+An in-memory LRU of recent responses answers most retries before a write
+transaction is even started.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        account_id INTEGER NOT NULL,
+        idempotency_key TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,  -- Hash of endpoint and request body
+        status INTEGER NOT NULL,
+        response TEXT NOT NULL,  -- JSON body
+        created_at REAL NOT NULL,  -- Unix time
+        PRIMARY KEY (account_id, idempotency_key)
+    ) WITHOUT ROWID
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys (created_at)",
+]
+
+MAX_KEY_LENGTH = 255
+REPLAY_HEADERS = {'Idempotent-Replayed': 'true'}
+CONFLICT = {'error': 'Idempotency-Key was already used with a different request'}, 422
+
+
+def create(conn):
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+
+def fingerprint(endpoint, body):
+    canonical = json.dumps([endpoint, body], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, ttl=86400.0, cache_size=10000, sweep_interval=60.0):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.sweep_interval = sweep_interval
+        self._cache = OrderedDict()  # (account_id, key) -> (fingerprint, body, status, expires_at)
+        self._pending = {}  # Recorded but not yet known to be committed, see confirm()
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.hits = 0
+        self.replays = 0
+
+    def _remember(self, account_id, key, request_fingerprint, body, status, created_at):
+        with self._lock:
+            self._cache[(account_id, key)] = (request_fingerprint, body, status, created_at + self.ttl)
+            self._cache.move_to_end((account_id, key))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _replay(self, request_fingerprint, stored_fingerprint, body, status):
+        if stored_fingerprint != request_fingerprint:
+            return CONFLICT
+        with self._lock:  # Counted from many threads, as hits is
+            self.replays += 1
+        return body, status, REPLAY_HEADERS
+
+    def cached(self, account_id, key, request_fingerprint):
+        # Stored response for a retry, or None if the key has to go to the database
+        with self._lock:
+            entry = self._cache.get((account_id, key))
+            if entry is None:
+                return None
+            if entry[3] <= time.time():
+                del self._cache[(account_id, key)]
+                return None
+            self._cache.move_to_end((account_id, key))
+            self.hits += 1
+        return self._replay(request_fingerprint, *entry[:3])
+
+    def _sweep(self, store, now):
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        store.expire_idempotency_records(now - self.ttl)
+
+    def wrap(self, operation, account_id, key, request_fingerprint):
+        # A write operation (see app.run_write) that replays the stored response
+        # for a known key and records the response of a new one. Results undone
+        # with Abort are not recorded, so such a request can be retried.
+        def run(store, *args):
+            now = time.time()
+            with self._lock:
+                self._pending.pop((account_id, key), None)  # Left over from an attempt that did not commit
+            self._sweep(store, now)
+            record = store.idempotency_record(account_id, key, now - self.ttl)
+            if record is not None:
+                stored_fingerprint, status, body, created_at = record
+                self._remember(account_id, key, stored_fingerprint, body, status, created_at)  # Already committed
+                return self._replay(request_fingerprint, stored_fingerprint, body, status)
+            body, status = operation(store, *args)
+            store.save_idempotency_record(account_id, key, request_fingerprint, status, body, now)
+            with self._lock:
+                if len(self._pending) >= self.cache_size:
+                    self._pending.clear()  # Only left behind by failed commits
+                self._pending[(account_id, key)] = (request_fingerprint, body, status, now)
+            return body, status
+        return run
+
+    def confirm(self, account_id, key):
+        # Called once the wrapped operation's transaction has committed
+        with self._lock:
+            entry = self._pending.pop((account_id, key), None)
+        if entry is not None:
+            self._remember(account_id, key, *entry)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._cache), 'hits': self.hits, 'replays': self.replays}
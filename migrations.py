@@ -0,0 +1,245 @@
+"""
+Schema migrations for bank.db, tracked with PRAGMA user_version.
+
+Each migration runs once, in order, inside its own transaction, so existing
+databases are upgraded in place the first time the app starts against them.
+Migrations flagged `online` manage their own (chunked) transactions instead,
+so other connections can keep writing while they run; they must be safe to
+resume after an interruption.
+"""
+
+import sqlite3
+import sys
+from datetime import datetime
+
+import idempotency
+import search_index
+import signed_tokens
+import system_stats
+
+# Fixed-width, lexicographically sortable timestamp format used for every
+# ledger row, so date-range filters can be answered with index range scans.
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+BACKFILL_CHUNK_SIZE = 10000
+
+
+def format_timestamp(value):
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+def _normalize_timestamp(value):
+    if isinstance(value, (int, float)):
+        return format_timestamp(datetime.fromtimestamp(value))
+    return format_timestamp(datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None))
+
+
+def _normalize_transaction_timestamps(conn):
+    # Rows written before this migration may use a 'T' separator or omit the
+    # microseconds; rewrite them in chunks so large ledgers don't hold one huge
+    # statement journal.
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT transaction_id, timestamp FROM transactions WHERE transaction_id > ? "
+            "ORDER BY transaction_id LIMIT ?", (last_id, BACKFILL_CHUNK_SIZE)).fetchall()
+        if not rows:
+            break
+        updates = []
+        for transaction_id, timestamp in rows:
+            normalized = _normalize_timestamp(timestamp)
+            if normalized != timestamp:
+                updates.append((normalized, transaction_id))
+        conn.executemany("UPDATE transactions SET timestamp = ? WHERE transaction_id = ?", updates)
+        last_id = rows[-1][0]
+
+
+def _add_account_timestamp_index(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_account_timestamp "
+                 "ON transactions (account_id, timestamp)")
+
+
+def _add_timestamp_index(conn):
+    # Serves the ledger-wide (timestamp, transaction_id) keyset pages
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions (timestamp)")
+
+
+def _add_system_stats(conn):
+    # Counter row + triggers so /managers/stats/ no longer scans both tables
+    system_stats.create(conn)
+
+
+def _add_transaction_search_index(conn):
+    # No-op on SQLite builds without FTS5; search_transactions falls back to LIKE
+    search_index.create_transaction_index(conn)
+
+
+def _add_customer_search_index(conn):
+    # No-op without the FTS5 trigram tokenizer (SQLite < 3.34); search_customers falls back to LIKE
+    search_index.create_customer_index(conn)
+
+
+# Current definitions of the tables holding money; init_db() creates them from here too
+TABLE_COLUMNS = {
+    'customers': '''(
+        account_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        balance INTEGER NOT NULL DEFAULT 0,  -- cents
+        auth_token TEXT UNIQUE
+    )''',
+    'transactions': '''(
+        transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        account_id INTEGER NOT NULL,
+        transaction_type TEXT NOT NULL,
+        amount INTEGER NOT NULL,  -- cents
+        timestamp DATETIME NOT NULL,
+        description TEXT,
+        FOREIGN KEY (account_id) REFERENCES customers (account_id)
+    )''',
+}
+
+
+def create_table(conn, table, name=None):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {name or table} {TABLE_COLUMNS[table]}")
+
+
+def _rebuild_table(conn, table, sources):
+    # Brings table to its TABLE_COLUMNS definition the way SQLite documents for
+    # constraint changes: create the new table, copy, drop the old one, rename, then
+    # restore its indexes, triggers and AUTOINCREMENT counter. sources maps a new
+    # column to the old column it is copied from, where they differ.
+    derived = [sql for sql, in conn.execute("SELECT sql FROM sqlite_master WHERE tbl_name = ? "
+                                            "AND type IN ('index', 'trigger') AND sql IS NOT NULL", (table,))]
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    create_table(conn, table, name=f'{table}_rebuilt')
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table}_rebuilt)")]
+    conn.execute(f"INSERT INTO {table}_rebuilt ({', '.join(columns)}) "
+                 f"SELECT {', '.join(sources.get(column, column) for column in columns)} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_rebuilt RENAME TO {table}")
+    if sequence is not None:
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                     (table, max(sequence[0], conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0])))
+    for sql in derived:
+        conn.execute(sql)
+
+
+# (table, key column, REAL column) pairs converted to integer cents
+MONEY_COLUMNS = [
+    ('customers', 'account_id', 'balance'),
+    ('transactions', 'transaction_id', 'amount'),
+]
+
+
+def _column_type(conn, table, column):
+    for row in conn.execute(f"PRAGMA table_info({table})"):
+        if row[1] == column:
+            return row[2].upper()
+    return None
+
+
+def _add_cents_columns(conn):
+    # Databases created after the switch already store cents; nothing to do
+    if _column_type(conn, 'customers', 'balance') != 'REAL':
+        return
+    for table, key, column in MONEY_COLUMNS:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}_cents INTEGER")
+        # Keep the new column current for rows written while the backfill runs
+        conn.execute(f"""
+            CREATE TRIGGER trg_{table}_{column}_cents_insert AFTER INSERT ON {table}
+            BEGIN
+                UPDATE {table} SET {column}_cents = CAST(ROUND(NEW.{column} * 100) AS INTEGER)
+                WHERE {key} = NEW.{key};
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER trg_{table}_{column}_cents_update AFTER UPDATE OF {column} ON {table}
+            BEGIN
+                UPDATE {table} SET {column}_cents = CAST(ROUND(NEW.{column} * 100) AS INTEGER)
+                WHERE {key} = NEW.{key};
+            END
+        """)
+
+
+def _backfill_cents(conn):
+    # Walks each table in key ranges, committing every chunk; rows already
+    # converted (by the sync triggers or an earlier run) are skipped.
+    if _column_type(conn, 'customers', 'balance_cents') is None:
+        return
+    for table, key, column in MONEY_COLUMNS:
+        max_key = conn.execute(f"SELECT COALESCE(MAX({key}), 0) FROM {table}").fetchone()[0]
+        for low in range(0, max_key, BACKFILL_CHUNK_SIZE):
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(f"UPDATE {table} SET {column}_cents = CAST(ROUND({column} * 100) AS INTEGER) "
+                             f"WHERE {key} > ? AND {key} <= ? AND {column}_cents IS NULL",
+                             (low, low + BACKFILL_CHUNK_SIZE))
+
+
+_backfill_cents.online = True
+
+
+def _switch_to_cents(conn):
+    if _column_type(conn, 'customers', 'balance_cents') is None:
+        return
+    # Anything still NULL here was written between the last chunk and now
+    for table, key, column in MONEY_COLUMNS:
+        conn.execute(f"UPDATE {table} SET {column}_cents = CAST(ROUND({column} * 100) AS INTEGER) "
+                     f"WHERE {column}_cents IS NULL")
+        conn.execute(f"DROP TRIGGER trg_{table}_{column}_cents_insert")
+        conn.execute(f"DROP TRIGGER trg_{table}_{column}_cents_update")
+    # system_stats holds REAL totals; it is recreated, with its triggers, from the cents below
+    for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                              "AND name LIKE 'trg_stats_%'").fetchall():
+        conn.execute(f"DROP TRIGGER {name}")
+    # A rebuild rather than DROP/RENAME COLUMN, so the cents columns keep their place and constraints
+    for table, key, column in MONEY_COLUMNS:
+        _rebuild_table(conn, table, {column: f'{column}_cents'})
+    conn.execute("DROP TABLE IF EXISTS system_stats")
+    system_stats.create(conn)
+
+
+def _add_idempotency_keys(conn):
+    idempotency.create(conn)
+
+
+def _add_revoked_sessions(conn):
+    signed_tokens.create(conn)
+
+
+MIGRATIONS = [
+    _normalize_transaction_timestamps,
+    _add_account_timestamp_index,
+    _add_timestamp_index,
+    _add_system_stats,
+    _add_transaction_search_index,
+    _add_customer_search_index,
+    _add_cents_columns,
+    _backfill_cents,
+    _switch_to_cents,
+    _add_idempotency_keys,
+    _add_revoked_sessions,
+]
+
+
+def migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for index, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        if getattr(migration, 'online', False):
+            migration(conn)
+            with conn:
+                conn.execute(f"PRAGMA user_version = {index}")
+            continue
+        with conn:
+            conn.execute("BEGIN")
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {index}")
+    return len(MIGRATIONS)
+
+
+if __name__ == '__main__':
+    # Upgrade a database file without starting the app: python migrations.py bank.db
+    with sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else 'bank.db') as connection:
+        print(f'Schema at version {migrate(connection)}')
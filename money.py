@@ -0,0 +1,37 @@
+"""
+Conversion between API amounts and stored integer minor units (cents).
+
+Balances and ledger amounts are stored as INTEGER cents so arithmetic and
+SUM() aggregation in SQLite are exact; the JSON API keeps exposing them as
+decimal numbers.
+"""
+
+from decimal import Decimal, InvalidOperation
+
+CENTS_PER_UNIT = 100
+MAX_CENTS = 2 ** 53  # Largest amount accepted; fits SQLite's INTEGER and stays exact in from_cents()
+
+
+def to_cents(amount):
+    # Raises ValueError for non-numbers, amounts finer than one cent and ones beyond MAX_CENTS
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+        raise ValueError('Amount must be a number')
+    try:
+        cents = Decimal(str(amount)) * CENTS_PER_UNIT
+    except InvalidOperation:
+        raise ValueError('Amount must be a number')
+    if not cents.is_finite() or cents != cents.to_integral_value():
+        raise ValueError('Amount must have at most two decimal places')
+    if abs(cents) > MAX_CENTS:
+        raise ValueError('Amount is too large')
+    return int(cents)
+
+
+def from_cents(cents):
+    return cents / CENTS_PER_UNIT
+
+
+def format_cents(cents):
+    # For messages, the way a JSON number from the request prints: 2500 -> '25', 2550 -> '25.5'
+    units, remainder = divmod(cents, CENTS_PER_UNIT)
+    return str(units) if not remainder else str(from_cents(cents))
@@ -0,0 +1,176 @@
+"""
+FTS5 full-text indexes used by the search endpoints.
+
+The transaction index is contentless: it only stores the inverted index and
+points back at transactions by rowid. Each row is also tagged with an
+account token, so a MATCH is answered from the intersection of the caller's
+posting list and the term's, not from every row that mentions the term.
+
+The customer index uses the trigram tokenizer over name and email, which
+turns case-insensitive substring and prefix lookups into index probes.
+
+Builds of SQLite without FTS5 (or, for customers, without the trigram
+tokenizer) are detected at migration time; the app then scans instead:
+with LIKE for customers, and with matches() for transactions, which
+tokenizes the way unicode61 does so both return the same rows.
+"""
+
+import re
+import sqlite3
+import unicodedata
+
+TRANSACTION_FTS_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE transactions_fts USING fts5(
+        account_key, description, content='', tokenize='unicode61'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_insert AFTER INSERT ON transactions
+    BEGIN
+        INSERT INTO transactions_fts (rowid, account_key, description)
+        VALUES (NEW.transaction_id, 'acct' || NEW.account_id, COALESCE(NEW.description, ''));
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_delete AFTER DELETE ON transactions
+    BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, account_key, description)
+        VALUES ('delete', OLD.transaction_id, 'acct' || OLD.account_id, COALESCE(OLD.description, ''));
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_update AFTER UPDATE OF account_id, description ON transactions
+    BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, account_key, description)
+        VALUES ('delete', OLD.transaction_id, 'acct' || OLD.account_id, COALESCE(OLD.description, ''));
+        INSERT INTO transactions_fts (rowid, account_key, description)
+        VALUES (NEW.transaction_id, 'acct' || NEW.account_id, COALESCE(NEW.description, ''));
+    END
+    ''',
+]
+
+CUSTOMER_FTS_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE customers_fts USING fts5(
+        name, email, content='customers', content_rowid='account_id', tokenize='trigram'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_customers_fts_insert AFTER INSERT ON customers
+    BEGIN
+        INSERT INTO customers_fts (rowid, name, email) VALUES (NEW.account_id, NEW.name, NEW.email);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_customers_fts_delete AFTER DELETE ON customers
+    BEGIN
+        INSERT INTO customers_fts (customers_fts, rowid, name, email)
+        VALUES ('delete', OLD.account_id, OLD.name, OLD.email);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_customers_fts_update AFTER UPDATE OF name, email ON customers
+    BEGIN
+        INSERT INTO customers_fts (customers_fts, rowid, name, email)
+        VALUES ('delete', OLD.account_id, OLD.name, OLD.email);
+        INSERT INTO customers_fts (rowid, name, email) VALUES (NEW.account_id, NEW.name, NEW.email);
+    END
+    ''',
+]
+
+_ASCII_TOKEN = re.compile('[a-z0-9]+')
+
+# The trigram tokenizer cannot index terms shorter than one trigram
+MIN_TRIGRAM_TERM = 3
+
+
+def fts5_available(conn, tokenize='unicode61'):
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x, tokenize='{tokenize}')")
+        conn.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def has_table(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def create_transaction_index(conn):
+    if has_table(conn, 'transactions_fts'):
+        return True
+    if not fts5_available(conn):
+        return False
+    for statement in TRANSACTION_FTS_SCHEMA:
+        conn.execute(statement)
+    conn.execute("INSERT INTO transactions_fts (rowid, account_key, description) "
+                 "SELECT transaction_id, 'acct' || account_id, COALESCE(description, '') FROM transactions")
+    return True
+
+
+def create_customer_index(conn):
+    if has_table(conn, 'customers_fts'):
+        return True
+    if not fts5_available(conn, tokenize='trigram'):
+        return False
+    for statement in CUSTOMER_FTS_SCHEMA:
+        conn.execute(statement)
+    conn.execute("INSERT INTO customers_fts (customers_fts) VALUES ('rebuild')")
+    return True
+
+
+def quote_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def quote_terms(text):
+    # Every whitespace-separated term becomes a quoted prefix query, so user
+    # input can never be parsed as FTS5 syntax; terms are ANDed together.
+    return ' AND '.join(quote_phrase(term) + '*' for term in text.split())
+
+
+def tokenize(text):
+    # The tokens FTS5's unicode61 tokenizer makes of text: lowercase, diacritics removed,
+    # split at everything but letters, digits and private-use characters
+    if text.isascii():
+        return _ASCII_TOKEN.findall(text.lower())
+    tokens, token = [], []
+    for char in unicodedata.normalize('NFD', text.lower()):
+        category = unicodedata.category(char)
+        if category == 'Mn':
+            continue  # A diacritic, removed from the letter it follows
+        if category[0] in 'LN' or category == 'Co':
+            token.append(char)
+        elif token:
+            tokens.append(''.join(token))
+            token = []
+    if token:
+        tokens.append(''.join(token))
+    return tokens
+
+
+def matches(text, query):
+    # Whether quote_terms(query) matches text, for searches without FTS5: each term's tokens
+    # appear in a row in text's tokens, the last one as a prefix. A term with no tokens
+    # (only punctuation) matches nothing, as in FTS5.
+    words = tokenize(text or '')
+    for term in query.split():
+        *phrase, last = tokenize(term) or [None]
+        if last is None or not any(words[start:start + len(phrase)] == phrase and
+                                   words[start + len(phrase)].startswith(last)
+                                   for start in range(len(words) - len(phrase))):
+            return False
+    return True
+
+
+def transaction_match(account_id, text):
+    return f'account_key : "acct{int(account_id)}" AND description : ({quote_terms(text)})'
+
+
+def customer_match(fields, prefix=False):
+    # fields: {column: text}; each becomes a substring (or, with prefix, a
+    # start-of-value) phrase on its own column, ANDed together
+    anchor = '^' if prefix else ''
+    return ' AND '.join(f'{column} : {anchor}{quote_phrase(text)}' for column, text in fields.items())
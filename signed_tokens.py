@@ -0,0 +1,115 @@
+"""
+Stateless, HMAC-signed access tokens.
+
+A signed token carries its own claims (role, principal id, issue time,
+expiry and a random session id) and the HMAC-SHA256 of them under the app's
+SECRET_KEY, so it can be verified without touching the database. Every
+login starts a new session, which lets one user stay logged in on several
+devices at once.
+
+Logging out revokes just that session. Revoked session ids are stored in
+revoked_sessions until the token would have expired anyway; each worker
+keeps them in memory and picks up other workers' revocations by polling
+for rows newer than the last one it has seen.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+
+PREFIX = 'v1.'  # Tells signed tokens apart from the opaque hex tokens
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS revoked_sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,  -- Never reused, so workers can poll with id > last seen
+        session_id TEXT UNIQUE NOT NULL,
+        expires_at INTEGER NOT NULL  -- Unix time; the row is useless after this
+    )
+    ''',
+]
+
+
+def create(conn):
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _sign(secret, payload):
+    return _b64encode(hmac.new(secret.encode(), payload.encode('ascii'), hashlib.sha256).digest())
+
+
+def issue(secret, role, principal_id, ttl):
+    now = int(time.time())
+    claims = {'role': role, 'sub': principal_id, 'iat': now, 'exp': now + int(ttl), 'sid': secrets.token_hex(12)}
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    return f'{PREFIX}{payload}.{_sign(secret, payload)}'
+
+
+def is_signed(token):
+    return token.startswith(PREFIX)
+
+
+def verify(secret, token):
+    # The token's claims, or None if it is malformed, forged or expired
+    try:
+        payload, signature = token[len(PREFIX):].split('.')
+        # As bytes: compare_digest() raises TypeError for str holding anything but ASCII
+        if not hmac.compare_digest(signature.encode(), _sign(secret, payload).encode()):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, UnicodeError):
+        return None
+    if not isinstance(claims, dict) or not isinstance(claims.get('exp'), int) or claims['exp'] <= time.time():
+        return None
+    return claims
+
+
+class RevocationList:
+    def __init__(self, refresh_interval=5.0):
+        self.refresh_interval = refresh_interval
+        self._revoked = {}  # session id -> expires_at
+        self._last_id = 0
+        self._last_refresh = float('-inf')
+        self._lock = threading.Lock()
+
+    def due(self):
+        return time.monotonic() - self._last_refresh >= self.refresh_interval
+
+    def refresh(self, store):
+        # Picks up sessions revoked by other workers; store: a storage.Storage engine
+        now = time.monotonic()
+        rows = store.revoked_sessions(self._last_id)
+        with self._lock:
+            self._last_refresh = now
+            for row_id, session_id, expires_at in rows:
+                self._revoked[session_id] = expires_at
+                self._last_id = row_id
+            unix_now = time.time()
+            for session_id in [sid for sid, expires_at in self._revoked.items() if expires_at <= unix_now]:
+                del self._revoked[session_id]
+
+    def is_revoked(self, session_id):
+        with self._lock:
+            return session_id in self._revoked
+
+    def revoke(self, store, session_id, expires_at):
+        store.revoke_session(session_id, expires_at)  # Expired revocations are dropped on the way
+        with self._lock:
+            self._revoked[session_id] = expires_at
+
+    def __len__(self):
+        with self._lock:
+            return len(self._revoked)
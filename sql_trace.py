@@ -0,0 +1,138 @@
+"""
+Opt-in per-request SQL tracing on the pooled connections.
+
+The pool opens its connections with SQLTracer.factory, a Connection
+subclass whose execute(), executemany(), cursor(), commit() and rollback()
+are timed, along with the fetches on the cursors they return. So each
+statement's time is wall time: executing, stepping through its rows,
+waiting for locks (busy_timeout) and, for COMMIT, syncing to disk. Only
+statements the app itself issues are recorded; work SQLite does inside
+them (triggers, FTS index updates) counts toward the statement that caused
+it.
+
+Statements run outside a traced request (the write queue's thread, or
+after a streamed response has started) are not recorded.
+"""
+
+import sqlite3
+import threading
+import time
+
+
+class Statement:
+    __slots__ = ('sql', 'parameters', 'seconds')
+
+    def __init__(self, sql, parameters):
+        self.sql = sql
+        self.parameters = parameters  # None for executemany(), which has no single set to explain
+        self.seconds = 0.0
+
+
+class RequestTrace:
+    def __init__(self):
+        self.statements = []
+        self.paused = False  # While the tracer runs its own EXPLAIN QUERY PLAN
+
+    @property
+    def seconds(self):
+        return sum(statement.seconds for statement in self.statements)
+
+
+class TracedCursor(sqlite3.Cursor):
+    _statement = None  # The Statement its last execute() recorded, which its fetches add to
+
+    def _timed(self, method, *args):
+        statement = self._statement
+        if statement is None:
+            return method(*args)
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            statement.seconds += time.perf_counter() - started
+
+    def execute(self, sql, parameters=()):
+        self._statement = self.connection.tracer.record(sql, parameters)
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._statement = self.connection.tracer.record(sql, None)
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        return self._timed(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+    def __next__(self):
+        return self._timed(super().__next__)
+
+
+class TracedConnection(sqlite3.Connection):
+    tracer = None  # Set on the subclass each SQLTracer makes
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def _timed(self, sql, method):
+        statement = self.tracer.record(sql, ())
+        if statement is None:
+            return method()
+        started = time.perf_counter()
+        try:
+            return method()
+        finally:
+            statement.seconds += time.perf_counter() - started
+
+    def commit(self):
+        return self._timed('COMMIT', super().commit)
+
+    def rollback(self):
+        return self._timed('ROLLBACK', super().rollback)
+
+
+class SQLTracer:
+    def __init__(self):
+        self._local = threading.local()  # Statements run on the thread of the request they belong to
+        self.factory = type('TracedConnection', (TracedConnection,), {'tracer': self})  # For sqlite3.connect()
+
+    def begin(self):
+        self._local.trace = RequestTrace()
+
+    def end(self):
+        # The finished request's trace, or None if begin() was not called on this thread
+        trace = getattr(self._local, 'trace', None)
+        self._local.trace = None
+        return trace
+
+    def record(self, sql, parameters):
+        # A new Statement in the current request's trace, or None when there is nothing to record
+        trace = getattr(self._local, 'trace', None)
+        if trace is None or trace.paused or sql.lstrip().startswith('--'):
+            return None
+        statement = Statement(sql, parameters)
+        trace.statements.append(statement)
+        return statement
+
+    def explain(self, conn, statement):
+        # EXPLAIN QUERY PLAN of a recorded statement, one line per plan step
+        if statement.parameters is None:
+            return []
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            trace.paused = True
+        try:
+            return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + statement.sql, statement.parameters)]
+        finally:
+            if trace is not None:
+                trace.paused = False
@@ -0,0 +1,703 @@
+"""
+Storage engines behind the API routes.
+
+Every route talks to one engine interface (Storage) covering accounts, the
+ledger, sessions and idempotency records; the SQL lives in SQLiteStorage
+and nowhere else. MemoryStorage keeps the same data in this process on the
+v1 prototype's MemoryStore, for tests, demos and head-to-head benchmarks.
+The app gives it a store without a data_dir, so nothing is persisted.
+
+Amounts are integer cents throughout. Ledger rows are dicts with the
+columns of the transactions table. Write operations (see app.run_write)
+receive the engine as their first argument and run inside a transaction
+they do not own. Methods marked "commits" are called outside one and
+commit their own change.
+"""
+
+import bisect
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+import customer_import
+import search_index
+import system_stats
+from migrations import format_timestamp
+from v1.store import MemoryStore
+from write_queue import Abort
+
+ENGINES = ('sqlite', 'memory')
+ROLES = ('manager', 'customer')
+
+
+class Storage(ABC):
+    # --- Transactions ---
+
+    @abstractmethod
+    def write(self, operation, *args):
+        # operation(self, *args) as one transaction; Abort undoes it and returns its result
+        ...
+
+    # --- Accounts ---
+
+    @abstractmethod
+    def add_manager(self, username, password):
+        # False if the username is taken; commits
+        ...
+
+    @abstractmethod
+    def check_manager(self, username, password):
+        # Manager id for these credentials, or None
+        ...
+
+    @abstractmethod
+    def add_customer(self, name, email, password, balance):
+        # New account id, or None if the email is already registered
+        ...
+
+    @abstractmethod
+    def check_customer(self, email, password):
+        ...
+
+    @abstractmethod
+    def balance(self, account_id):
+        # Balance in cents, or None for an unknown account
+        ...
+
+    @abstractmethod
+    def existing_accounts(self, account_ids):
+        # The subset of account_ids that exist
+        ...
+
+    @abstractmethod
+    def credit(self, account_id, amount):
+        # New balance, or None for an unknown account
+        ...
+
+    @abstractmethod
+    def debit(self, account_id, amount):
+        # New balance, or None if the account is unknown or the balance is short;
+        # the check and the update are one step, so concurrent debits never overdraw
+        ...
+
+    def credit_many(self, credits):
+        # {account_id: amount} for accounts known to exist
+        for account_id, amount in credits.items():
+            self.credit(account_id, amount)
+
+    @abstractmethod
+    def customers(self):
+        # {account_id, name, email} for every customer in account_id order, as an iterator
+        ...
+
+    @abstractmethod
+    def search_customers(self, name=None, email=None, account_id=None, prefix=False, after=None, limit=100):
+        # Case-insensitive substring (or prefix) match on name and email, account_id order after `after`
+        ...
+
+    @abstractmethod
+    def import_customers(self, rows):
+        # customer_import.import_customers() report for (line number, record, error) rows; commits
+        ...
+
+    @abstractmethod
+    def stats(self):
+        # {total_customers, total_transactions, total_balance}
+        ...
+
+    # --- Ledger ---
+
+    @abstractmethod
+    def add_transactions(self, rows):
+        # rows: (account_id, transaction_type, amount, timestamp, description) tuples
+        ...
+
+    @abstractmethod
+    def transactions(self, account_id=None, transaction_type=None, since=None, until=None, matching=None,
+                     after=None, limit=100):
+        # Newest first by (timestamp, transaction_id), strictly before `after`. since/until bound
+        # the timestamp as [since, until); matching is a description search, see search_index.matches().
+        ...
+
+    def rank_transactions(self, account_id, matching, limit):
+        # Best matches first, or None if the engine cannot rank
+        return None
+
+    @abstractmethod
+    def all_transactions(self):
+        # Every ledger row in transaction_id order, as an iterator
+        ...
+
+    # --- Sessions ---
+
+    @abstractmethod
+    def session_principal(self, token, role):
+        # Principal id for an opaque session token, or None
+        ...
+
+    @abstractmethod
+    def start_session(self, role, principal_id, token):
+        # Replaces the principal's previous token; commits
+        ...
+
+    @abstractmethod
+    def end_session(self, role, token):
+        # commits
+        ...
+
+    @abstractmethod
+    def revoked_sessions(self, after_id):
+        # (id, session_id, expires_at) of signed sessions revoked since after_id, oldest first
+        ...
+
+    @abstractmethod
+    def revoke_session(self, session_id, expires_at):
+        # Also drops revocations that have expired; commits
+        ...
+
+    # --- Idempotency records ---
+
+    @abstractmethod
+    def idempotency_record(self, account_id, key, since):
+        # (fingerprint, status, body, created_at) recorded at or after `since`, or None
+        ...
+
+    @abstractmethod
+    def save_idempotency_record(self, account_id, key, fingerprint, status, body, created_at):
+        ...
+
+    @abstractmethod
+    def expire_idempotency_records(self, before):
+        ...
+
+
+# --- SQLite ---
+
+def escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class SQLiteStorage(Storage):
+    # Wraps one connection (a request's pooled one, or the write queue's);
+    # the *_fts flags say which search indexes the migrations could build
+    def __init__(self, conn, transaction_fts=False, customer_fts=False):
+        self.conn = conn
+        self.transaction_fts = transaction_fts
+        self.customer_fts = customer_fts
+
+    def write(self, operation, *args):
+        conn = self.conn
+        try:
+            conn.execute("BEGIN IMMEDIATE")  # Take the write lock up front
+            result = operation(self, *args)
+            conn.commit()
+            return result
+        except Abort as e:
+            conn.rollback()
+            return e.result
+        except Exception:
+            conn.rollback()
+            raise
+
+    # --- Accounts ---
+
+    def add_manager(self, username, password):
+        if self.conn.execute("SELECT 1 FROM managers WHERE username = ?", (username,)).fetchone():
+            return False
+        self.conn.execute("INSERT INTO managers (username, password) VALUES (?, ?)",
+                          (username, password))  # In real app, hash password
+        self.conn.commit()
+        return True
+
+    def check_manager(self, username, password):
+        row = self.conn.execute("SELECT id FROM managers WHERE username = ? AND password = ?",
+                                (username, password)).fetchone()  # In real app, compare hashed password
+        return row[0] if row else None
+
+    def add_customer(self, name, email, password, balance):
+        try:
+            cursor = self.conn.execute("INSERT INTO customers (name, email, password, balance) VALUES (?, ?, ?, ?)",
+                                       (name, email, password, balance))  # In real app, hash password
+        except sqlite3.IntegrityError:
+            return None
+        return cursor.lastrowid
+
+    def check_customer(self, email, password):
+        row = self.conn.execute("SELECT account_id FROM customers WHERE email = ? AND password = ?",
+                                (email, password)).fetchone()  # In real app, compare hashed password
+        return row[0] if row else None
+
+    def balance(self, account_id):
+        row = self.conn.execute("SELECT balance FROM customers WHERE account_id = ?", (account_id,)).fetchone()
+        return row[0] if row else None
+
+    def existing_accounts(self, account_ids):
+        account_ids = sorted(set(account_ids))
+        placeholders = ', '.join('?' * len(account_ids))
+        return {row[0] for row in self.conn.execute(
+            f"SELECT account_id FROM customers WHERE account_id IN ({placeholders})", account_ids)}
+
+    def credit(self, account_id, amount):
+        rows = self.conn.execute("UPDATE customers SET balance = balance + ? WHERE account_id = ? RETURNING balance",
+                                 (amount, account_id)).fetchall()
+        return rows[0][0] if rows else None
+
+    def debit(self, account_id, amount):
+        rows = self.conn.execute("UPDATE customers SET balance = balance - ? WHERE account_id = ? AND balance >= ? "
+                                 "RETURNING balance", (amount, account_id, amount)).fetchall()
+        return rows[0][0] if rows else None
+
+    def credit_many(self, credits):
+        # One statement for the lot
+        self.conn.executemany("UPDATE customers SET balance = balance + ? WHERE account_id = ?",
+                              [(amount, account_id) for account_id, amount in credits.items()])
+
+    def customers(self):
+        return self._iterate("SELECT account_id, name, email FROM customers ORDER BY account_id")
+
+    def search_customers(self, name=None, email=None, account_id=None, prefix=False, after=None, limit=100):
+        fts_fields = {}
+        where = "1=1"
+        params = []
+        for column, text in (('name', name), ('email', email)):
+            if not text:
+                continue
+            if self.customer_fts and len(text) >= search_index.MIN_TRIGRAM_TERM:
+                fts_fields[column] = text
+            else:
+                # No trigram index, or the term is shorter than one trigram
+                where += f" AND c.{column} LIKE ? ESCAPE '\\'"
+                params.append(('' if prefix else '%') + escape_like(text) + '%')
+        if account_id is not None:
+            where += " AND c.account_id = ?"
+            params.append(account_id)
+
+        if fts_fields:
+            # Trigram probe; rows come back in rowid (= account_id) order straight from the index
+            query = ("SELECT c.account_id, c.name, c.email FROM customers_fts "
+                     "JOIN customers c ON c.account_id = customers_fts.rowid "
+                     "WHERE customers_fts MATCH ? AND " + where)
+            params.insert(0, search_index.customer_match(fts_fields, prefix))
+            if after is not None:
+                query += " AND customers_fts.rowid > ?"
+                params.append(after)
+            query += " ORDER BY customers_fts.rowid LIMIT ?"
+        else:
+            query = "SELECT c.account_id, c.name, c.email FROM customers c WHERE " + where
+            if after is not None:
+                query += " AND c.account_id > ?"
+                params.append(after)
+            query += " ORDER BY c.account_id LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self.conn.execute(query, params)]
+
+    def import_customers(self, rows):
+        return customer_import.import_customers(self.conn, rows)
+
+    def stats(self):
+        return system_stats.read(self.conn)  # Single counter row kept current by triggers
+
+    # --- Ledger ---
+
+    def add_transactions(self, rows):
+        self.conn.executemany(
+            "INSERT INTO transactions (account_id, transaction_type, amount, timestamp, description) "
+            "VALUES (?, ?, ?, ?, ?)", rows)
+
+    def transactions(self, account_id=None, transaction_type=None, since=None, until=None, matching=None,
+                     after=None, limit=100):
+        # Keyed on (timestamp, transaction_id) so every page is an index range scan
+        where = ["1=1"]
+        params = []
+        if account_id is not None:
+            where.append("account_id = ?")
+            params.append(account_id)
+        if since is not None:
+            where.append("timestamp >= ?")  # Range on the raw column so the index is usable
+            params.append(since)
+        if until is not None:
+            where.append("timestamp < ?")
+            params.append(until)
+        if transaction_type is not None:
+            where.append("transaction_type = ?")
+            params.append(transaction_type)
+        if matching is not None:
+            if self.transaction_fts and account_id is not None:
+                where.append("transaction_id IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ?)")
+                params.append(search_index.transaction_match(account_id, matching))
+            else:
+                # SQLite built without FTS5: a scan that tokenizes the way FTS5 does, see search_index.matches()
+                self.conn.create_function('search_matches', 2, search_index.matches, deterministic=True)
+                where.append("search_matches(description, ?)")
+                params.append(matching)
+        if after is not None:
+            where.append("(timestamp, transaction_id) < (?, ?)")
+            params.extend(after)
+        query = ("SELECT * FROM transactions WHERE " + " AND ".join(where) +
+                 " ORDER BY timestamp DESC, transaction_id DESC LIMIT ?")
+        params.append(limit)
+        return [dict(row) for row in self.conn.execute(query, params)]
+
+    def rank_transactions(self, account_id, matching, limit):
+        if not self.transaction_fts:
+            return None
+        rows = self.conn.execute(
+            "SELECT t.* FROM transactions_fts JOIN transactions t ON t.transaction_id = transactions_fts.rowid "
+            "WHERE transactions_fts MATCH ? ORDER BY bm25(transactions_fts, 0.0, 1.0) LIMIT ?",
+            (search_index.transaction_match(account_id, matching), limit))
+        return [dict(row) for row in rows]
+
+    def all_transactions(self):
+        return self._iterate("SELECT * FROM transactions ORDER BY transaction_id")
+
+    def _iterate(self, query, batch_size=500):
+        # Read in fetchmany() batches so memory stays flat on large tables
+        cursor = self.conn.execute(query)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+
+    # --- Sessions ---
+
+    _SESSION_TABLES = {'manager': ('managers', 'id'), 'customer': ('customers', 'account_id')}
+
+    def session_principal(self, token, role):
+        if role not in self._SESSION_TABLES:
+            return None
+        table, key = self._SESSION_TABLES[role]
+        # Only the id is needed; don't drag password and balance along
+        row = self.conn.execute(f"SELECT {key} FROM {table} WHERE auth_token = ?", (token,)).fetchone()
+        return row[0] if row else None
+
+    def start_session(self, role, principal_id, token):
+        table, key = self._SESSION_TABLES[role]
+        self.conn.execute(f"UPDATE {table} SET auth_token = ? WHERE {key} = ?", (token, principal_id))
+        self.conn.commit()
+
+    def end_session(self, role, token):
+        table, _ = self._SESSION_TABLES[role]
+        self.conn.execute(f"UPDATE {table} SET auth_token = NULL WHERE auth_token = ?", (token,))
+        self.conn.commit()
+
+    def revoked_sessions(self, after_id):
+        # A range scan on the primary key
+        return self.conn.execute("SELECT id, session_id, expires_at FROM revoked_sessions WHERE id > ? ORDER BY id",
+                                 (after_id,)).fetchall()
+
+    def revoke_session(self, session_id, expires_at):
+        self.conn.execute("DELETE FROM revoked_sessions WHERE expires_at <= ?", (int(time.time()),))
+        self.conn.execute("INSERT OR IGNORE INTO revoked_sessions (session_id, expires_at) VALUES (?, ?)",
+                          (session_id, expires_at))
+        self.conn.commit()
+
+    # --- Idempotency records ---
+
+    def idempotency_record(self, account_id, key, since):
+        row = self.conn.execute(
+            "SELECT fingerprint, status, response, created_at FROM idempotency_keys "
+            "WHERE account_id = ? AND idempotency_key = ? AND created_at >= ?",
+            (account_id, key, since)).fetchone()
+        return (row[0], row[1], json.loads(row[2]), row[3]) if row else None
+
+    def save_idempotency_record(self, account_id, key, fingerprint, status, body, created_at):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO idempotency_keys "
+            "(account_id, idempotency_key, fingerprint, status, response, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (account_id, key, fingerprint, status, json.dumps(body), created_at))
+
+    def expire_idempotency_records(self, before):
+        self.conn.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (before,))
+
+
+# --- In-memory ---
+
+class MemoryStorage(Storage):
+    # Serves the routes from a v1 MemoryStore (accounts, balances and the columnar ledger,
+    # journaled if the store has a data_dir) plus what only this interface needs: manager
+    # sessions, revocations, idempotency records and a (timestamp, transaction_id) index.
+    # One instance is shared by every request. A single re-entrant lock serializes writers
+    # and gives readers a consistent view; each write is one store batch() and keeps an undo
+    # log, so Abort and errors roll it back like SQLite would and journal nothing.
+    def __init__(self, store=None):
+        self.store = store if store is not None else MemoryStore(snapshot_interval=0)
+        self._lock = threading.RLock()
+        self._undo = None  # List of undo callables while a write() is running
+        self._journal = None  # The store batch's held-back entries while a write() is running
+        self._total_balance = sum(customer['balance'] for customer in self.store.customers.values())
+        # Keyset indexes: sorted (timestamp, transaction_id, ledger position) entries, globally and per account
+        self._by_time = []
+        self._by_account = {}
+        ledger = self.store.ledger
+        for position in range(len(ledger)):
+            row = self._ledger_row(position)
+            self._index((row['timestamp'], row['transaction_id'], position), row['account_id'])
+        self._sessions = {role: {} for role in ROLES}  # role -> token -> principal id
+        self._session_tokens = {role: {} for role in ROLES}  # role -> principal id -> token
+        self._revoked = []  # (id, session_id, expires_at)
+        self._next_revocation_id = 1
+        self._idempotency = {}  # (account_id, key) -> (fingerprint, status, body, created_at)
+
+    def _logged(self, undo):
+        if self._undo is not None:
+            self._undo.append(undo)
+
+    def write(self, operation, *args):
+        with self._lock, self.store.batch() as journal:
+            self._undo, self._journal = [], journal
+            try:
+                return operation(self, *args)
+            except Abort as e:
+                self._rollback()
+                return e.result
+            except Exception:
+                self._rollback()
+                raise
+            finally:
+                self._undo = self._journal = None
+
+    def _rollback(self):
+        for undo in reversed(self._undo):
+            undo()
+        self._journal.clear()
+
+    # --- Accounts ---
+
+    def add_manager(self, username, password):
+        with self._lock:
+            return self.store.add_manager(username, password)
+
+    def check_manager(self, username, password):
+        with self._lock:
+            manager = self.store.managers.get(username)
+            return manager['id'] if manager and manager['password'] == password else None
+
+    def add_customer(self, name, email, password, balance):
+        with self._lock:
+            account_id = self.store.open_account(name, email, password, balance)
+            if account_id is None:
+                return None
+            self._total_balance += balance
+            self._logged(lambda: self._remove_customer(account_id))
+            return account_id
+
+    def _remove_customer(self, account_id):
+        # Only ever undoes the newest account, so its id is handed out again like SQLite does
+        self._total_balance -= self.store.customers[account_id]['balance']
+        self.store.undo_open_account(account_id)
+
+    def check_customer(self, email, password):
+        with self._lock:
+            return self.store.authenticate_customer(email, password)
+
+    def balance(self, account_id):
+        with self._lock:
+            customer = self.store.get_customer(account_id)
+            return customer['balance'] if customer else None
+
+    def existing_accounts(self, account_ids):
+        with self._lock:
+            return {account_id for account_id in account_ids if account_id in self.store.customers}
+
+    def _adjust(self, account_id, amount, floor=None):
+        balance = self.store.adjust_balance(account_id, amount, floor)
+        if balance is not None:
+            self._total_balance += amount
+            self._logged(lambda: self._adjust(account_id, -amount))
+        return balance
+
+    def credit(self, account_id, amount):
+        with self._lock:
+            return self._adjust(account_id, amount)
+
+    def debit(self, account_id, amount):
+        with self._lock:
+            return self._adjust(account_id, -amount, floor=0)
+
+    def customers(self):
+        with self._lock:
+            summaries = [self.store.customer_summary(account_id)
+                         for account_id in self.store.customers]  # Insertion order is account_id order
+        return iter(summaries)
+
+    def search_customers(self, name=None, email=None, account_id=None, prefix=False, after=None, limit=100):
+        terms = [(column, text.lower()) for column, text in (('name', name), ('email', email)) if text]
+
+        def matches(customer):
+            for column, text in terms:
+                value = customer[column].lower()
+                if not (value.startswith(text) if prefix else text in value):
+                    return False
+            return True
+
+        with self._lock:
+            customers = self.store.customers
+            if account_id is not None:
+                candidates = [account_id] if account_id in customers else []
+            else:
+                candidates = customers
+            found = []
+            for candidate in candidates:
+                if (after is None or candidate > after) and matches(customers[candidate]):
+                    found.append(self.store.customer_summary(candidate))
+                    if len(found) >= limit:
+                        break
+            return found
+
+    def import_customers(self, rows):
+        return customer_import.import_customers(self, rows, insert_chunk=_import_chunk)
+
+    def stats(self):
+        with self._lock:
+            return {'total_customers': len(self.store.customers), 'total_transactions': len(self.store.ledger),
+                    'total_balance': self._total_balance}
+
+    # --- Ledger ---
+
+    def _ledger_row(self, position):
+        # The ledger keeps timestamps as numbers and hands them back in ISO form
+        row = self.store.ledger.row(position)
+        row['timestamp'] = format_timestamp(datetime.fromisoformat(row['timestamp']))
+        return row
+
+    def _index(self, entry, account_id):
+        bisect.insort(self._by_time, entry)  # Nearly always lands at the end
+        bisect.insort(self._by_account.setdefault(account_id, []), entry)
+
+    def add_transactions(self, rows):
+        with self._lock:
+            rows = list(rows)
+            positions = self.store.append_rows(rows)
+            first_id = self.store.next_transaction_id - len(rows)
+            entries = []
+            for offset, (position, row) in enumerate(zip(positions, rows)):
+                entry = (row[3], first_id + offset, position)
+                self._index(entry, row[0])
+                entries.append((entry, row[0]))
+            self._logged(lambda: self._remove_transactions(positions, entries))
+
+    def _remove_transactions(self, positions, entries):
+        # Only ever undoes the newest rows, see _remove_customer
+        for entry, account_id in entries:
+            for index in (self._by_time, self._by_account[account_id]):
+                del index[bisect.bisect_left(index, entry)]
+        self.store.undo_append_rows(positions)
+
+    def transactions(self, account_id=None, transaction_type=None, since=None, until=None, matching=None,
+                     after=None, limit=100):
+        with self._lock:
+            index = self._by_time if account_id is None else self._by_account.get(account_id, [])
+            end = len(index)
+            if until is not None:
+                end = bisect.bisect_left(index, (until,))
+            if after is not None:
+                end = min(end, bisect.bisect_left(index, tuple(after)))
+            found = []
+            for position in range(end - 1, -1, -1):
+                timestamp, _, ledger_position = index[position]
+                if since is not None and timestamp < since:
+                    break
+                row = self._ledger_row(ledger_position)
+                if transaction_type is not None and row['transaction_type'] != transaction_type:
+                    continue
+                if matching is not None and not search_index.matches(row['description'], matching):
+                    continue
+                found.append(row)
+                if len(found) >= limit:
+                    break
+            return found
+
+    def all_transactions(self):
+        # The ledger only grows at the end, so a position walk needs no snapshot
+        position = 0
+        while True:
+            with self._lock:
+                batch = [self._ledger_row(row) for row in range(position, min(position + 500, len(self.store.ledger)))]
+            if not batch:
+                return
+            position += len(batch)
+            yield from batch
+
+    # --- Sessions ---
+
+    def session_principal(self, token, role):
+        with self._lock:
+            return self._sessions.get(role, {}).get(token)
+
+    def start_session(self, role, principal_id, token):
+        with self._lock:
+            previous = self._session_tokens[role].get(principal_id)
+            if previous is not None:
+                del self._sessions[role][previous]
+            self._sessions[role][token] = principal_id
+            self._session_tokens[role][principal_id] = token
+
+    def end_session(self, role, token):
+        with self._lock:
+            principal_id = self._sessions[role].pop(token, None)
+            if principal_id is not None:
+                del self._session_tokens[role][principal_id]
+
+    def revoked_sessions(self, after_id):
+        with self._lock:
+            return [revocation for revocation in self._revoked if revocation[0] > after_id]
+
+    def revoke_session(self, session_id, expires_at):
+        now = int(time.time())
+        with self._lock:
+            self._revoked = [revocation for revocation in self._revoked if revocation[2] > now]
+            if any(revocation[1] == session_id for revocation in self._revoked):
+                return
+            self._revoked.append((self._next_revocation_id, session_id, expires_at))
+            self._next_revocation_id += 1
+
+    # --- Idempotency records ---
+
+    def idempotency_record(self, account_id, key, since):
+        with self._lock:
+            record = self._idempotency.get((account_id, key))
+            return record if record is not None and record[3] >= since else None
+
+    def save_idempotency_record(self, account_id, key, fingerprint, status, body, created_at):
+        with self._lock:
+            previous = self._idempotency.get((account_id, key))
+            self._idempotency[(account_id, key)] = (fingerprint, status, body, created_at)
+            self._logged(lambda: self._restore_idempotency_record((account_id, key), previous))
+
+    def _restore_idempotency_record(self, key, record):
+        if record is None:
+            self._idempotency.pop(key, None)
+        else:
+            self._idempotency[key] = record
+
+    def expire_idempotency_records(self, before):
+        with self._lock:
+            for key in [key for key, record in self._idempotency.items() if record[3] < before]:
+                record = self._idempotency.pop(key)
+                self._logged(lambda key=key, record=record: self._restore_idempotency_record(key, record))
+
+
+def _import_chunk(store, chunk, report):
+    # customer_import insert_chunk for MemoryStorage: one write per chunk, like the SQLite path
+    def insert(store):
+        imported, errors, deposits = 0, [], []
+        timestamp = format_timestamp(datetime.now())
+        for line_number, (name, email, password, cents) in chunk:
+            account_id = store.add_customer(name, email, password, cents)
+            if account_id is None:
+                errors.append({'line': line_number, 'error': 'Email already registered'})
+                continue
+            imported += 1
+            if cents > 0:
+                deposits.append((account_id, 'deposit', cents, timestamp, 'Initial deposit'))
+        store.add_transactions(deposits)
+        return imported, errors
+
+    imported, errors = store.write(insert)
+    report['imported'] += imported
+    report['errors'].extend(errors)
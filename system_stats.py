@@ -0,0 +1,108 @@
+"""
+Incrementally maintained totals behind /managers/stats/.
+
+The single system_stats row is kept current by triggers on customers and
+transactions, so every writer (API, imports, seeding scripts) updates it in
+the same transaction as the change itself. rebuild() recomputes it from the
+base tables and verify() reports any drift.
+
+Usage: python system_stats.py [verify|rebuild] [bank.db]
+"""
+
+import sqlite3
+import sys
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS system_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_customers INTEGER NOT NULL DEFAULT 0,
+        total_transactions INTEGER NOT NULL DEFAULT 0,
+        total_balance INTEGER NOT NULL DEFAULT 0  -- cents, like customers.balance
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_customer_insert AFTER INSERT ON customers
+    BEGIN
+        UPDATE system_stats SET total_customers = total_customers + 1,
+                                total_balance = total_balance + NEW.balance WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_customer_delete AFTER DELETE ON customers
+    BEGIN
+        UPDATE system_stats SET total_customers = total_customers - 1,
+                                total_balance = total_balance - OLD.balance WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_customer_balance AFTER UPDATE OF balance ON customers
+    BEGIN
+        UPDATE system_stats SET total_balance = total_balance + NEW.balance - OLD.balance WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_transaction_insert AFTER INSERT ON transactions
+    BEGIN
+        UPDATE system_stats SET total_transactions = total_transactions + 1 WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_transaction_delete AFTER DELETE ON transactions
+    BEGIN
+        UPDATE system_stats SET total_transactions = total_transactions - 1 WHERE id = 1;
+    END
+    ''',
+]
+
+
+def compute(conn):
+    total_customers, total_balance = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(balance), 0) FROM customers").fetchone()
+    total_transactions = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    return {'total_customers': total_customers, 'total_transactions': total_transactions,
+            'total_balance': total_balance}
+
+
+def read(conn):
+    row = conn.execute(
+        "SELECT total_customers, total_transactions, total_balance FROM system_stats WHERE id = 1").fetchone()
+    if row is None:
+        return None
+    return {'total_customers': row[0], 'total_transactions': row[1], 'total_balance': row[2]}
+
+
+def create(conn):
+    for statement in SCHEMA:
+        conn.execute(statement)
+    rebuild(conn)
+
+
+def rebuild(conn):
+    totals = compute(conn)
+    conn.execute(
+        "INSERT OR REPLACE INTO system_stats (id, total_customers, total_transactions, total_balance) "
+        "VALUES (1, :total_customers, :total_transactions, :total_balance)", totals)
+    return totals
+
+
+def verify(conn):
+    # Returns {field: (stored, actual)} for every counter that has drifted
+    stored = read(conn) or {}
+    actual = compute(conn)
+    return {key: (stored.get(key), value) for key, value in actual.items() if stored.get(key) != value}
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'verify'
+    with sqlite3.connect(sys.argv[2] if len(sys.argv) > 2 else 'bank.db') as connection:
+        if command == 'rebuild':
+            print(f'Rebuilt system_stats: {rebuild(connection)}')
+        elif command == 'verify':
+            drift = verify(connection)
+            for field, (stored, actual) in drift.items():
+                print(f'{field}: stored {stored}, actual {actual}')
+            print('system_stats is consistent' if not drift else 'system_stats has drifted, run rebuild')
+            sys.exit(1 if drift else 0)
+        else:
+            sys.exit(f'Unknown command {command!r}, expected verify or rebuild')
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as bank_app  # noqa: E402
+
+
+@pytest.fixture
+def bank(tmp_path, monkeypatch):
+    # The app module, pointed at a fresh database with no pool, write queue or init yet
+    monkeypatch.setattr(bank_app, 'DATABASE', str(tmp_path / 'bank.db'))
+    monkeypatch.setattr(bank_app, 'first_request', True)
+    monkeypatch.setattr(bank_app, '_pool', None)
+    monkeypatch.setattr(bank_app, '_write_queue', None)
+    yield bank_app
+    if bank_app._write_queue is not None:
+        bank_app._write_queue.stop(timeout=5)
+    if bank_app._pool is not None:
+        bank_app._pool.close()
+
+
+@pytest.fixture
+def client(bank):
+    return bank.app.test_client()
+
+
+def register_and_login_customer(client, email='jane@example.com', initial_deposit=100):
+    response = client.post('/customers/register/', json={
+        'name': 'Jane Doe', 'email': email, 'password': 'secret', 'initial_deposit': initial_deposit})
+    assert response.status_code == 201, response.get_json()
+    response = client.post('/customers/login/', json={'email': email, 'password': 'secret'})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['access_token']
+
+
+def register_and_login_manager(client, username='ada'):
+    response = client.post('/managers/register/', json={'username': username, 'password': 'secret'})
+    assert response.status_code == 201, response.get_json()
+    response = client.post('/managers/login/', json={'username': username, 'password': 'secret'})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['access_token']
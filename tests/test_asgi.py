@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+import pytest
+
+asgi = pytest.importorskip('asgi')
+
+
+def call(method, path, chunks, headers=()):
+    # Runs one request through the ASGI application; the body arrives in several messages
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': index < len(chunks) - 1}
+                for index, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'http_version': '1.1',
+             'headers': [(name.encode(), value.encode()) for name, value in headers]}
+    asyncio.run(asgi.application(scope, receive, send))
+    status = sent[0]['status']
+    return status, b''.join(message.get('body', b'') for message in sent[1:])
+
+
+def test_requests_run_through_the_flask_routes(bank):
+    body = b'{"username": "ada", "password": "secret"}'
+    headers = [('content-type', 'application/json'), ('content-length', str(len(body)))]
+    status, _ = call('POST', '/managers/register/', [body], headers)
+    assert status == 201
+    status, body = call('POST', '/managers/login/', [body], headers)
+    assert status == 200
+    token = json.loads(body)['access_token']
+    status, body = call('GET', '/managers/stats/', [b''], [('authorization', f'Bearer {token}')])
+    assert status == 200
+    assert json.loads(body)['total_customers'] == 0
+    assert call('GET', '/managers/stats/', [b''])[0] == 401
+
+
+def test_full_executor_answers_503(bank, monkeypatch):
+    monkeypatch.setattr(asgi, 'readers', asgi.BoundedExecutor(1, 0, 'test-read'))
+    status, body = call('GET', '/managers/stats/', [b''])
+    assert status == 503
+    assert json.loads(body) == {'error': 'Server busy, retry shortly'}
+    assert asgi.readers.stats() == {'pending': 0, 'rejected': 1}
+
+
+def test_chunked_request_body(bank):
+    # Transfer-Encoding: chunked, so no Content-Length header
+    headers = [('content-type', 'application/json'), ('transfer-encoding', 'chunked')]
+    status, _ = call('POST', '/managers/register/', [b'{"username": "ada", ', b'"password": "secret"}'], headers)
+    assert status == 201
+    status, body = call('POST', '/managers/login/', [b'{"username": "ada", ', b'"password": "secret"}'], headers)
+    assert status == 200, body
+    assert b'access_token' in body
+
+
+def test_requests_still_uploading_count_toward_max_pending(bank, monkeypatch):
+    monkeypatch.setattr(asgi, 'writers', asgi.BoundedExecutor(1, 2, 'test-write'))
+    headers = [(b'content-type', b'application/json')]
+
+    async def run():
+        uploaded = asyncio.Event()
+        statuses = []
+
+        async def slow_request(index):
+            # Sends half of its body, then waits until every request has arrived
+            messages = [{'type': 'http.request', 'body': b'{"username": "user%d", ' % index, 'more_body': True}]
+
+            async def receive():
+                if not messages:
+                    await uploaded.wait()
+                    return {'type': 'http.request', 'body': b'"password": "secret"}'}
+                return messages.pop(0)
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+
+            scope = {'type': 'http', 'method': 'POST', 'path': '/managers/register/', 'query_string': b'',
+                     'http_version': '1.1', 'headers': headers}
+            await asgi.application(scope, receive, send)
+
+        tasks = [asyncio.create_task(slow_request(index)) for index in range(4)]
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert sorted(statuses) == [503, 503]  # Rejected while the first two were still uploading
+        uploaded.set()
+        await asyncio.gather(*tasks)
+        while asgi.writers.pending:
+            await asyncio.sleep(0.01)  # Slots are released by the worker's done callback
+        return sorted(statuses)
+
+    assert asyncio.run(asyncio.wait_for(run(), 10)) == [201, 201, 503, 503]
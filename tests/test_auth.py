@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+
+import signed_tokens
+from conftest import register_and_login_customer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_signed_token_round_trip():
+    token = signed_tokens.issue('secret', 'customer', 7, 60)
+    assert signed_tokens.is_signed(token)
+    claims = signed_tokens.verify('secret', token)
+    assert (claims['role'], claims['sub'], claims['exp'] - claims['iat']) == ('customer', 7, 60)
+    payload, signature = token.rsplit('.', 1)
+    forged = signed_tokens.issue('secret', 'manager', 7, 60).rsplit('.', 1)[0]
+    for bad in (f'{forged}.{signature}', f'{payload}.{signature[::-1]}', 'v1.', 'v1.a.b.c'):
+        assert signed_tokens.verify('secret', bad) is None
+    assert signed_tokens.verify('other secret', token) is None
+    assert signed_tokens.verify('secret', signed_tokens.issue('secret', 'customer', 7, 0)) is None  # Expired
+
+
+def test_logout_revokes_only_that_session(client, bank, monkeypatch):
+    monkeypatch.setitem(bank.app.config, 'AUTH_TOKENS', 'signed')
+    phone = register_and_login_customer(client)
+    laptop = client.post('/customers/login/', json={'email': 'jane@example.com', 'password': 'secret'})
+    laptop = {'Authorization': f"Bearer {laptop.get_json()['access_token']}"}
+    phone = {'Authorization': f'Bearer {phone}'}
+    assert client.get('/customers/me/balance/', headers=phone).status_code == 200
+    assert client.post('/customers/logout/', headers=phone).status_code == 200
+    assert client.get('/customers/me/balance/', headers=phone).status_code == 401
+    assert client.get('/customers/me/balance/', headers=laptop).status_code == 200
+
+
+def test_revocations_reach_other_workers(client, bank, monkeypatch):
+    monkeypatch.setitem(bank.app.config, 'AUTH_TOKENS', 'signed')
+    headers = {'Authorization': f'Bearer {register_and_login_customer(client)}'}
+    assert client.post('/customers/logout/', headers=headers).status_code == 200
+    # A worker that has not seen the logout yet finds it on its next poll
+    monkeypatch.setattr(bank, 'revocations', signed_tokens.RevocationList(refresh_interval=0))
+    assert client.get('/customers/me/balance/', headers=headers).status_code == 401
+    assert len(bank.revocations) == 1
+
+
+def test_signed_tokens_are_refused_in_opaque_mode(client, bank):
+    register_and_login_customer(client)
+    assert bank.app.config['AUTH_TOKENS'] == 'opaque'
+    for role, path in (('manager', '/managers/stats/'), ('customer', '/customers/me/balance/')):
+        forged = signed_tokens.issue(bank.app.config['SECRET_KEY'], role, 1, 3600)
+        response = client.get(path, headers={'Authorization': f'Bearer {forged}'})
+        assert response.status_code == 401
+
+
+def test_signed_mode_needs_a_secret_key():
+    env = {key: value for key, value in os.environ.items() if key != 'BANK_SECRET_KEY'}
+    env['BANK_AUTH_TOKENS'] = 'signed'
+    result = subprocess.run([sys.executable, '-c', 'import app'], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode != 0
+    assert 'BANK_SECRET_KEY' in result.stderr
+
+
+def test_non_ascii_signature_is_invalid(client, bank, monkeypatch):
+    monkeypatch.setitem(bank.app.config, 'AUTH_TOKENS', 'signed')
+    register_and_login_customer(client)
+    payload = signed_tokens.issue(bank.app.config['SECRET_KEY'], 'customer', 1, 3600).rsplit('.', 1)[0]
+    for token in (f'{payload}.\xe9', 'v1.abc.\xe9', 'v1.\xe9.abc'):
+        assert signed_tokens.verify(bank.app.config['SECRET_KEY'], token) is None
+    response = client.get('/customers/me/balance/', headers={'Authorization': 'Bearer v1.abc.\xe9'.encode('latin-1')})
+    assert response.status_code == 401
@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import benchmark
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('storage', ['sqlite', 'memory'])
+def test_tiny_run_covers_every_scenario_without_errors(tmp_path, storage):
+    output = tmp_path / 'result.json'
+    result = subprocess.run([sys.executable, 'benchmark.py', '--customers', '3', '--history', '2', '--requests', '3',
+                             '--storage', storage, '--output', str(output)],
+                            cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    scenarios = json.loads(output.read_text())['scenarios']
+    assert list(scenarios) == [name for name, _ in benchmark.SCENARIOS]
+    assert all(stats['requests'] == 3 and stats['errors'] == 0 for stats in scenarios.values())
+
+
+def test_percentiles_and_comparison():
+    values = list(range(1, 101))
+    assert [benchmark.percentile(values, fraction) for fraction in (0.5, 0.95, 0.99)] == [50, 95, 99]
+    assert benchmark.percentile([], 0.5) is None
+    before = {'scenarios': {'balance': {'throughput_rps': 200.0, 'latency_ms': {'p50': 2.0, 'p95': 4.0, 'p99': 5.0}}}}
+    after = {'scenarios': {'balance': {'throughput_rps': 100.0, 'latency_ms': {'p50': 3.0, 'p95': 4.0, 'p99': 10.0}},
+                           'new': {'throughput_rps': 1.0, 'latency_ms': {'p50': 1.0, 'p95': 1.0, 'p99': 1.0}}}}
+    assert benchmark.compare(after, before) == {'balance': {'p50': 50.0, 'p95': 0.0, 'p99': 100.0,
+                                                            'throughput_rps': 100.0}}
@@ -0,0 +1,83 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+from contextlib import closing
+
+import pytest
+
+import customer_import
+from conftest import register_and_login_customer, register_and_login_manager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def import_file(client):
+    headers = {'Authorization': f'Bearer {register_and_login_manager(client)}'}
+
+    def post(body, content_type):
+        response = client.post('/managers/customers/import/', data=body, content_type=content_type, headers=headers)
+        return response.status_code, response.get_json()
+
+    return post
+
+
+def test_csv_import_reports_failing_rows(client, bank, import_file):
+    register_and_login_customer(client)
+    body = ('name,email,password,initial_deposit\n'
+            'Ada Lovelace,ada@example.com,secret,12.50\n'
+            'Alan Turing,alan@example.com,secret,\n'
+            'Ada Again,ada@example.com,secret,1\n'
+            'Jane Doe,jane@example.com,secret,1\n'
+            'Grace Hopper,grace@example.com,secret,1.005\n'
+            ',nameless@example.com,secret,1\n')
+    status, report = import_file(body, 'text/csv')
+    assert status == 200
+    assert report == {'imported': 2, 'failed': 4, 'errors': [
+        {'line': 4, 'error': 'Duplicate email in import (first seen on line 2)'},
+        {'line': 5, 'error': 'Email already registered'},
+        {'line': 6, 'error': 'Invalid initial deposit amount'},
+        {'line': 7, 'error': 'Name, email, and password are required'}]}
+    with closing(sqlite3.connect(bank.DATABASE)) as conn:
+        rows = conn.execute("SELECT c.name, t.amount FROM customers c LEFT JOIN transactions t USING (account_id) "
+                            "WHERE c.account_id > 1 ORDER BY c.account_id").fetchall()
+    assert rows == [('Ada Lovelace', 1250), ('Alan Turing', None)]
+
+
+def test_ndjson_import(client, import_file):
+    body = '{"name": "Ada", "email": "ada@example.com", "password": "secret", "initial_deposit": 5}\n\n{"name"\n'
+    status, report = import_file(body, 'application/x-ndjson')
+    assert (status, report['imported'], report['failed']) == (200, 1, 1)
+    assert report['errors'][0]['line'] == 3
+    assert report['errors'][0]['error'].startswith('Invalid JSON')
+    assert client.post('/customers/login/', json={'email': 'ada@example.com', 'password': 'secret'}).status_code == 200
+    assert import_file('{}', 'application/json')[0] == 415
+
+
+def test_rows_are_inserted_in_chunks(tmp_path, bank):
+    bank.init_db()
+    rows = [(line, {'name': f'Customer {line}', 'email': f'{line}@example.com', 'password': 'x'}, None)
+            for line in range(2, 7)]
+    with closing(sqlite3.connect(bank.DATABASE)) as conn:
+        conn.execute("INSERT INTO customers (name, email, password, balance) VALUES ('Taken', '5@example.com', 'x', 0)")
+        conn.commit()
+        report = customer_import.import_customers(conn, rows, chunk_size=2)
+        assert report == {'imported': 4, 'failed': 1, 'errors': [{'line': 5, 'error': 'Email already registered'}]}
+        assert conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0] == 5
+
+
+def test_cli_migrates_an_old_database_before_importing(tmp_path):
+    database = tmp_path / 'bank.db'
+    shutil.copy(os.path.join(ROOT, 'bank.db'), database)  # The pre-cents schema, REAL balances
+    source = tmp_path / 'customers.csv'
+    source.write_text('name,email,password,initial_deposit\nNew Customer,new.customer@example.com,secret,25.50\n')
+    result = subprocess.run([sys.executable, 'customer_import.py', str(source), str(database)], cwd=ROOT,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    with closing(sqlite3.connect(database)) as conn:
+        assert conn.execute("SELECT balance FROM customers WHERE email = 'new.customer@example.com'").fetchone() == \
+            (2550,)
+        assert conn.execute("SELECT type FROM pragma_table_info('customers') WHERE name = 'balance'").fetchone() == \
+            ('INTEGER',)
@@ -0,0 +1,53 @@
+import pytest
+
+from conftest import register_and_login_manager
+
+CUSTOMERS = [('Ada Lovelace', 'ada@example.com'), ('Grace Hopper', 'grace@navy.mil'),
+             ('Alan Turing', 'alan@example.org'), ('Adalbert 100%', 'adal_bert@example.com')]
+
+
+@pytest.fixture
+def manager(client):
+    for name, email in CUSTOMERS:
+        response = client.post('/customers/register/', json={
+            'name': name, 'email': email, 'password': 'secret', 'initial_deposit': 0})
+        assert response.status_code == 201
+    return {'Authorization': f'Bearer {register_and_login_manager(client)}'}
+
+
+@pytest.mark.parametrize('args, expected', [
+    ({'name': 'love'}, [1]),
+    ({'name': 'ADA'}, [1, 4]),
+    ({'name': 'ada', 'match': 'prefix'}, [1, 4]),
+    ({'name': 'lace', 'match': 'prefix'}, []),
+    ({'email': 'example'}, [1, 3, 4]),
+    ({'email': 'navy.mil'}, [2]),
+    ({'name': 'a', 'email': '.org'}, [3]),
+    ({'name': '100%'}, [4]),
+    ({'name': '%'}, [4]),
+    ({'email': 'l_b'}, [4]),
+    ({'account_id': '2'}, [2]),
+])
+def test_search_customers(client, manager, args, expected):
+    response = client.get('/managers/customers/search/', query_string=args, headers=manager)
+    assert response.status_code == 200
+    assert [row['account_id'] for row in response.get_json()['customers']] == expected
+
+
+def test_search_customers_pages_in_account_order(client, manager):
+    found, cursor = [], None
+    while True:
+        query = {'email': 'example', 'limit': 2}
+        if cursor:
+            query['cursor'] = cursor
+        body = client.get('/managers/customers/search/', query_string=query, headers=manager).get_json()
+        found.extend(row['account_id'] for row in body['customers'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert found == [1, 3, 4]
+
+
+@pytest.mark.parametrize('query', ['account_id=x', 'match=exact&name=ada'])
+def test_invalid_customer_search(client, manager, query):
+    assert client.get(f'/managers/customers/search/?{query}', headers=manager).status_code == 400
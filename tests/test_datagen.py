@@ -0,0 +1,51 @@
+import gc
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import datagen
+import system_stats
+
+OPTIONS = {'customers': 30, 'transactions': 500, 'skew': 1.2, 'days': 10, 'end': datetime(2025, 1, 1),
+           'mix': datagen.parse_mix('deposit=2,withdrawal=1,transfer=1'), 'hot_accounts': 3, 'hot_share': 0.5}
+
+
+def contents(path):
+    with closing(sqlite3.connect(path)) as conn:
+        return (conn.execute("SELECT * FROM customers ORDER BY account_id").fetchall(),
+                conn.execute("SELECT * FROM transactions ORDER BY transaction_id").fetchall())
+
+
+def test_same_seed_same_data(bank, tmp_path):
+    for name, seed in (('a.db', 1), ('b.db', 1), ('c.db', 2)):
+        datagen.load(str(tmp_path / name), seed=seed, **OPTIONS)
+    assert contents(tmp_path / 'a.db') == contents(tmp_path / 'b.db')
+    assert contents(tmp_path / 'a.db') != contents(tmp_path / 'c.db')
+
+
+def test_balances_match_the_ledger(bank, tmp_path):
+    path = str(tmp_path / 'bank.db')
+    datagen.load(path, seed=1, **OPTIONS)
+    with closing(sqlite3.connect(path)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 500
+        mismatched = conn.execute(
+            "SELECT c.account_id FROM customers c JOIN (SELECT account_id, SUM(CASE WHEN transaction_type IN "
+            "('deposit', 'transfer_in') THEN amount ELSE -amount END) AS total FROM transactions GROUP BY account_id) "
+            "t USING (account_id) WHERE c.balance != t.total OR c.balance < 0").fetchall()
+        assert mismatched == []
+        assert system_stats.verify(conn) == {}
+        assert conn.execute("SELECT 1 FROM transactions_fts WHERE transactions_fts MATCH 'deposit'").fetchone()
+
+
+def test_load_creates_the_schema_and_rows(bank, tmp_path):
+    path = str(tmp_path / 'load.db')
+    gc.disable()  # Nothing may rely on the collector to close init_db()'s connection
+    try:
+        datagen.load(path, customers=20, transactions=200, skew=1.2, mix=datagen.parse_mix('deposit=1,transfer=1'),
+                     days=30, end=datetime(2025, 1, 1), hot_accounts=2, hot_share=0.5, seed=1)
+    finally:
+        gc.enable()
+    with closing(sqlite3.connect(path)) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 200
+        assert conn.execute("SELECT COUNT(*) FROM customers WHERE balance < 0").fetchone()[0] == 0
@@ -0,0 +1,46 @@
+import threading
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+def test_released_connection_is_reused(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert pool.stats() == {'size': 2, 'open': 1, 'idle': 0}
+    pool.close()
+
+
+def test_acquire_times_out_when_every_connection_is_busy(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1, timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    released = threading.Timer(0.01, pool.release, (conn,))
+    pool.timeout = 5
+    released.start()
+    assert pool.acquire() is conn  # A waiter wakes up when a connection comes back
+    released.join()
+    pool.close()
+
+
+def test_release_rolls_back_an_open_transaction(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1)
+    conn = pool.acquire()
+    conn.execute('CREATE TABLE items (name TEXT)')
+    conn.execute("INSERT INTO items VALUES ('left open')")
+    assert conn.in_transaction
+    pool.release(conn)
+    conn = pool.acquire()
+    assert not conn.in_transaction
+    assert conn.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 0
+    pool.close()
+
+
+def test_requests_share_the_pool(client, bank):
+    assert client.post('/managers/register/', json={'username': 'ada', 'password': 'secret'}).status_code == 201
+    assert client.post('/managers/login/', json={'username': 'ada', 'password': 'secret'}).status_code == 200
+    assert bank.get_pool().stats()['open'] == 1
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+import db_pragmas
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV = dict(os.environ, BANK_DB_PROFILE='throughput', BANK_STORAGE='sqlite')
+
+
+def test_profile_applies_to_pooled_connections(client, bank, monkeypatch):
+    monkeypatch.setitem(bank.app.config, 'DB_PROFILE', 'throughput')
+    with bank.app.app_context():
+        bank.init_db()
+        conn = bank.get_db()
+        pragmas = db_pragmas.PROFILES['durable']
+        effective = {pragma: conn.execute(f'PRAGMA {pragma}').fetchone()[0] for pragma in pragmas}
+    assert effective == {'journal_mode': 'wal', 'synchronous': 1, 'cache_size': -65536, 'mmap_size': 256 * 1024 * 1024,
+                         'temp_store': 2, 'busy_timeout': 5000}
+
+
+def test_unknown_profile_fails_at_import():
+    env = dict(os.environ, BANK_DB_PROFILE='fastest')
+    result = subprocess.run([sys.executable, '-c', 'import app'], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode != 0
+    assert "Unknown database profile 'fastest'" in result.stderr
+
+
+def run(code):
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=ENV, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return result.stderr
+
+
+def test_importing_the_app_logs_nothing():
+    assert run('import app') == ''
+
+
+def test_asgi_entry_point_reports_the_profile():
+    stderr = run('import asgi')
+    assert "Database profile 'throughput'" in stderr
+    assert "'synchronous': 'NORMAL'" in stderr
@@ -0,0 +1,35 @@
+import threading
+
+from conftest import register_and_login_customer
+
+
+def test_concurrent_withdrawals_never_overdraw(bank, client):
+    token = register_and_login_customer(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    statuses = []
+    start = threading.Barrier(20)
+
+    def withdraw():
+        own_client = bank.app.test_client()
+        start.wait()
+        statuses.append(own_client.post('/customers/me/withdraw/', json={'amount': 10}, headers=headers).status_code)
+
+    threads = [threading.Thread(target=withdraw) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(statuses) == [200] * 10 + [400] * 10
+    assert client.get('/customers/me/balance/', headers=headers).get_json()['balance'] == 0
+
+
+def test_failed_transfer_changes_nothing(client):
+    token = register_and_login_customer(client)
+    register_and_login_customer(client, email='john@example.com')
+    headers = {'Authorization': f'Bearer {token}'}
+    for body, status in (({'recipient_account_id': 9, 'amount': 10}, 404),
+                         ({'recipient_account_id': 2, 'amount': 100.01}, 400)):
+        assert client.post('/customers/me/transfer/', json=body, headers=headers).status_code == status
+    assert client.get('/customers/me/balance/', headers=headers).get_json()['balance'] == 100
+    response = client.get('/customers/me/transactions/', headers=headers)
+    assert [row['description'] for row in response.get_json()['transactions']] == ['Initial deposit']
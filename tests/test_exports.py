@@ -0,0 +1,34 @@
+import json
+
+from conftest import register_and_login_customer, register_and_login_manager
+
+
+def test_transactions_stream_as_ndjson_in_ledger_order(client):
+    register_and_login_customer(client)
+    register_and_login_customer(client, email='john@example.com', initial_deposit=250)
+    token = register_and_login_manager(client)
+    for request in ({'query_string': {'stream': '1'}}, {'headers': {'Accept': 'application/x-ndjson'}}):
+        headers = dict(request.pop('headers', {}), Authorization=f'Bearer {token}')
+        response = client.get('/managers/transactions/', headers=headers, **request)
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [(row['account_id'], row['amount']) for row in rows] == [(1, 100), (2, 250)]
+
+
+def test_customers_stream_without_passwords(client):
+    for index in range(3):
+        register_and_login_customer(client, email=f'customer{index}@example.com')
+    token = register_and_login_manager(client)
+    response = client.get('/managers/customers/?stream=1', headers={'Authorization': f'Bearer {token}'})
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['email'] for row in rows] == [f'customer{index}@example.com' for index in range(3)]
+    assert all(set(row) == {'account_id', 'name', 'email'} for row in rows)
+
+
+def test_json_listing_is_unchanged_by_default(client):
+    register_and_login_customer(client)
+    token = register_and_login_manager(client)
+    response = client.get('/managers/transactions/', headers={'Authorization': f'Bearer {token}'})
+    assert response.mimetype == 'application/json'
+    assert [row['amount'] for row in response.get_json()['transactions']] == [100]
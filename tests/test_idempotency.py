@@ -0,0 +1,42 @@
+import pytest
+
+from conftest import register_and_login_customer
+from idempotency import IdempotencyStore
+
+
+@pytest.fixture
+def headers(client, bank, monkeypatch):
+    monkeypatch.setattr(bank, 'idempotency_store', IdempotencyStore())  # Nothing cached by earlier tests
+    token = register_and_login_customer(client)
+    register_and_login_customer(client, email='john@example.com')
+    return {'Authorization': f'Bearer {token}', 'Idempotency-Key': 'retry-1'}
+
+
+@pytest.mark.parametrize('path, body', [('/customers/me/deposit/', {'amount': 10}),
+                                        ('/customers/me/withdraw/', {'amount': 10}),
+                                        ('/customers/me/transfer/', {'recipient_account_id': 2, 'amount': 10})])
+def test_retry_replays_the_first_response(client, bank, monkeypatch, headers, path, body):
+    first = client.post(path, json=body, headers=headers)
+    assert first.status_code == 200
+    assert 'Idempotent-Replayed' not in first.headers
+    for store in (bank.idempotency_store, IdempotencyStore()):  # From the cache, then from the table
+        monkeypatch.setattr(bank, 'idempotency_store', store)
+        retry = client.post(path, json=body, headers=headers)
+        assert retry.status_code == 200
+        assert retry.headers['Idempotent-Replayed'] == 'true'
+        assert retry.get_json() == first.get_json()
+    response = client.get('/customers/me/transactions/', headers={'Authorization': headers['Authorization']})
+    assert len(response.get_json()['transactions']) == 2  # Initial deposit and one write
+
+
+def test_key_reused_with_another_request_is_rejected(client, headers):
+    assert client.post('/customers/me/deposit/', json={'amount': 10}, headers=headers).status_code == 200
+    assert client.post('/customers/me/deposit/', json={'amount': 20}, headers=headers).status_code == 422
+    assert client.post('/customers/me/withdraw/', json={'amount': 10}, headers=headers).status_code == 422
+
+
+def test_aborted_write_can_be_retried(client, headers):
+    body = {'recipient_account_id': 3, 'amount': 10}
+    assert client.post('/customers/me/transfer/', json=body, headers=headers).status_code == 404
+    register_and_login_customer(client, email='jim@example.com')
+    assert client.post('/customers/me/transfer/', json=body, headers=headers).status_code == 200
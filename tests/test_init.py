@@ -0,0 +1,31 @@
+import os
+import shutil
+import threading
+
+import pytest
+
+import app as bank_app
+
+
+@pytest.mark.parametrize('baseline', [False, True])
+def test_concurrent_first_requests(bank, monkeypatch, tmp_path, baseline):
+    if baseline:
+        # The repository's bank.db predates the migrations, so they all run on the first request
+        shutil.copy(os.path.join(os.path.dirname(bank_app.__file__), 'bank.db'), tmp_path / 'baseline.db')
+        monkeypatch.setattr(bank, 'DATABASE', str(tmp_path / 'baseline.db'))
+    start = threading.Barrier(6)
+    statuses = []
+
+    def register(index):
+        client = bank.app.test_client()
+        start.wait()
+        response = client.post('/customers/register/', json={
+            'name': 'Jane Doe', 'email': f'first{index}@example.com', 'password': 'secret'})
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=register, args=(index,)) for index in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    assert statuses == [201] * 6
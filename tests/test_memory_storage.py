@@ -0,0 +1,116 @@
+import pytest
+
+import storage
+from conftest import register_and_login_customer
+from v1.store import MemoryStore
+from write_queue import Abort
+
+ROWS = [(1, 'deposit', 500, '2024-01-01 09:00:00.000000', 'Initial deposit'),
+        (1, 'withdrawal', 200, '2024-01-02 09:00:00.250000', None)]
+
+
+def scrub(value):
+    # Leaves out what may differ between runs: tokens, timestamps, cursor contents and cache counters
+    if isinstance(value, dict):
+        return {key: item is not None if key == 'next_cursor' else scrub(item) for key, item in value.items()
+                if key not in ('access_token', 'timestamp') and not key.endswith('_cache')}
+    if isinstance(value, list):
+        return [scrub(item) for item in value]
+    return value
+
+
+def session(client):
+    # The same conversation with the API, as (status, body) pairs
+    results = []
+
+    def call(method, path, token=None, **kwargs):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = client.open(path, method=method, headers=headers, **kwargs)
+        results.append((response.status_code, scrub(response.get_json())))
+        return response.get_json()
+
+    call('POST', '/managers/register/', json={'username': 'ada', 'password': 'secret'})
+    manager = call('POST', '/managers/login/', json={'username': 'ada', 'password': 'secret'})['access_token']
+    for name, email, deposit in (('Jane Doe', 'jane@example.com', 100), ('John Roe', 'john@example.com', 0),
+                                 ('Jane Doe', 'jane@example.com', 5)):
+        call('POST', '/customers/register/', json={'name': name, 'email': email, 'password': 'secret',
+                                                   'initial_deposit': deposit})
+    jane = call('POST', '/customers/login/', json={'email': 'jane@example.com', 'password': 'secret'})['access_token']
+    call('POST', '/customers/login/', json={'email': 'jane@example.com', 'password': 'wrong'})
+    call('POST', '/customers/me/deposit/', jane, json={'amount': 20.25})
+    call('POST', '/customers/me/withdraw/', jane, json={'amount': 500})
+    call('POST', '/customers/me/transfer/', jane, json={'recipient_account_id': 2, 'amount': 30})
+    call('POST', '/customers/me/transfer/', jane, json={'recipient_account_id': 9, 'amount': 30})
+    call('POST', '/customers/me/transfers/batch/', jane, json={'transfers': [
+        {'recipient_account_id': 2, 'amount': 1}, {'recipient_account_id': 2, 'amount': 2}]})
+    call('GET', '/customers/me/balance/', jane)
+    call('GET', '/customers/me/transactions/?limit=2', jane)
+    call('GET', '/customers/me/transactions/search/?description=transfer', jane)
+    call('GET', '/managers/stats/', manager)
+    call('GET', '/managers/customers/', manager)
+    call('GET', '/managers/customers/search/?name=roe', manager)
+    call('GET', '/managers/customers/2/transactions/', manager)
+    call('POST', '/customers/logout/', jane)
+    call('GET', '/customers/me/balance/', jane)
+    return results
+
+
+def test_engines_give_the_same_responses(client, bank, monkeypatch):
+    on_sqlite = session(client)
+    monkeypatch.setitem(bank.app.config, 'STORAGE', 'memory')
+    monkeypatch.setattr(bank, 'memory_storage', storage.MemoryStorage())
+    on_memory = session(client)
+    assert on_memory == on_sqlite
+    assert [status for status, _ in on_sqlite].count(200) == 13
+
+
+def open_storage(data_dir):
+    return storage.MemoryStorage(MemoryStore(data_dir=str(data_dir), snapshot_interval=0))
+
+
+def test_committed_writes_survive_a_restart(tmp_path):
+    engine = open_storage(tmp_path)
+    assert engine.add_manager('ada', 'secret')
+    engine.write(lambda store: (store.add_customer('Jane', 'jane@example.com', 'x', 500), store.add_transactions(ROWS),
+                                store.debit(1, 200)))
+    restarted = open_storage(tmp_path)
+    assert restarted.check_manager('ada', 'secret') == 1
+    assert restarted.balance(1) == 300
+    assert restarted.stats() == {'total_customers': 1, 'total_transactions': 2, 'total_balance': 300}
+    assert restarted.transactions(account_id=1) == engine.transactions(account_id=1)
+    assert [row['timestamp'] for row in restarted.transactions(account_id=1)] == \
+        ['2024-01-02 09:00:00.250000', '2024-01-01 09:00:00.000000']
+
+
+@pytest.mark.parametrize('failure', [Abort(({'error': 'nope'}, 400)), RuntimeError('boom')])
+def test_rolled_back_writes_leave_no_trace(tmp_path, failure):
+    engine = open_storage(tmp_path)
+    engine.write(lambda store: store.add_customer('Jane', 'jane@example.com', 'x', 500))
+
+    def operation(store):
+        store.credit(1, 100)
+        store.add_customer('John', 'john@example.com', 'x', 50)
+        store.add_transactions(ROWS)
+        raise failure
+
+    if isinstance(failure, Abort):
+        assert engine.write(operation) == ({'error': 'nope'}, 400)
+    else:
+        with pytest.raises(RuntimeError):
+            engine.write(operation)
+    for state in (engine, open_storage(tmp_path)):
+        assert state.stats() == {'total_customers': 1, 'total_transactions': 0, 'total_balance': 500}
+        assert state.transactions() == []
+    assert engine.write(lambda store: store.add_customer('John', 'john@example.com', 'x', 50)) == 2
+
+
+def test_routes_roll_back_on_the_memory_engine(client, bank, monkeypatch):
+    monkeypatch.setitem(bank.app.config, 'STORAGE', 'memory')
+    monkeypatch.setattr(bank, 'memory_storage', storage.MemoryStorage())
+    token = register_and_login_customer(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    response = client.post('/customers/me/transfer/', json={'recipient_account_id': 99, 'amount': 10}, headers=headers)
+    assert response.status_code == 404
+    assert client.get('/customers/me/balance/', headers=headers).get_json() == {'balance': 100.0}
+    history = client.get('/customers/me/transactions/', headers=headers).get_json()['transactions']
+    assert [row['description'] for row in history] == ['Initial deposit']
@@ -0,0 +1,32 @@
+import metrics
+from conftest import register_and_login_customer, register_and_login_manager
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = metrics.Metrics(buckets=(0.1, 1.0))
+    for duration in (0.05, 0.5, 0.5, 5.0):
+        registry.record('/path/<int:id>/', 'GET', 200, duration, {'db': 0.05})
+    text = registry.render()
+    assert 'bank_http_requests_total{endpoint="/path/<int:id>/",method="GET",status="200"} 4' in text
+    assert 'bank_http_request_duration_seconds_bucket{endpoint="/path/<int:id>/",method="GET",le="0.1"} 1' in text
+    assert 'bank_http_request_duration_seconds_bucket{endpoint="/path/<int:id>/",method="GET",le="1.0"} 3' in text
+    assert 'bank_http_request_duration_seconds_bucket{endpoint="/path/<int:id>/",method="GET",le="+Inf"} 4' in text
+    assert 'bank_http_request_duration_seconds_sum{endpoint="/path/<int:id>/",method="GET"} 6.05' in text
+    assert 'bank_http_phase_duration_seconds_count{endpoint="/path/<int:id>/",phase="db"} 4' in text
+
+
+def test_requests_are_recorded_per_route(client, bank, monkeypatch):
+    monkeypatch.setattr(bank, 'request_metrics', metrics.Metrics())
+    token = register_and_login_customer(client)
+    for _ in range(3):
+        client.get('/customers/me/balance/', headers={'Authorization': f'Bearer {token}'})
+    manager = {'Authorization': f'Bearer {register_and_login_manager(client)}'}
+    response = client.get('/managers/metrics/', headers=manager)
+    assert response.status_code == 200
+    assert response.content_type == metrics.CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    assert 'bank_http_requests_total{endpoint="/customers/me/balance/",method="GET",status="200"} 3' in text
+    for phase in ('auth', 'db', 'serialize'):
+        assert f'bank_http_phase_duration_seconds_count{{endpoint="/customers/me/balance/",phase="{phase}"}} 3' in text
+    monkeypatch.setitem(bank.app.config, 'METRICS', False)
+    assert client.get('/managers/metrics/', headers=manager).status_code == 404
@@ -0,0 +1,51 @@
+import os
+import shutil
+import sqlite3
+from contextlib import closing
+
+import app as bank_app
+import migrations
+import system_stats
+
+BASELINE = os.path.join(os.path.dirname(bank_app.__file__), 'bank.db')
+
+
+def test_timestamps_are_normalized_and_indexed(tmp_path):
+    shutil.copy(BASELINE, tmp_path / 'baseline.db')
+    with closing(sqlite3.connect(tmp_path / 'baseline.db')) as conn:
+        conn.executemany("INSERT INTO transactions (account_id, transaction_type, amount, timestamp, description) "
+                         "VALUES (1, 'deposit', 5, ?, 'Deposit')",
+                         [('2024-03-01T10:00:00',), ('2024-03-01 10:00:00',), ('2024-03-01T10:00:00.5Z',)])
+        conn.commit()
+        migrations.migrate(conn)
+        timestamps = [row[0] for row in conn.execute("SELECT timestamp FROM transactions ORDER BY transaction_id")]
+        assert timestamps[-3:] == ['2024-03-01 10:00:00.000000'] * 2 + ['2024-03-01 10:00:00.500000']
+        assert all(len(timestamp) == 26 and timestamp[10] == ' ' for timestamp in timestamps)
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM transactions WHERE account_id = 1 "
+                            "AND timestamp >= '2024-01-01' ORDER BY timestamp").fetchall()
+        assert 'idx_transactions_account_timestamp' in str(plan)
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        assert migrations.migrate(conn) == version  # Already up to date
+
+
+def table_info(path):
+    with closing(sqlite3.connect(path)) as conn:
+        return {table: conn.execute(f"PRAGMA table_info({table})").fetchall() for table in ('customers', 'transactions')}
+
+
+def test_migrated_schema_matches_fresh(bank, monkeypatch, tmp_path):
+    bank.init_db()
+    fresh = table_info(bank.DATABASE)
+    shutil.copy(BASELINE, tmp_path / 'baseline.db')
+    with closing(sqlite3.connect(tmp_path / 'baseline.db')) as conn:
+        balances = conn.execute("SELECT account_id, balance FROM customers ORDER BY account_id").fetchall()
+        sequences = conn.execute("SELECT name, seq FROM sqlite_sequence ORDER BY name").fetchall()
+    monkeypatch.setattr(bank, 'DATABASE', str(tmp_path / 'baseline.db'))
+    bank.init_db()
+    assert table_info(bank.DATABASE) == fresh
+    with closing(sqlite3.connect(bank.DATABASE)) as conn:
+        assert conn.execute("SELECT account_id, balance FROM customers ORDER BY account_id").fetchall() == \
+            [(account_id, round(balance * 100)) for account_id, balance in balances]
+        assert conn.execute("SELECT name, seq FROM sqlite_sequence ORDER BY name").fetchall() == sequences
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+        assert system_stats.verify(conn) == {}
@@ -0,0 +1,55 @@
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from conftest import register_and_login_customer
+from money import MAX_CENTS, from_cents, to_cents
+
+
+def test_conversion_is_exact():
+    assert to_cents(0.1) == 10
+    assert to_cents(19.99) == 1999
+    assert to_cents(7) == 700
+    assert from_cents(1999) == 19.99
+    for amount in (0.001, 1.005, '5', True, None, float('nan'), float('inf')):
+        with pytest.raises(ValueError):
+            to_cents(amount)
+
+
+def test_balances_are_stored_as_integer_cents(client, bank):
+    token = register_and_login_customer(client, initial_deposit=0)
+    headers = {'Authorization': f'Bearer {token}'}
+    for _ in range(10):
+        response = client.post('/customers/me/deposit/', json={'amount': 0.1}, headers=headers)
+        assert response.status_code == 200
+    assert response.get_json()['new_balance'] == 1.0
+    response = client.post('/customers/me/deposit/', json={'amount': 0.005}, headers=headers)
+    assert response.status_code == 400
+    with closing(sqlite3.connect(bank.DATABASE)) as conn:
+        assert conn.execute("SELECT balance, typeof(balance) FROM customers").fetchone() == (100, 'integer')
+        assert conn.execute("SELECT SUM(amount) FROM transactions").fetchone()[0] == 100
+
+
+def test_amounts_beyond_the_maximum_are_rejected(client):
+    token = register_and_login_customer(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    for path in ('/customers/me/deposit/', '/customers/me/withdraw/'):
+        response = client.post(path, json={'amount': 1e19}, headers=headers)
+        assert response.status_code == 400
+    response = client.post('/customers/me/deposit/', json={'amount': MAX_CENTS / 100}, headers=headers)
+    assert response.status_code == 200
+    response = client.post('/customers/register/', json={
+        'name': 'Big Spender', 'email': 'big@example.com', 'password': 'secret', 'initial_deposit': 1e19})
+    assert response.status_code == 400
+
+
+def test_transfer_message_prints_the_amount_as_sent(client):
+    token = register_and_login_customer(client)
+    register_and_login_customer(client, email='john@example.com')
+    headers = {'Authorization': f'Bearer {token}'}
+    for amount, text in ((25, '25'), (0.5, '0.5'), (1.25, '1.25')):
+        response = client.post('/customers/me/transfer/', json={'recipient_account_id': 2, 'amount': amount},
+                               headers=headers)
+        assert response.status_code == 200, response.get_json()
+        assert response.get_json()['message'] == f'Transfer of {text} successful to account 2'
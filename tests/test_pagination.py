@@ -0,0 +1,48 @@
+import pytest
+
+from conftest import register_and_login_customer
+
+
+def test_pages_cover_every_transaction_newest_first(client):
+    token = register_and_login_customer(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    for amount in range(1, 5):
+        assert client.post('/customers/me/deposit/', json={'amount': amount}, headers=headers).status_code == 200
+    seen, cursor = [], None
+    while True:
+        response = client.get('/customers/me/transactions/', query_string={'limit': 2, 'cursor': cursor or ''},
+                              headers=headers)
+        assert response.status_code == 200
+        body = response.get_json()
+        assert len(body['transactions']) <= 2
+        seen.extend(body['transactions'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert [row['amount'] for row in seen] == [4, 3, 2, 1, 100]
+    keys = [(row['timestamp'], row['transaction_id']) for row in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=1001', 'limit=ten', 'cursor=not-a-cursor'])
+def test_invalid_page_arguments(client, query):
+    token = register_and_login_customer(client)
+    response = client.get(f'/customers/me/transactions/?{query}', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('values', [('2024-01-01', 2 ** 70), ('2024-01-01', -2 ** 63 - 1), ('\ud800', 1),
+                                    ('2024-01-01', '1'), ['2024-01-01']])
+def test_unbindable_cursor_is_rejected(client, bank, values):
+    token = register_and_login_customer(client)
+    cursor = bank.encode_cursor(*values)
+    response = client.get(f'/customers/me/transactions/?cursor={cursor}', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
+
+
+def test_cursor_round_trips(client, bank):
+    token = register_and_login_customer(client)
+    cursor = bank.encode_cursor('9999-01-01 00:00:00.000000', 2 ** 63 - 1)
+    response = client.get(f'/customers/me/transactions/?cursor={cursor}', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
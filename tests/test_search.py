@@ -0,0 +1,92 @@
+import random
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+import search_index
+import storage
+from conftest import register_and_login_customer
+DESCRIPTIONS = ['Deposit', 'Initial deposit', 'Withdrawal', 'Transfer to account 12', 'Transfer from account 7',
+                'Rent 100% paid', 'Gift_card top-up', 'Send e-mail now', 'card. done', 'Café latte', 'ÉCOLE', None]
+QUERIES = ['deposit', 'DEP', 'transfer acc', 'count', 'account 12', '100%', '%', '_', 'gift_card', 'top', 'to',
+           'posit', 'rent paid', 'nothing', 'e-mail', 'card.', 'gift_c', 'top-u', '12.', 'e-', 'cafe', 'ecole', '-']
+
+
+def search(client, token, description, **args):
+    response = client.get('/customers/me/transactions/search/', query_string=dict(args, description=description),
+                          headers={'Authorization': f'Bearer {token}'})
+    return response.status_code, response.get_json()
+
+
+def test_search_matches_word_prefixes_in_own_transactions(client):
+    register_and_login_customer(client, email='bob@example.com')
+    token = register_and_login_customer(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.post('/customers/me/deposit/', json={'amount': 50}, headers=headers).status_code == 200
+    response = client.post('/customers/me/transfer/', json={'recipient_account_id': 1, 'amount': 10}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    status, body = search(client, token, 'DEP')
+    assert status == 200
+    assert [row['description'] for row in body['transactions']] == ['Deposit', 'Initial deposit']
+    status, body = search(client, token, 'transfer acc')
+    assert [row['description'] for row in body['transactions']] == ['Transfer to account 1']
+    assert search(client, token, 'posit')[1]['transactions'] == []  # Prefixes of words, not substrings
+
+
+def test_search_input_is_not_query_syntax(client):
+    token = register_and_login_customer(client)
+    for description in ('"', 'deposit OR', 'NEAR(a b)', '*', 'description:x', "') --"):
+        status, body = search(client, token, description)
+        assert status == 200, body
+    assert search(client, token, '  ')[0] == 400
+
+
+def test_search_by_relevance(client):
+    token = register_and_login_customer(client)
+    status, body = search(client, token, 'initial', order='relevance')
+    assert status == 200
+    assert [row['description'] for row in body['transactions']] == ['Initial deposit']
+    assert body['next_cursor'] is None
+    assert search(client, token, 'initial', order='oldest')[0] == 400
+
+
+@pytest.fixture
+def engines(bank):
+    bank.init_db()
+    rows = [(1, 'deposit', 100, f'2024-01-01 00:00:{index:02d}.000000', description)
+            for index, description in enumerate(DESCRIPTIONS)]
+    with closing(sqlite3.connect(bank.DATABASE)) as conn:
+        conn.row_factory = sqlite3.Row
+        conn.execute("INSERT INTO customers (name, email, password, balance) VALUES ('Jane', 'j@example.com', 'x', 0)")
+        fts = storage.SQLiteStorage(conn, transaction_fts=True)
+        fts.add_transactions(rows)
+        conn.commit()
+        memory = storage.MemoryStorage()
+        memory.add_customer('Jane', 'j@example.com', 'x', 0)
+        memory.add_transactions(rows)
+        yield {'fts': fts, 'like': storage.SQLiteStorage(conn, transaction_fts=False), 'memory': memory}
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_engines_agree_on_description_search(engines, query):
+    results = {name: [row['description'] for row in engine.transactions(account_id=1, matching=query)]
+               for name, engine in engines.items()}
+    assert results['like'] == results['fts'], results
+    assert results['memory'] == results['fts'], results
+
+
+def test_matches_agrees_with_fts5_on_random_text():
+    rng = random.Random(1)
+    alphabet = 'abcE -_.,%\'"!/12éÉüñçß—あ́'
+    texts = [''.join(rng.choice(alphabet) for _ in range(rng.randrange(12))) for _ in range(1000)]
+    with closing(sqlite3.connect(':memory:')) as conn:
+        conn.execute("CREATE VIRTUAL TABLE docs USING fts5(description, tokenize='unicode61')")
+        conn.executemany("INSERT INTO docs (rowid, description) VALUES (?, ?)", enumerate(texts))
+        for _ in range(500):
+            query = ''.join(rng.choice(alphabet) for _ in range(rng.randrange(1, 5)))
+            if not query.split():
+                continue
+            expected = {rowid for rowid, in conn.execute(
+                "SELECT rowid FROM docs WHERE docs MATCH ?", (f'description : ({search_index.quote_terms(query)})',))}
+            assert {rowid for rowid, text in enumerate(texts) if search_index.matches(text, query)} == expected, query
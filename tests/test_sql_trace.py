@@ -0,0 +1,44 @@
+import logging
+import re
+
+from conftest import register_and_login_customer
+
+
+def test_trace_reports_statements_and_slow_queries(bank, client, monkeypatch, caplog):
+    monkeypatch.setitem(bank.app.config, 'SQL_TRACE', True)
+    monkeypatch.setitem(bank.app.config, 'SQL_SLOW_MS', 0.0)
+    monkeypatch.setattr(bank.app, 'debug', True)
+    token = register_and_login_customer(client)
+    with caplog.at_level(logging.WARNING, logger=bank.app.logger.name):
+        response = client.get('/customers/me/balance/', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    match = re.fullmatch(r'sql;dur=\d+\.\d{3};desc="(\d+) statements"', response.headers['Server-Timing'])
+    assert int(match.group(1)) >= 1
+    logged = [record.getMessage() for record in caplog.records]
+    assert any(message.startswith('Slow SQL on GET /customers/me/balance/') and 'plan: ' in message
+               for message in logged)
+
+
+def test_no_timing_header_without_the_trace(bank, client, monkeypatch):
+    monkeypatch.setattr(bank.app, 'debug', True)
+    token = register_and_login_customer(client)
+    response = client.get('/customers/me/balance/', headers={'Authorization': f'Bearer {token}'})
+    assert 'Server-Timing' not in response.headers
+
+
+def test_server_timing_includes_commit(bank, client, monkeypatch, caplog):
+    monkeypatch.setitem(bank.app.config, 'SQL_TRACE', True)
+    monkeypatch.setitem(bank.app.config, 'SQL_SLOW_MS', 0.0)  # Log every statement, with its plan
+    monkeypatch.setattr(bank.app, 'debug', True)
+    token = register_and_login_customer(client)
+    with caplog.at_level(logging.WARNING, logger=bank.app.logger.name):
+        response = client.post('/customers/me/deposit/', json={'amount': 25},
+                               headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    timing = response.headers['Server-Timing']
+    duration = float(timing.split('dur=')[1].split(';')[0])
+    assert duration > 0
+    logged = [record.getMessage() for record in caplog.records if record.getMessage().startswith('Slow SQL')]
+    assert any(': COMMIT ' in message for message in logged)
+    assert not any('no plan' in message or ': --' in message for message in logged)
+    assert any('SEARCH customers' in message for message in logged)
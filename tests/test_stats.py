@@ -0,0 +1,28 @@
+import sqlite3
+from contextlib import closing
+
+import system_stats
+from conftest import register_and_login_customer, register_and_login_manager
+
+
+def test_stats_follow_every_write(client):
+    token = register_and_login_customer(client)
+    register_and_login_customer(client, email='john@example.com', initial_deposit=0)
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.post('/customers/me/deposit/', json={'amount': 25.5}, headers=headers).status_code == 200
+    assert client.post('/customers/me/withdraw/', json={'amount': 10}, headers=headers).status_code == 200
+    response = client.post('/customers/me/transfer/', json={'recipient_account_id': 2, 'amount': 5}, headers=headers)
+    assert response.status_code == 200
+    manager = register_and_login_manager(client)
+    stats = client.get('/managers/stats/', headers={'Authorization': f'Bearer {manager}'}).get_json()
+    assert (stats['total_customers'], stats['total_transactions'], stats['total_balance']) == (2, 5, 115.5)
+
+
+def test_verify_reports_drift_and_rebuild_repairs_it(client, bank):
+    register_and_login_customer(client)
+    with closing(sqlite3.connect(bank.DATABASE)) as conn:
+        assert system_stats.verify(conn) == {}
+        conn.execute("UPDATE system_stats SET total_customers = 7")
+        assert system_stats.verify(conn) == {'total_customers': (7, 1)}
+        system_stats.rebuild(conn)
+        assert system_stats.verify(conn) == {}
@@ -0,0 +1,37 @@
+from conftest import register_and_login_customer
+from token_cache import TokenCache
+
+
+def test_least_recently_used_token_is_evicted():
+    cache = TokenCache(maxsize=2, ttl=60)
+    cache.put('a', 'customer', 1)
+    cache.put('b', 'customer', 2)
+    assert cache.get('a', 'customer') == 1
+    cache.put('c', 'customer', 3)
+    assert cache.get('b', 'customer') is None
+    assert cache.get('a', 'customer') == 1
+    assert cache.stats() == {'size': 2, 'hits': 2, 'misses': 1, 'evictions': 1}
+
+
+def test_entries_expire_and_are_scoped_to_a_role():
+    cache = TokenCache(ttl=0)
+    cache.put('a', 'customer', 1)
+    assert cache.get('a', 'customer') is None
+    cache.ttl = 60
+    cache.put('a', 'customer', 1)
+    assert cache.get('a', 'manager') is None
+    cache.put('b', 'customer', 1)
+    cache.invalidate_principal('customer', 1)
+    assert cache.stats()['size'] == 0
+
+
+def test_logout_and_login_revoke_cached_tokens(client):
+    first = register_and_login_customer(client)
+    assert client.get('/customers/me/balance/', headers={'Authorization': f'Bearer {first}'}).status_code == 200
+    second = client.post('/customers/login/', json={'email': 'jane@example.com', 'password': 'secret'})
+    second = second.get_json()['access_token']
+    assert client.get('/customers/me/balance/', headers={'Authorization': f'Bearer {first}'}).status_code == 401
+    headers = {'Authorization': f'Bearer {second}'}
+    assert client.get('/customers/me/balance/', headers=headers).status_code == 200
+    assert client.post('/customers/logout/', headers=headers).status_code == 200
+    assert client.get('/customers/me/balance/', headers=headers).status_code == 401
@@ -0,0 +1,58 @@
+import pytest
+
+from conftest import register_and_login_customer
+
+
+@pytest.fixture
+def sender(client):
+    token = register_and_login_customer(client)
+    register_and_login_customer(client, email='john@example.com', initial_deposit=0)
+    register_and_login_customer(client, email='jim@example.com', initial_deposit=0)
+    return {'Authorization': f'Bearer {token}'}
+
+
+def balance(client, sender):
+    response = client.get('/customers/me/balance/', headers=sender)
+    return response.get_json()['balance']
+
+
+def test_batch_transfer_applies_every_item(client, sender):
+    transfers = [{'recipient_account_id': 2, 'amount': 10}, {'recipient_account_id': 3, 'amount': 0.5},
+                 {'recipient_account_id': 2, 'amount': 20}]
+    response = client.post('/customers/me/transfers/batch/', json={'transfers': transfers}, headers=sender)
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body['new_balance'] == 69.5
+    assert [(result['index'], result['status']) for result in body['results']] == \
+        [(0, 'completed'), (1, 'completed'), (2, 'completed')]
+    response = client.get('/customers/me/transactions/', headers=sender)
+    assert sorted(row['amount'] for row in response.get_json()['transactions']) == [0.5, 10, 20, 100]
+
+
+@pytest.mark.parametrize('transfers, status, rejected', [
+    ([{'recipient_account_id': 2, 'amount': 10}, {'recipient_account_id': 9, 'amount': 10}], 404, [1]),
+    ([{'recipient_account_id': 1, 'amount': 10}, {'recipient_account_id': 2, 'amount': -1}], 400, [0, 1]),
+    ([{'recipient_account_id': 2, 'amount': 60}, {'recipient_account_id': 3, 'amount': 60}], 400, []),
+])
+def test_batch_transfer_applies_nothing_on_failure(client, sender, transfers, status, rejected):
+    response = client.post('/customers/me/transfers/batch/', json={'transfers': transfers}, headers=sender)
+    assert response.status_code == status
+    results = response.get_json().get('results', [])
+    assert [result['index'] for result in results if result['status'] == 'rejected'] == rejected
+    assert balance(client, sender) == 100
+
+
+@pytest.mark.parametrize('body', [{}, {'transfers': []}, {'transfers': {'recipient_account_id': 2}},
+                                  {'transfers': [{'recipient_account_id': 2, 'amount': 1}] * 1001}])
+def test_batch_transfer_needs_a_list_of_transfers(client, sender, body):
+    assert client.post('/customers/me/transfers/batch/', json=body, headers=sender).status_code == 400
+
+
+@pytest.mark.parametrize('recipient', [[2], '2', '1', True, 2.0, None, {'id': 2}])
+def test_recipient_must_be_an_integer(client, recipient):
+    token = register_and_login_customer(client)
+    register_and_login_customer(client, email='john@example.com')
+    response = client.post('/customers/me/transfer/', json={'recipient_account_id': recipient, 'amount': 10},
+                           headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Recipient account ID and a valid amount are required'}
@@ -0,0 +1,88 @@
+import glob
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'v1'))
+
+from store import CorruptJournal, MemoryStore  # noqa: E402
+
+
+def state(store):
+    return ({id: customer['balance'] for id, customer in store.customers.items()},
+            [(t['transaction_id'], t['account_id'], t['amount']) for t in store.all_transactions()])
+
+
+def test_restart_recovers_from_snapshot_and_journal(tmp_path):
+    store = MemoryStore(data_dir=str(tmp_path), snapshot_interval=0)
+    store.add_manager('ada', 'secret')
+    store.add_customer('Jane', 'jane@example.com', 'secret', 100)
+    store.add_customer('John', 'john@example.com', 'secret', 0)
+    store.transfer(1, 2, 30)
+    store.snapshot()
+    store.deposit(2, 5)
+    store.withdraw(1, 10)
+    before = state(store)
+    store._journal.close()  # Crash: no final snapshot
+    assert [os.path.basename(path) for path in glob.glob(str(tmp_path / 'journal.*.jsonl'))] == ['journal.1.jsonl']
+    store = MemoryStore(data_dir=str(tmp_path), snapshot_interval=0)
+    assert state(store) == before
+    assert store.authenticate_manager('ada', 'secret') == {'username': 'ada'}
+    assert store.add_customer('Jim', 'jim@example.com', 'secret', 0) == 3
+    store.close()
+    assert state(MemoryStore(data_dir=str(tmp_path), snapshot_interval=0))[0] == {1: 60, 2: 35, 3: 0}
+
+
+def test_concurrent_transfers_keep_the_books_balanced():
+    store = MemoryStore()
+    # Enough for every outgoing transfer to land before any incoming one
+    store.add_customer('Jane', 'jane@example.com', 'secret', 2000)
+    store.add_customer('John', 'john@example.com', 'secret', 2000)
+
+    def transfers(sender, recipient):
+        for _ in range(500):
+            store.transfer(sender, recipient, 1)
+
+    threads = [threading.Thread(target=transfers, args=pair) for pair in ((1, 2), (2, 1)) * 4]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    assert not any(thread.is_alive() for thread in threads)
+    assert store.get_customer(1)['balance'] == store.get_customer(2)['balance'] == 2000
+    ids = [t['transaction_id'] for t in store.all_transactions()]
+    assert ids == list(range(1, 8003))
+
+
+def crashed_store(data_dir):
+    # Two journaled customers and no snapshot, as if the process died right after
+    store = MemoryStore(data_dir=str(data_dir), snapshot_interval=0)
+    store.add_customer('Jane', 'jane@example.com', 'secret', 100)
+    store.add_customer('John', 'john@example.com', 'secret', 200)
+    store._journal.close()
+    return glob.glob(os.path.join(str(data_dir), 'journal.*.jsonl'))[0]
+
+
+def test_torn_final_line_is_dropped(tmp_path):
+    path = crashed_store(tmp_path)
+    with open(path, 'ab') as journal:
+        journal.write(b'{"op":"customer","account_id":3,"na')
+    size = os.path.getsize(path)
+    store = MemoryStore(data_dir=str(tmp_path), snapshot_interval=0)
+    assert sorted(store.customers) == [1, 2]
+    assert os.path.getsize(path) < size
+    with open(path, 'rb') as journal:
+        assert journal.read().endswith(b'\n')
+
+
+def test_damaged_line_before_the_end_is_an_error(tmp_path):
+    path = crashed_store(tmp_path)
+    with open(path, 'rb') as journal:
+        _, second = journal.readlines()
+    with open(path, 'wb') as journal:
+        journal.write(b'{"op":"cust\n' + second)
+    with pytest.raises(CorruptJournal):
+        MemoryStore(data_dir=str(tmp_path), snapshot_interval=0)
+    assert os.path.getsize(path) == len(b'{"op":"cust\n' + second)  # Left as it was, for inspection
@@ -0,0 +1,42 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'v1'))
+
+from ledger import Ledger  # noqa: E402
+
+ROWS = [(1, 1, 'deposit', 100, '2024-01-01T09:00:00', 'Initial deposit'),
+        (2, 1, 'transfer_out', 12.5, '2024-01-02T09:30:00.250000', 'Transfer to account 2'),
+        (3, 2, 'transfer_in', 12.5, '2024-01-02T09:30:00.250000', 'Transfer from account 1'),
+        (4, 1, 'withdrawal', 7, '2024-01-03T00:00:00', 'Transfer to account 02'),
+        (5, 1, 'deposit', 1.0, '2024-01-04T00:00:00', 'Initial deposit')]
+
+
+def as_dict(row):
+    return dict(zip(('transaction_id', 'account_id', 'transaction_type', 'amount', 'timestamp', 'description'), row))
+
+
+def test_rows_round_trip():
+    ledger = Ledger()
+    for row in ROWS:
+        ledger.append(*row)
+    assert len(ledger) == 5
+    assert ledger.all() == [as_dict(row) for row in ROWS]
+    assert [type(row['amount']) for row in ledger.all()] == [int, float, float, int, float]
+    assert [row['transaction_id'] for row in ledger.for_account(1)] == [1, 2, 4, 5]
+    assert ledger.for_account(3) == []
+    assert ledger._interned == ['Initial deposit', 'Transfer to account 02']  # Templated text is not interned
+
+
+def test_dump_and_load_after_sorting():
+    ledger = Ledger()
+    for row in reversed(ROWS):
+        ledger.append(*row)
+    assert not ledger.is_sorted()
+    ledger.sort()
+    assert ledger.is_sorted()
+    assert [row['transaction_id'] for row in ledger.for_account(1)] == [1, 2, 4, 5]
+    copy = Ledger()
+    copy.load(ledger.dump())
+    assert copy.all() == [as_dict(row) for row in ROWS]
+    assert [row['transaction_id'] for row in copy.for_account(2)] == [3]
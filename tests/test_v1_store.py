@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'v1'))
+
+from store import InsufficientFunds, MemoryStore, NotFound  # noqa: E402
+
+
+@pytest.fixture
+def store():
+    store = MemoryStore()
+    assert store.add_customer('Jane Doe', 'Jane@example.com', 'secret', 100) == 1
+    assert store.add_customer('John Smith', 'john@example.com', 'secret', 50) == 2
+    return store
+
+
+def test_lookups_go_through_the_indexes(store):
+    assert store.add_customer('Impostor', 'Jane@example.com', 'x', 0) is None
+    assert store.authenticate_customer('Jane@example.com', 'secret') == 1
+    assert store.authenticate_customer('Jane@example.com', 'wrong') is None
+    assert store.customer_for_token('dummy_customer_token_2') == 2
+    assert store.add_manager('ada', 'secret')
+    assert not store.add_manager('ada', 'other')
+    assert store.manager_for_token('dummy_manager_token_ada')['username'] == 'ada'
+    assert [c['account_id'] for c in store.search_customers(email='jane@EXAMPLE.com')] == [1]
+    assert [c['account_id'] for c in store.search_customers(name='o', account_id=1)] == [1, 2]
+
+
+def test_money_movement(store):
+    assert store.deposit(1, 25) == 125
+    assert store.withdraw(1, 5) == 120
+    assert store.transfer(1, 2, 20) == 100
+    with pytest.raises(InsufficientFunds):
+        store.withdraw(2, 71)
+    with pytest.raises(NotFound):
+        store.transfer(1, 3, 1)
+    assert store.get_customer(2)['balance'] == 70
+    assert [(t['transaction_type'], t['amount'], t['description']) for t in store.transactions_for(1)] == [
+        ('deposit', 100, 'Initial deposit'), ('deposit', 25, 'Deposit'), ('withdrawal', 5, 'Withdrawal'),
+        ('transfer_out', 20, 'Transfer to account 2')]
+    assert [t['transaction_id'] for t in store.all_transactions()] == list(range(1, 7))
+    assert store.stats() == {'total_customers': 2, 'total_transactions': 6, 'total_balance': 170}
@@ -0,0 +1,71 @@
+import sqlite3
+import threading
+
+import pytest
+
+from conftest import register_and_login_customer
+from write_queue import Abort, WriteQueue
+
+
+@pytest.fixture
+def writer(tmp_path):
+    path = str(tmp_path / 'queue.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE items (name TEXT UNIQUE)")
+    writer = WriteQueue(lambda: sqlite3.connect(path, check_same_thread=False), max_wait=0.2)
+    yield writer, path
+    writer.stop(timeout=5)
+
+
+def insert(conn, name):
+    conn.execute("INSERT INTO items VALUES (?)", (name,))
+    return name
+
+
+def insert_then_abort(conn, name):
+    insert(conn, name)
+    raise Abort('aborted')
+
+
+def test_failed_operations_only_roll_back_themselves(writer):
+    writer, path = writer
+    futures = [writer.submit(insert, 'a'), writer.submit(insert, 'a'), writer.submit(insert_then_abort, 'b'),
+               writer.submit(insert, 'c')]
+    assert futures[0].result(timeout=5) == 'a'
+    with pytest.raises(sqlite3.IntegrityError):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5) == 'aborted'
+    assert futures[3].result(timeout=5) == 'c'
+    assert writer.stats() == {'queued': 0, 'batches': 1, 'operations': 4}  # One commit for the whole batch
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT name FROM items ORDER BY name").fetchall() == [('a',), ('c',)]
+
+
+def test_writes_through_the_queue(client, bank, monkeypatch):
+    token = register_and_login_customer(client)
+    monkeypatch.setitem(bank.app.config, 'WRITE_QUEUE', True)
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.post('/customers/me/withdraw/', json={'amount': 30}, headers=headers).status_code == 200
+    assert client.post('/customers/me/withdraw/', json={'amount': 80}, headers=headers).status_code == 400
+    assert client.get('/customers/me/balance/', headers=headers).get_json() == {'balance': 70.0}
+    assert bank._write_queue.stats()['operations'] == 2
+
+
+def test_registration_as_first_request_with_the_write_queue(client, bank, monkeypatch):
+    # get_write_queue() used to take _pool_lock and then call get_pool(), which takes it again
+    monkeypatch.setitem(bank.app.config, 'WRITE_QUEUE', True)
+    result = {}
+
+    def first_requests():
+        token = register_and_login_customer(client)
+        headers = {'Authorization': f'Bearer {token}'}
+        result['deposit'] = client.post('/customers/me/deposit/', json={'amount': 25}, headers=headers)
+        result['balance'] = client.get('/customers/me/balance/', headers=headers)
+
+    thread = threading.Thread(target=first_requests, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), 'request hung'
+    assert result['deposit'].status_code == 200
+    assert result['balance'].get_json() == {'balance': 125.0}
+    assert bank._write_queue is not None
@@ -0,0 +1,76 @@
+"""
+In-process cache of validated auth tokens for token_required.
+
+Maps token -> (role, principal id) with a bounded LRU and a TTL, so a token
+revoked by another worker process stops being honoured here after at most
+`ttl` seconds. Logout and re-login invalidate entries explicitly.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenCache:
+    def __init__(self, maxsize=10000, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # token -> (role, principal_id, expires_at)
+        self._by_principal = {}  # (role, principal_id) -> set of tokens
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token, role):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] != role:
+                self.misses += 1
+                return None
+            if entry[2] <= now:
+                self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token, role, principal_id):
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (role, principal_id, time.monotonic() + self.ttl)
+            self._by_principal.setdefault((role, principal_id), set()).add(token)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, token):
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+
+    def invalidate_principal(self, role, principal_id):
+        with self._lock:
+            for token in list(self._by_principal.get((role, principal_id), ())):
+                self._remove(token)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_principal.clear()
+
+    def _remove(self, token):
+        role, principal_id, _ = self._entries.pop(token)
+        tokens = self._by_principal.get((role, principal_id))
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_principal[(role, principal_id)]
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions}
@@ -0,0 +1,482 @@
+"""
+In-memory storage engine behind the v1 prototype API.
+
+Every lookup the endpoints need is a hash probe: customers by id, email and
+token, managers by username and token. Transactions live in a columnar
+ledger (see ledger.py) indexed by account, so history, filter and search
+only touch the caller's rows.
+
+The store is safe to use from a threaded server. Balance changes hold the
+affected accounts' locks (a transfer takes both, in account id order, so two
+opposite transfers cannot deadlock), and ids are allocated under one small
+lock, so they are unique and the global ledger stays in id order.
+
+With a data_dir, every change is appended to a journal before the call
+returns, and a background thread periodically writes a snapshot and starts
+a new journal generation. A restart loads the latest snapshot and replays
+the journals written since, instead of losing everything.
+
+storage.MemoryStorage runs app.py's routes on this store too, through the
+primitives near the end of MemoryStore.
+"""
+
+import glob
+import json
+import os
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+try:
+    from .ledger import Ledger  # Imported as v1.store, by storage.MemoryStorage
+except ImportError:
+    from ledger import Ledger  # Run from v1/, as main.py is
+
+
+class NotFound(Exception):
+    pass
+
+
+class InsufficientFunds(Exception):
+    pass
+
+
+class CorruptJournal(Exception):
+    pass
+
+
+class _Gate:
+    # Shared/exclusive lock: changes pass through shared, snapshots take it exclusively
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._active = 0
+        self._exclusive = False
+
+    def acquire_shared(self):
+        with self._cond:
+            while self._exclusive:
+                self._cond.wait()
+            self._active += 1
+
+    def release_shared(self):
+        with self._cond:
+            self._active -= 1
+            if not self._active:
+                self._cond.notify_all()
+
+    def acquire_exclusive(self):
+        with self._cond:
+            while self._exclusive:
+                self._cond.wait()
+            self._exclusive = True  # Stops new changes from entering
+            while self._active:
+                self._cond.wait()
+
+    def release_exclusive(self):
+        with self._cond:
+            self._exclusive = False
+            self._cond.notify_all()
+
+    def __enter__(self):
+        self.acquire_shared()
+
+    def __exit__(self, *exc):
+        self.release_shared()
+
+
+class MemoryStore:
+    def __init__(self, data_dir=None, snapshot_interval=300.0, fsync=False):
+        self.managers = {}  # username -> {'id', 'password'}
+        self.customers = {}  # account_id -> {'name', 'email', 'password', 'balance'}
+        self.ledger = Ledger()  # Every transaction, in transaction id order
+        self.next_customer_id = 1
+        self.next_transaction_id = 1
+        self._manager_tokens = {}  # token -> username
+        self._customer_tokens = {}  # token -> account_id
+        self._by_email = {}  # email -> account_id
+        self._by_email_lower = {}  # email.lower() -> [account_id, ...], for case-insensitive search
+        self._account_locks = {}  # account_id -> Lock guarding its balance
+        self._registry_lock = threading.Lock()  # New managers and customers
+        self._id_lock = threading.Lock()  # Transaction ids and the global ledger
+        self._gate = _Gate()
+        self._local = threading.local()  # The thread's batch(), if any
+
+        self.data_dir = data_dir
+        self.snapshot_interval = snapshot_interval
+        self.fsync = fsync
+        self.generation = 0
+        self._journal = None
+        self._journal_lock = threading.Lock()
+        self._stop = threading.Event()
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+            self._recover()
+            self._journal = open(self._journal_path(self.generation), 'a', encoding='utf-8')
+            if snapshot_interval:
+                threading.Thread(target=self._snapshot_loop, name='v1-snapshot', daemon=True).start()
+
+    # --- Managers ---
+
+    def add_manager(self, username, password):
+        # False if the username is taken
+        with self._changing(), self._registry_lock:
+            if username in self.managers:
+                return False
+            self._apply_manager(username, password)
+            self._log({'op': 'manager', 'username': username, 'password': password})
+        return True
+
+    def _apply_manager(self, username, password):
+        self.managers[username] = {'id': len(self.managers) + 1, 'password': password}  # Ids follow journal order
+        self._manager_tokens[f'dummy_manager_token_{username}'] = username
+
+    def authenticate_manager(self, username, password):
+        manager = self.managers.get(username)
+        if manager and manager['password'] == password:
+            return {'username': username}
+        return None
+
+    def manager_for_token(self, token):
+        username = self._manager_tokens.get(token)
+        return {'username': username} if username is not None else None
+
+    # --- Customers ---
+
+    def add_customer(self, name, email, password, initial_deposit):
+        # New account id, or None if the email is already registered
+        with self._changing(), self._registry_lock:
+            if email in self._by_email:
+                return None
+            account_id = self.next_customer_id
+            self._apply_customer(account_id, name, email, password, initial_deposit)
+            row = self._record(account_id, 'deposit', initial_deposit, 'Initial deposit')
+            self._log({'op': 'customer', 'account_id': account_id, 'name': name, 'email': email,
+                       'password': password, 'balance': initial_deposit, 'rows': [row]})
+        return account_id
+
+    def _apply_customer(self, account_id, name, email, password, balance):
+        # The lock exists before the account becomes visible to other threads
+        self._account_locks[account_id] = threading.Lock()
+        self.customers[account_id] = {'name': name, 'email': email, 'password': password, 'balance': balance}
+        self._by_email[email] = account_id
+        self._by_email_lower.setdefault(email.lower(), []).append(account_id)
+        self._customer_tokens[f'dummy_customer_token_{account_id}'] = account_id
+        self.next_customer_id = max(self.next_customer_id, account_id + 1)
+
+    def authenticate_customer(self, email, password):
+        account_id = self._by_email.get(email)
+        if account_id is not None and self.customers[account_id]['password'] == password:
+            return account_id
+        return None
+
+    def customer_for_token(self, token):
+        return self._customer_tokens.get(token)
+
+    def get_customer(self, account_id):
+        return self.customers.get(account_id)
+
+    def list_customers(self):
+        return [self.customer_summary(id) for id in list(self.customers)]
+
+    def search_customers(self, name=None, email=None, account_id=None):
+        # A customer matches on a name substring, the exact email (ignoring
+        # case) or the account id; results are in account id order
+        if name:
+            name = name.lower()
+            matches = [id for id, customer in list(self.customers.items())
+                       if name in customer['name'].lower()
+                       or (email and email.lower() == customer['email'].lower())
+                       or (account_id and id == account_id)]
+        else:
+            matches = set(self._by_email_lower.get(email.lower(), ())) if email else set()
+            if account_id and account_id in self.customers:
+                matches.add(account_id)
+            matches = sorted(matches)
+        return [self.customer_summary(id) for id in matches]
+
+    def customer_summary(self, account_id):
+        customer = self.customers[account_id]
+        return {'account_id': account_id, 'name': customer['name'], 'email': customer['email']}
+
+    def stats(self):
+        return {'total_customers': len(self.customers),
+                'total_transactions': len(self.ledger),
+                'total_balance': sum(customer['balance'] for customer in list(self.customers.values()))}
+
+    # --- Money movement ---
+
+    def _record(self, account_id, transaction_type, amount, description):
+        # Caller holds the account's lock (or the registry lock for a new account)
+        with self._id_lock:
+            row = [self.next_transaction_id, account_id, transaction_type, amount,
+                   datetime.now().isoformat(), description]
+            self.next_transaction_id += 1
+            self.ledger.append(*row)
+        return row
+
+    def _locked(self, *account_ids):
+        # The accounts' locks, in id order; unknown accounts are skipped
+        return [self._account_locks[id] for id in sorted(set(account_ids)) if id in self._account_locks]
+
+    def _customer(self, account_id, message='Customer not found'):
+        customer = self.customers.get(account_id)
+        if customer is None:
+            raise NotFound(message)
+        return customer
+
+    def _change(self, account_ids, change):
+        # Runs change() with the accounts locked and journals its rows and the resulting balances
+        locks = self._locked(*account_ids)
+        with self._changing():
+            for lock in locks:
+                lock.acquire()
+            try:
+                result, rows = change()
+                self._log({'op': 'change', 'rows': rows,
+                           'balances': {id: self.customers[id]['balance'] for id in account_ids}})
+                return result
+            finally:
+                for lock in reversed(locks):
+                    lock.release()
+
+    def deposit(self, account_id, amount):
+        customer = self._customer(account_id)
+
+        def change():
+            customer['balance'] += amount
+            return customer['balance'], [self._record(account_id, 'deposit', amount, 'Deposit')]
+        return self._change([account_id], change)
+
+    def withdraw(self, account_id, amount):
+        customer = self._customer(account_id)
+
+        def change():
+            if customer['balance'] < amount:
+                raise InsufficientFunds()
+            customer['balance'] -= amount
+            return customer['balance'], [self._record(account_id, 'withdrawal', amount, 'Withdrawal')]
+        return self._change([account_id], change)
+
+    def transfer(self, sender_id, recipient_id, amount):
+        sender = self._customer(sender_id, 'Sender account not found')
+        recipient = self._customer(recipient_id, 'Recipient account not found')
+
+        def change():
+            if sender['balance'] < amount:
+                raise InsufficientFunds()
+            sender['balance'] -= amount
+            recipient['balance'] += amount
+            return sender['balance'], [
+                self._record(sender_id, 'transfer_out', amount, f'Transfer to account {recipient_id}'),
+                self._record(recipient_id, 'transfer_in', amount, f'Transfer from account {sender_id}')]
+        return self._change([sender_id, recipient_id], change)
+
+    # --- Storage engine primitives ---
+    # For storage.MemoryStorage, which serves app.py's routes from this store. Unlike the
+    # methods above they record no ledger rows of their own, and the undo_* ones reverse
+    # changes made in the same batch(), whose entries the caller then clears.
+
+    def _changing(self):
+        # The gate, unless this thread's batch() already holds it
+        return nullcontext() if getattr(self._local, 'batch', None) is not None else self._gate
+
+    @contextmanager
+    def batch(self):
+        # Changes made on this thread are journaled together when the block ends without an
+        # exception, and not at all after one. Yields the held-back entries; clearing them
+        # journals nothing. Snapshots wait until the block ends.
+        entries = []
+        with self._gate:
+            self._local.batch = entries
+            try:
+                yield entries
+            finally:
+                self._local.batch = None
+            self._write_journal(entries)
+
+    def open_account(self, name, email, password, balance):
+        # New account id, or None if the email is already registered
+        with self._changing(), self._registry_lock:
+            if email in self._by_email:
+                return None
+            account_id = self.next_customer_id
+            self._apply_customer(account_id, name, email, password, balance)
+            self._log({'op': 'customer', 'account_id': account_id, 'name': name, 'email': email,
+                       'password': password, 'balance': balance, 'rows': []})
+        return account_id
+
+    def undo_open_account(self, account_id):
+        # Only for the newest account, whose id is then handed out again
+        with self._registry_lock:
+            customer = self.customers.pop(account_id)
+            del self._by_email[customer['email']]
+            same_email = self._by_email_lower[customer['email'].lower()]
+            same_email.remove(account_id)
+            if not same_email:
+                del self._by_email_lower[customer['email'].lower()]
+            del self._customer_tokens[f'dummy_customer_token_{account_id}']
+            del self._account_locks[account_id]
+            self.next_customer_id = account_id
+
+    def adjust_balance(self, account_id, amount, floor=None):
+        # New balance after adding amount (negative to take some), or None if the account
+        # is unknown or the balance would end up below floor
+        locks = self._locked(account_id)
+        if not locks:
+            return None
+        with self._changing(), locks[0]:
+            customer = self.customers[account_id]
+            if floor is not None and customer['balance'] + amount < floor:
+                return None
+            customer['balance'] += amount
+            self._log({'op': 'change', 'rows': [], 'balances': {account_id: customer['balance']}})
+            return customer['balance']
+
+    def append_rows(self, rows):
+        # rows: (account_id, transaction_type, amount, timestamp, description); returns their
+        # positions in the ledger
+        with self._changing(), self._id_lock:
+            first = len(self.ledger)
+            recorded = []
+            for account_id, transaction_type, amount, timestamp, description in rows:
+                row = [self.next_transaction_id, account_id, transaction_type, amount, timestamp, description]
+                self.next_transaction_id += 1
+                self.ledger.append(*row)
+                recorded.append(row)
+            self._log({'op': 'change', 'rows': recorded})
+        return range(first, first + len(recorded))
+
+    def undo_append_rows(self, positions):
+        # Only for the newest rows
+        with self._id_lock:
+            self.ledger.truncate(positions.start)
+            self.next_transaction_id -= len(positions)
+
+    # --- Ledger ---
+
+    def transactions_for(self, account_id):
+        return self.ledger.for_account(account_id)
+
+    def all_transactions(self):
+        return self.ledger.all()
+
+    # --- Persistence ---
+
+    def _journal_path(self, generation):
+        return os.path.join(self.data_dir, f'journal.{generation}.jsonl')
+
+    def _snapshot_path(self):
+        return os.path.join(self.data_dir, 'snapshot.json')
+
+    def _log(self, entry):
+        # Written while the change's locks are still held, so each account's
+        # entries appear in the journal in the order they were applied
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            batch.append(entry)
+        else:
+            self._write_journal([entry])
+
+    def _write_journal(self, entries):
+        if self._journal is None or not entries:
+            return
+        with self._journal_lock:
+            self._journal.write(''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries))
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+
+    def _replay(self, entry):
+        if entry['op'] == 'manager':
+            self._apply_manager(entry['username'], entry['password'])
+            return
+        if entry['op'] == 'customer':
+            self._apply_customer(entry['account_id'], entry['name'], entry['email'], entry['password'],
+                                 entry['balance'])
+        for row in entry['rows']:
+            self.ledger.append(*row)
+            self.next_transaction_id = max(self.next_transaction_id, row[0] + 1)
+        for account_id, balance in entry.get('balances', {}).items():
+            self.customers[int(account_id)]['balance'] = balance
+
+    def _recover(self):
+        path = self._snapshot_path()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as snapshot:
+                state = json.load(snapshot)
+            self.generation = state['generation']
+            for username, password in state['managers'].items():
+                self._apply_manager(username, password)
+            for account_id, name, email, password, balance in state['customers']:
+                self._apply_customer(account_id, name, email, password, balance)
+            self.ledger.load(state['ledger'])
+            self.next_customer_id = max(self.next_customer_id, state['next_customer_id'])
+            self.next_transaction_id = max(self.next_transaction_id, state['next_transaction_id'])
+        journals = sorted((int(path.rsplit('.', 2)[-2]), path)
+                          for path in glob.glob(os.path.join(self.data_dir, 'journal.*.jsonl')))
+        for generation, path in journals:
+            if generation < self.generation:
+                continue  # Already part of the snapshot
+            with open(path, 'rb+') as journal:
+                valid = 0  # Bytes of complete entries
+                for line in journal:
+                    if not line.endswith(b'\n'):
+                        # Only the final line can lack one: a crash mid-write, the change was never acknowledged
+                        journal.truncate(valid)
+                        break
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A complete line that does not parse is damage, not a torn write; replaying past it
+                        # or truncating it would silently lose acknowledged changes
+                        raise CorruptJournal(f'{path}: unreadable entry at byte {valid}') from None
+                    self._replay(entry)
+                    valid += len(line)
+            self.generation = generation
+        # Entries of concurrent changes may be journaled slightly out of id order
+        if not self.ledger.is_sorted():
+            self.ledger.sort()
+
+    def snapshot(self):
+        # Copies the state with changes paused, then writes it without blocking them
+        if not self.data_dir:
+            return
+        self._gate.acquire_exclusive()
+        try:
+            state = {
+                'generation': self.generation + 1,
+                'next_customer_id': self.next_customer_id,
+                'next_transaction_id': self.next_transaction_id,
+                'managers': {username: manager['password'] for username, manager in self.managers.items()},
+                'customers': [[id, c['name'], c['email'], c['password'], c['balance']]
+                              for id, c in self.customers.items()],
+                'ledger': self.ledger.dump(),
+            }
+            with self._journal_lock:
+                self._journal.close()
+                self.generation += 1
+                self._journal = open(self._journal_path(self.generation), 'a', encoding='utf-8')
+        finally:
+            self._gate.release_exclusive()
+        path = self._snapshot_path()
+        with open(path + '.tmp', 'w', encoding='utf-8') as snapshot:
+            json.dump(state, snapshot, separators=(',', ':'))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(path + '.tmp', path)
+        # The snapshot now covers every older journal
+        for old in glob.glob(os.path.join(self.data_dir, 'journal.*.jsonl')):
+            if int(old.rsplit('.', 2)[-2]) < state['generation']:
+                os.remove(old)
+
+    def _snapshot_loop(self):
+        while not self._stop.wait(self.snapshot_interval):
+            self.snapshot()
+
+    def close(self):
+        self._stop.set()
+        if self._journal is not None:
+            self.snapshot()
+            with self._journal_lock:
+                self._journal.close()
+                self._journal = None
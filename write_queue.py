@@ -0,0 +1,125 @@
+"""
+Optional single-writer engine with group commit.
+
+Write operations are callables `operation(conn, *args)` that run their
+statements on the connection they are given and return a result. Instead of
+every request thread taking SQLite's write lock in turn, submit() queues the
+operation for one dedicated writer thread, which drains the queue in batches
+and applies each batch inside a single transaction, one SAVEPOINT per
+operation. A failing operation only rolls back its own savepoint; the batch
+is committed once and every caller's future is resolved afterwards.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+
+class Abort(Exception):
+    """Raised by an operation to undo its own writes and still return `result` to the caller."""
+
+    def __init__(self, result):
+        super().__init__(result)
+        self.result = result
+
+
+_STOP = object()
+
+
+class WriteQueue:
+    def __init__(self, connect, max_batch=64, max_wait=0.0):
+        self._connect = connect
+        self.max_batch = max_batch
+        self.max_wait = max_wait  # Extra seconds to wait for a batch to fill up
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.operations = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='bank-writer', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def submit(self, operation, *args):
+        if self._thread is None:
+            self.start()
+        future = Future()
+        self._queue.put((future, operation, args))
+        return future
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None, True
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            stopping = False
+            while not stopping:
+                batch, stopping = self._next_batch()
+                if batch:
+                    self._apply(conn, batch)
+        finally:
+            conn.close()
+
+    def _apply(self, conn, batch):
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for future, operation, args in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT write_op")
+                try:
+                    outcomes.append((future, operation(conn, *args), None))
+                except Abort as e:
+                    conn.execute("ROLLBACK TO write_op")
+                    outcomes.append((future, e.result, None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_op")
+                    outcomes.append((future, None, e))
+                conn.execute("RELEASE write_op")
+            conn.commit()
+        except sqlite3.Error as e:
+            # The transaction itself failed (lock timeout, disk full, ...): nothing was applied
+            if conn.in_transaction:
+                conn.rollback()
+            for future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.operations += len(outcomes)
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        return {'queued': self._queue.qsize(), 'batches': self.batches, 'operations': self.operations}